@@ -1,17 +1,34 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.services.game.connection_manager import manager
+from app.services.game.connection_manager import (
+    LEASE_RELEASE_SCRIPT,
+    events_key,
+    game_keys,
+    manager,
+    role_in_match,
+)
+from app.core.config import settings
+from app.core.metrics import AI_CHOOSE_MOVE_SECONDS
 from app.core.security import decode_access_token
 from app.db.session import get_db
 from app.api.deps import get_current_user_id
 from app.schemas.game import AIMoveRequest, AIMoveResponse
 from app.services.game.ai_service import hybrid_ai_service
+from app.services.game.bot_service import bot_service
+from app.services.game.protocol import ProtocolError, negotiate
+from app.services.game.match_service import (
+    clock_field,
+    finish_match,
+    play_move,
+    snapshot_message,
+    stale_move_reply,
+)
 from app.services.auth_service import get_user_by_id
-from app.services.elo_service import update_elo_ratings
-from app.services.replay_service import save_replay
-from app.services.game_log_service import log_game
 from app.db.models.user import User
+from typing import Dict, Optional, Set, Tuple
 import json
+import time
+import secrets
 
 router = APIRouter()
 
@@ -27,6 +44,7 @@ async def get_ai_move(
     if payload.phase not in {1, 2}:
         raise HTTPException(status_code=400, detail="Invalid phase value")
 
+    start = time.perf_counter()
     move, mode_used, score = hybrid_ai_service.choose_move(
         board=payload.board,
         turn=payload.turn,
@@ -37,6 +55,7 @@ async def get_ai_move(
         mode=payload.mode,
         top_k=payload.top_k,
     )
+    AI_CHOOSE_MOVE_SECONDS.labels(payload.mode).observe(time.perf_counter() - start)
     if move is None:
         raise HTTPException(status_code=400, detail="No legal AI move available")
 
@@ -52,322 +71,424 @@ async def get_ai_move(
     )
 
 
-async def verify_websocket_token(token: str, db: Session) -> int:
-    """Verify JWT token and return user_id."""
+def websocket_token_user_id(token: str) -> Optional[int]:
+    """User id from a JWT, without checking that the user still exists."""
     payload = decode_access_token(token)
     if payload is None:
         return None
-    user_id = int(payload.get("sub"))
+    return int(payload.get("sub"))
+
+
+async def verify_websocket_token(token: str, db: Session) -> int:
+    """Verify JWT token and return user_id."""
+    user_id = websocket_token_user_id(token)
+    if user_id is None:
+        return None
     user = get_user_by_id(db, user_id)
     if user is None:
         return None
     return user_id
 
 
-@router.websocket("/ws/game")
-async def game_websocket(
-    websocket: WebSocket, token: str = Query(...), matchId: str = Query(...)
-):
-    """WebSocket endpoint for game communication with robust error handling."""
-    db = next(get_db())
-    user_id = None
-    role = None
-    connected = False
-    game = None
-
-    async def handle_player_forfeit(
-        current_match_data, leaving_user_id: int, leaving_role: str, current_game
-    ):
-        if not current_match_data or leaving_user_id is None or leaving_role is None:
-            return
-
-        p1_id = int(decode_redis_value(current_match_data.get("p1")))
-        p2_id = int(decode_redis_value(current_match_data.get("p2")))
-        opponent_role = "goat" if leaving_role == "tiger" else "tiger"
-        winner_id = p2_id if leaving_user_id == p1_id else p1_id
-        loser_id = leaving_user_id
-
-        final_board = current_game.board if current_game else []
-        goats_captured = current_game.goats_captured if current_game else 0
-        total_moves = (
-            len(current_game.move_history)
-            if current_game and hasattr(current_game, "move_history")
-            else 0
-        )
-        moves_history = (
-            {"moves": current_game.move_history}
-            if current_game and hasattr(current_game, "move_history")
-            else None
-        )
-
-        await manager.broadcast_to_match(
-            matchId,
+async def forfeit_match(match_id: str, match_data, user_id: int, role: str):
+    """End a match in favour of the opponent of a player who left."""
+    if not match_data or user_id is None or role is None:
+        return
+    opponent_role = "goat" if role == "tiger" else "tiger"
+    leave_message = f"{role.capitalize()} player left the game"
+    owner = await manager.acquire_match(match_id)
+    if owner and owner != manager.instance_id:
+        await manager.forward_to_owner(
+            owner,
             {
-                "type": "game_over",
+                "type": "finish",
+                "match_id": match_id,
                 "winner": opponent_role,
                 "reason": "opponent_left",
-                "message": f"{leaving_role.capitalize()} player left the game",
-                "final_board": final_board,
+                "message": leave_message,
             },
         )
+        return
+    await finish_match(
+        match_id,
+        opponent_role,
+        "opponent_left",
+        message=leave_message,
+        match_data=match_data,
+    )
 
-        tiger_player_id = p2_id
-        goat_player_id = p1_id
-
-        tiger = db.query(User).filter(User.id == tiger_player_id).first()
-        goat = db.query(User).filter(User.id == goat_player_id).first()
-        tiger_elo_before = tiger.elo_rating if tiger else 1200.0
-        goat_elo_before = goat.elo_rating if goat else 1200.0
-
-        await update_elo_ratings(db, winner_id, loser_id)
-
-        if tiger:
-            db.refresh(tiger)
-        if goat:
-            db.refresh(goat)
-        tiger_elo_after = tiger.elo_rating if tiger else tiger_elo_before
-        goat_elo_after = goat.elo_rating if goat else goat_elo_before
-
-        result = "tiger_win" if opponent_role == "tiger" else "goat_win"
-
-        log_game(
-            db=db,
-            match_id=matchId,
-            tiger_player_id=tiger_player_id,
-            goat_player_id=goat_player_id,
-            winner_id=winner_id,
-            result=result,
-            goats_captured=goats_captured,
-            total_moves=total_moves,
-            game_duration_seconds=None,
-            tiger_elo_before=tiger_elo_before,
-            tiger_elo_after=tiger_elo_after,
-            goat_elo_before=goat_elo_before,
-            goat_elo_after=goat_elo_after,
-            moves_history=moves_history,
-        )
 
-        moves = (
-            current_game.move_history
-            if current_game and hasattr(current_game, "move_history")
-            else []
-        )
-        await save_replay(db, matchId, p1_id, p2_id, winner_id, moves)
-        from app.services.matchmaking_service import cleanup_match
+async def hold_seat(match_id: str, user_id: int, role: str, conn_id: str):
+    """Keep a dropped player's seat for a reconnect instead of forfeiting at once."""
+    from app.core.redis import get_redis
+    from app.services.matchmaking_service import get_match_info
 
-        await cleanup_match(matchId)
+    async def forfeit_after_grace():
+        current_match_data = await get_match_info(match_id)
+        if current_match_data:
+            await forfeit_match(match_id, current_match_data, user_id, role)
 
-    try:
-        await websocket.accept()
-        connected = True
-        user_id = await verify_websocket_token(token, db)
-        if user_id is None:
-            await websocket.send_json({"type": "error", "message": "Invalid token"})
-            await websocket.close(code=1008, reason="Invalid token")
-            return
-        from app.core.redis import get_redis
-        from app.services.matchmaking_service import get_match_info, decode_redis_value
+    redis = await get_redis()
+    if await redis.get(f"ws_conn:{match_id}:{user_id}") != conn_id:
+        return  # the player is already back on another socket
+    if settings.RECONNECT_GRACE_SECONDS <= 0:
+        await forfeit_after_grace()
+        return
+    if not await get_match_info(match_id):
+        return
+    await manager.start_grace(match_id, user_id, forfeit_after_grace)
+    await manager.broadcast_to_match(
+        match_id,
+        {
+            "type": "player_disconnected",
+            "role": role,
+            "grace_seconds": settings.RECONNECT_GRACE_SECONDS,
+        },
+    )
 
-        redis = await get_redis()
-        match_data = await get_match_info(matchId)
-        if not match_data:
-            await websocket.send_json({"type": "error", "message": "Match not found"})
-            await websocket.close(code=1008, reason="Match not found")
-            return
-        role = await manager.get_user_role(matchId, user_id)
-        if role is None:
-            await websocket.send_json({"type": "error", "message": "User not in match"})
-            await websocket.close(code=1008, reason="User not in match")
-            return
-        await redis.set(f"ws_conn:{matchId}:{user_id}", "connected", ex=3600)
-        await manager.connect(websocket, matchId, user_id)
-        game = manager.get_game(matchId)
+
+async def release_seat(match_id: str, user_id: int, conn_id: str):
+    """Drop a socket's claim on a seat; a match nobody is connected to expires."""
+    from app.core.redis import get_redis
+    from app.services.matchmaking_service import get_match_info, decode_redis_value
+
+    redis = await get_redis()
+    if not await redis.eval(LEASE_RELEASE_SCRIPT, 1, f"ws_conn:{match_id}:{user_id}", conn_id):
+        return  # never seated, or a newer socket of the player holds the seat
+    match_data = await get_match_info(match_id)
+    if match_data:
+        p1_id = int(decode_redis_value(match_data.get("p1")))
+        p2_id = int(decode_redis_value(match_data.get("p2")))
+        p1_connected = await redis.get(f"ws_conn:{match_id}:{p1_id}")
+        p2_connected = await redis.get(f"ws_conn:{match_id}:{p2_id}")
+        if not p1_connected and not p2_connected:
+            await redis.expire(f"match:{match_id}", 300)
+            for key in game_keys(match_id):
+                await redis.expire(key, 300)
+            await redis.expire(f"match_workers:{match_id}", 300)
+            await redis.expire(events_key(match_id), 300)
+
+
+async def seat_player(
+    websocket: WebSocket,
+    db: Session,
+    match_id: str,
+    user_id: int,
+    conn_id: str,
+    resume_token: str,
+    last_event_id: Optional[str] = None,
+) -> Tuple[Optional[dict], Optional[Tuple[int, str]]]:
+    """Bootstrap a player's socket into a match and send start (or resumed).
+
+    Returns (seat, None) with the player's role, the match data and the bot
+    role, or (None, (close code, reason)). The caller reports the error and
+    releases the seat, which may already be registered unless the user was
+    unknown."""
+    from app.core.redis import get_redis
+    from app.services.matchmaking_service import decode_redis_value
+
+    # Both profiles in one query, before bootstrap marks the player connected
+    # and ends the grace window. The pooled connection goes back before the
+    # next await: a blocked checkout would stall the loop its holders need.
+    redis = await get_redis()
+    players = {user_id}
+    for player in await redis.hmget(f"match:{match_id}", "p1", "p2"):
+        if player:
+            players.add(int(decode_redis_value(player)))
+    users = {user.id: user for user in db.query(User).filter(User.id.in_(players))}
+    db.close()
+    current_user_db = users.get(user_id)
+    if current_user_db is None:
+        return None, (1008, "Invalid token")
+    # A reconnecting client resumes from the match stream instead of a full start
+    boot = await manager.bootstrap(
+        websocket, match_id, user_id, conn_id, resume_token, last_event_id
+    )
+    if boot is None:
+        return None, (1008, "Match not found")
+    role = boot["role"]
+    if role is None:
+        return None, (1008, "User not in match")
+    match_data = boot["match"]
+    resumed = boot["resumed"]
+    bot_role = match_data.get("bot_role")
+    if not resumed:
         p1_id = int(decode_redis_value(match_data.get("p1")))
         p2_id = int(decode_redis_value(match_data.get("p2")))
-        p1_connected = await redis.get(f"ws_conn:{matchId}:{p1_id}")
-        p2_connected = await redis.get(f"ws_conn:{matchId}:{p2_id}")
-        both_connected = p1_connected and p2_connected
-        p1_user = db.query(User).filter(User.id == p1_id).first()
-        p2_user = db.query(User).filter(User.id == p2_id).first()
         opponent_id = p2_id if user_id == p1_id else p1_id
-        current_user_db = p1_user if user_id == p1_id else p2_user
-        opponent_user_db = p2_user if user_id == p1_id else p1_user
+        opponent_user_db = None if bot_role else users.get(opponent_id)
+    bot = (bot_role, match_data.get("bot_mode") or "hybrid") if bot_role else None
+    if bot and not await seat_bot(match_id, user_id, bot):
+        return None, (1013, "No bot capacity available")
+    game = manager.get_game(match_id)
+    if resumed:
+        await manager.send_to_connection(
+            websocket,
+            {
+                "type": "resumed",
+                "match_id": match_id,
+                "role": role,
+                "seq": game.version,
+                **clock_field(game),
+                "resume_token": resume_token,
+            },
+            match_id,
+        )
+    else:
+        both_connected = bool(bot_role) or boot["both_connected"]
+        if bot_role:
+            opponent_name = "AI Bot"
+        elif opponent_user_db:
+            opponent_name = opponent_user_db.username
+        else:
+            opponent_name = f"Player {opponent_id}"
         await manager.send_to_connection(
             websocket,
             {
                 "type": "start",
-                "match_id": matchId,
+                "match_id": match_id,
                 "board": game.board,
                 "turn": game.turn,
                 "phase": game.phase,
                 "role": role,
                 "goats_placed": game.goats_placed,
                 "goats_captured": game.goats_captured,
+                "seq": game.version,
+                **clock_field(game),
+                "eid": boot["event_id"],
+                "resume_token": resume_token,
                 "player": {
                     "id": user_id,
-                    "username": current_user_db.username if current_user_db else f"Player {user_id}",
-                    "elo_rating": current_user_db.elo_rating if current_user_db else 1200.0,
+                    "username": current_user_db.username,
+                    "elo_rating": current_user_db.elo_rating,
                 },
                 "opponent": {
                     "id": opponent_id,
-                    "username": opponent_user_db.username if opponent_user_db else f"Player {opponent_id}",
+                    "username": opponent_name,
                     "elo_rating": opponent_user_db.elo_rating if opponent_user_db else 1200.0,
+                    "bot": bool(bot_role),
                 },
                 "both_players_connected": both_connected,
             },
+            match_id,
         )
         if both_connected:
             await manager.broadcast_to_match(
-                matchId,
+                match_id,
                 {
                     "type": "both_connected",
                     "message": "Both players connected. Game can begin!",
                 },
             )
+    if boot["returning"]:
+        await manager.broadcast_to_match(
+            match_id, {"type": "player_reconnected", "role": role}
+        )
+    if bot_role:
+        bot_service.notify_turn(match_id)
+    return {"role": role, "match": match_data, "bot_role": bot_role, "bot": bot}, None
+
+
+async def seat_spectator(
+    websocket: WebSocket, db: Session, match_id: str, conn_id: str
+) -> Optional[Tuple[int, str]]:
+    """Join a socket to a match read-only and send spectate and a snapshot.
+
+    Returns None, or (close code, reason). The manager drops the socket from
+    the spectator count when it leaves the match."""
+    from app.services.matchmaking_service import get_match_info, decode_redis_value
+
+    match_data = await get_match_info(match_id)
+    if not match_data:
+        return 1008, "Match not found"
+    watching = await manager.watch(websocket, match_id, conn_id)
+    if not watching:
+        return 1013, "Spectator limit reached"
+    # connect() has already brought the resident copy up to date
+    game = manager.get_game(match_id)
+    p1_id = int(decode_redis_value(match_data.get("p1")))
+    p2_id = int(decode_redis_value(match_data.get("p2")))
+    users = {
+        user.id: user.username
+        for user in db.query(User).filter(User.id.in_([p1_id, p2_id])).all()
+    }
+    db.close()
+    players = {
+        "goat": users.get(p1_id, f"Player {p1_id}"),
+        "tiger": users.get(p2_id, f"Player {p2_id}"),
+    }
+    bot_role = match_data.get("bot_role")
+    if bot_role:
+        players[bot_role] = "AI Bot"
+    await manager.send_to_connection(
+        websocket,
+        {
+            "type": "spectate",
+            "match_id": match_id,
+            "players": players,
+            "spectators": watching,
+        },
+        match_id,
+    )
+    await manager.send_to_connection(websocket, snapshot_message(game), match_id)
+    return None
+
+
+async def send_snapshot(websocket: WebSocket, match_id: str):
+    """Answer a resync with the current position."""
+    if match_id in manager.owned_matches:
+        game = manager.get_game(match_id)
+    else:
+        game = await manager.refresh_game(match_id)
+    await manager.send_to_connection(websocket, snapshot_message(game), match_id)
+
+
+async def seat_bot(match_id: str, user_id: int, bot: Tuple[str, str]) -> bool:
+    """Seat the match's bot on the worker holding the lease, the only one that
+    plays moves. Returns False when this worker is that owner and is full."""
+    owner = await manager.acquire_match(match_id)
+    if owner is not None and owner != manager.instance_id:
+        role, mode = bot
+        await manager.forward_to_owner(
+            owner,
+            {"type": "bot", "match_id": match_id, "user_id": user_id, "role": role, "mode": mode},
+        )
+        return True
+    return bot_service.seat(match_id, *bot, user_id)
+
+
+async def route_move(
+    websocket: WebSocket,
+    match_id: str,
+    user_id: int,
+    role: str,
+    message: dict,
+    bot: Optional[Tuple[str, str]] = None,
+) -> Optional[str]:
+    """Play a move on the worker holding the match lease, forwarding it if
+    that is another worker. Returns the winner when the move ends the game."""
+    owner = await manager.acquire_match(match_id)
+    if owner is None:
+        await manager.send_to_connection(
+            websocket, {"type": "error", "message": "Match busy, please retry"}, match_id
+        )
+        return None
+    if owner != manager.instance_id:
+        await manager.forward_to_owner(
+            owner,
+            {
+                "type": "move",
+                "match_id": match_id,
+                "user_id": user_id,
+                "role": role,
+                "message": message,
+            },
+        )
+        return None
+    # The lease may have just come over from a worker that went away
+    if bot is not None and not bot_service.seat(match_id, *bot, user_id):
+        # Free the lease so a reconnect can land on a worker with room
+        await manager.release_match(match_id)
+        await manager.send_to_connection(
+            websocket, {"type": "error", "message": "No bot capacity available"}, match_id
+        )
+        return None
+    reply = stale_move_reply(manager.get_game(match_id), role, message)
+    if reply is not None:
+        await manager.send_to_connection(websocket, reply, match_id)
+        return None
+    success, error_msg, winner = await play_move(match_id, role, message)
+    if not success:
+        await manager.send_to_connection(
+            websocket, {"type": "error", "message": error_msg}, match_id
+        )
+    return winner
+
+
+@router.websocket("/ws/game")
+async def game_websocket(
+    websocket: WebSocket,
+    token: Optional[str] = Query(None),
+    matchId: str = Query(...),
+    lastEventId: Optional[str] = Query(None),
+    resumeToken: Optional[str] = Query(None),
+):
+    """WebSocket endpoint for game communication with robust error handling."""
+    db = next(get_db())
+    user_id = None
+    role = None
+    connected = False
+    bot_role = None
+    # Marks this socket in ws_conn so a newer socket of the same player can take over
+    conn_id = secrets.token_hex(8)
+
+    from app.core.redis import get_redis
+    from app.services.matchmaking_service import decode_redis_value
+
+    try:
+        protocol = negotiate(websocket.scope.get("subprotocols") or [])
+        await websocket.accept(subprotocol=protocol.subprotocol)
+        connected = True
+        manager.set_protocol(websocket, protocol)
+        redis = await get_redis()
+        resume_token = None
+        if resumeToken:
+            resumed_user = await redis.get(f"resume:{matchId}:{resumeToken}")
+            if resumed_user:
+                user_id = int(decode_redis_value(resumed_user))
+                resume_token = resumeToken
+        if user_id is None:
+            user_id = websocket_token_user_id(token) if token else None
+            if user_id is None:
+                await manager.send_to_connection(
+                    websocket, {"type": "error", "message": "Invalid token"}
+                )
+                await manager.close_connection(websocket, 1008, "Invalid token")
+                return
+        if len(manager.connection_info) >= settings.WS_MAX_CONNECTIONS:
+            await manager.send_to_connection(
+                websocket, {"type": "error", "message": "Server is full"}
+            )
+            await manager.close_connection(websocket, 1013, "Server is full")
+            return
+        resume_token = resume_token or secrets.token_urlsafe(16)
+        seat, error = await seat_player(
+            websocket, db, matchId, user_id, conn_id, resume_token, lastEventId
+        )
+        if error is not None:
+            code, reason = error
+            await manager.send_to_connection(websocket, {"type": "error", "message": reason})
+            await manager.close_connection(websocket, code, reason)
+            return
+        role = seat["role"]
+        match_data = seat["match"]
+        bot_role = seat["bot_role"]
         while True:
             try:
-                data = await websocket.receive_text()
-                message = json.loads(data)
+                frame = await websocket.receive()
+                if frame["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(frame.get("code", 1000))
+                manager.touch(websocket)
+                message = protocol.decode(frame.get("bytes") or frame.get("text") or "")
                 move_type = message.get("type")
 
-                await manager.load_game(matchId)
-                game = manager.get_game(matchId)
-
                 if move_type == "ping":
                     await manager.send_to_connection(websocket, {"type": "pong"})
                     continue
+                if move_type == "pong":
+                    continue
                 if move_type == "leave":
-                    await handle_player_forfeit(match_data, user_id, role, game)
+                    await forfeit_match(matchId, match_data, user_id, role)
                     break
-                if game.turn != role:
-                    await manager.send_to_connection(
-                        websocket, {"type": "error", "message": "Not your turn"}
-                    )
+                if move_type == "resync":
+                    await send_snapshot(websocket, matchId)
                     continue
-                success = False
-                error_msg = ""
-                move_info = {}
-                captured_goat = None
-                if move_type == "place":
-                    position = message.get("position")
-                    if position is not None:
-                        success, error_msg = game.place_goat(position)
-                        move_info = {"type": "place", "position": position}
-                    else:
-                        error_msg = "Position required"
-                elif move_type == "move":
-                    from_pos = message.get("from")
-                    to_pos = message.get("to")
-                    if from_pos is not None and to_pos is not None:
-                        if role == "tiger":
-                            success, error_msg, captured_goat = game.move_tiger(
-                                from_pos, to_pos
-                            )
-                            move_info = {
-                                "type": "move",
-                                "from": from_pos,
-                                "to": to_pos,
-                                "captured": captured_goat,
-                            }
-                        elif role == "goat":
-                            success, error_msg = game.move_goat(from_pos, to_pos)
-                            move_info = {"type": "move", "from": from_pos, "to": to_pos}
-                    else:
-                        error_msg = "From and to positions required"
-                if not success:
-                    await manager.send_to_connection(
-                        websocket, {"type": "error", "message": error_msg}
-                    )
-                    continue
-                await manager.save_game(matchId)
-                winner = game.check_winner()
-                if winner:
-                    reason = (
-                        "tigers_captured_5_goats"
-                        if winner == "tiger"
-                        else "tigers_blocked"
-                    )
-                    await manager.broadcast_to_match(
-                        matchId,
-                        {
-                            "type": "game_over",
-                            "winner": winner,
-                            "reason": reason,
-                            "final_board": game.board,
-                        },
-                    )
-                    p1_id = int(decode_redis_value(match_data.get("p1")))
-                    p2_id = int(decode_redis_value(match_data.get("p2")))
-                    
-                    # Determine tiger and goat players
-                    tiger_player_id = p2_id  # p2 is tiger
-                    goat_player_id = p1_id   # p1 is goat
-                    
-                    winner_id = p1_id if winner == "goat" else p2_id
-                    loser_id = p2_id if winner == "goat" else p1_id
-                    
-                    # Get ELO ratings before update
-                    tiger = db.query(User).filter(User.id == tiger_player_id).first()
-                    goat = db.query(User).filter(User.id == goat_player_id).first()
-                    tiger_elo_before = tiger.elo_rating if tiger else 1200.0
-                    goat_elo_before = goat.elo_rating if goat else 1200.0
-                    
-                    # Update ELO ratings
-                    elo_result = await update_elo_ratings(db, winner_id, loser_id)
-                    
-                    # Get ELO ratings after update
-                    db.refresh(tiger)
-                    db.refresh(goat)
-                    tiger_elo_after = tiger.elo_rating
-                    goat_elo_after = goat.elo_rating
-                    
-                    # Determine result string
-                    result = "tiger_win" if winner == "tiger" else "goat_win"
-                    
-                    # Log the game
-                    log_game(
-                        db=db,
-                        match_id=matchId,
-                        tiger_player_id=tiger_player_id,
-                        goat_player_id=goat_player_id,
-                        winner_id=winner_id,
-                        result=result,
-                        goats_captured=game.goats_captured,
-                        total_moves=len(game.move_history) if hasattr(game, 'move_history') else 0,
-                        game_duration_seconds=None,  # Can be calculated if needed
-                        tiger_elo_before=tiger_elo_before,
-                        tiger_elo_after=tiger_elo_after,
-                        goat_elo_before=goat_elo_before,
-                        goat_elo_after=goat_elo_after,
-                        moves_history={"moves": game.move_history} if hasattr(game, 'move_history') else None
-                    )
-                    
-                    moves = game.move_history if hasattr(game, "move_history") else []
-                    await save_replay(db, matchId, p1_id, p2_id, winner_id, moves)
-                    from app.services.matchmaking_service import cleanup_match
-
-                    await cleanup_match(matchId)
+                if await route_move(websocket, matchId, user_id, role, message, seat["bot"]):
                     break
-                else:
-                    await manager.broadcast_to_match(
-                        matchId,
-                        {
-                            "type": "update",
-                            "board": game.board,
-                            "turn": game.turn,
-                            "phase": game.phase,
-                            "move": move_info,
-                            "goats_placed": game.goats_placed,
-                            "goats_captured": game.goats_captured,
-                        },
-                    )
             except WebSocketDisconnect:
                 try:
-                    current_match_data = await get_match_info(matchId)
-                    if current_match_data and user_id and role:
-                        await handle_player_forfeit(
-                            current_match_data, user_id, role, manager.get_game(matchId)
-                        )
+                    if user_id and role:
+                        await hold_seat(matchId, user_id, role, conn_id)
                 except Exception:
                     pass
                 break
@@ -375,6 +496,10 @@ async def game_websocket(
                 await manager.send_to_connection(
                     websocket, {"type": "error", "message": "Invalid JSON"}
                 )
+            except ProtocolError as e:
+                await manager.send_to_connection(
+                    websocket, {"type": "error", "message": str(e)}
+                )
             except Exception as e:
                 print(f"Message processing error: {e}")
                 await manager.send_to_connection(
@@ -383,34 +508,263 @@ async def game_websocket(
     except WebSocketDisconnect:
         if matchId and role and user_id:
             try:
-                current_match_data = await get_match_info(matchId)
-                if current_match_data:
-                    await handle_player_forfeit(
-                        current_match_data, user_id, role, manager.get_game(matchId)
-                    )
+                await hold_seat(matchId, user_id, role, conn_id)
             except:
                 pass
     except Exception as e:
         print(f"WebSocket connection error: {e}")
     finally:
         if connected:
+            await manager.drain(websocket)
             await manager.disconnect(websocket)
+        if bot_role and not manager.active_connections.get(matchId):
+            bot_service.release(matchId)
         if user_id and matchId:
             try:
-                redis = await get_redis()
-                await redis.delete(f"ws_conn:{matchId}:{user_id}")
-                match_data = await get_match_info(matchId)
-                if match_data:
-                    p1_id = int(decode_redis_value(match_data.get("p1")))
-                    p2_id = int(decode_redis_value(match_data.get("p2")))
-                    p1_connected = await redis.get(f"ws_conn:{matchId}:{p1_id}")
-                    p2_connected = await redis.get(f"ws_conn:{matchId}:{p2_id}")
-                    if not p1_connected and not p2_connected:
-                        await redis.expire(f"match:{matchId}", 300)
-                        await redis.expire(f"game:{matchId}", 300)
+                await release_seat(matchId, user_id, conn_id)
             except:
                 pass
         try:
             db.close()
         except:
             pass
+
+
+@router.websocket("/ws/spectate")
+async def spectate_websocket(
+    websocket: WebSocket, token: str = Query(...), matchId: str = Query(...)
+):
+    """Read-only WebSocket that follows a live match."""
+    db = next(get_db())
+    connected = False
+    conn_id = secrets.token_hex(8)
+
+    try:
+        protocol = negotiate(websocket.scope.get("subprotocols") or [])
+        await websocket.accept(subprotocol=protocol.subprotocol)
+        connected = True
+        manager.set_protocol(websocket, protocol)
+        user_id = await verify_websocket_token(token, db)
+        if user_id is None:
+            await manager.send_to_connection(
+                websocket, {"type": "error", "message": "Invalid token"}
+            )
+            await manager.close_connection(websocket, 1008, "Invalid token")
+            return
+        if len(manager.connection_info) >= settings.WS_MAX_CONNECTIONS:
+            await manager.send_to_connection(
+                websocket, {"type": "error", "message": "Server is full"}
+            )
+            await manager.close_connection(websocket, 1013, "Server is full")
+            return
+        error = await seat_spectator(websocket, db, matchId, conn_id)
+        if error is not None:
+            code, reason = error
+            await manager.send_to_connection(websocket, {"type": "error", "message": reason})
+            await manager.close_connection(websocket, code, reason)
+            return
+        while True:
+            try:
+                frame = await websocket.receive()
+                if frame["type"] == "websocket.disconnect":
+                    break
+                manager.touch(websocket)
+                message = protocol.decode(frame.get("bytes") or frame.get("text") or "")
+                if message.get("type") == "ping":
+                    await manager.send_to_connection(websocket, {"type": "pong"})
+                elif message.get("type") == "pong":
+                    pass
+                elif message.get("type") == "leave":
+                    break
+                elif message.get("type") == "resync":
+                    await send_snapshot(websocket, matchId)
+                else:
+                    await manager.send_to_connection(
+                        websocket, {"type": "error", "message": "Spectators cannot move"}
+                    )
+            except (json.JSONDecodeError, ProtocolError) as e:
+                await manager.send_to_connection(
+                    websocket, {"type": "error", "message": str(e)}
+                )
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Spectator connection error: {e}")
+    finally:
+        if connected:
+            await manager.drain(websocket)
+            await manager.disconnect(websocket)
+        try:
+            db.close()
+        except:
+            pass
+
+
+@router.websocket("/ws/multiplex")
+async def multiplex_websocket(websocket: WebSocket, token: str = Query(...)):
+    """One authenticated socket following several matches.
+
+    Frames for a match carry its id ("match" in JSON, a MUX header in the
+    binary protocol). Subscribing to a match the user plays in takes their
+    seat as /ws/game would; any other match is watched as a spectator."""
+    db = next(get_db())
+    connected = False
+    user_id = None
+    conn_id = secrets.token_hex(8)
+    # Matches played on this socket, and matches watched as a spectator
+    seats: Dict[str, dict] = {}
+    watching: Set[str] = set()
+
+    from app.services.matchmaking_service import get_match_info
+
+    async def send_error(match_id: Optional[str], reason: str):
+        await manager.send_to_connection(
+            websocket, {"type": "error", "message": reason}, match_id
+        )
+
+    async def subscribe(match_id: str, message: dict):
+        session = next(get_db())
+        try:
+            match_data = await get_match_info(match_id)
+            if match_data and role_in_match(match_data, user_id) and not message.get("spectate"):
+                seat, error = await seat_player(
+                    websocket,
+                    session,
+                    match_id,
+                    user_id,
+                    conn_id,
+                    secrets.token_urlsafe(16),
+                    message.get("lastEventId"),
+                )
+                if error is None:
+                    seats[match_id] = seat
+                    return
+                await manager.unsubscribe(websocket, match_id)
+                await release_seat(match_id, user_id, conn_id)
+            else:
+                error = await seat_spectator(websocket, session, match_id, conn_id)
+                if error is None:
+                    watching.add(match_id)
+                    return
+            await send_error(match_id, error[1])
+        finally:
+            session.close()
+
+    async def leave(match_id: str, hold: bool):
+        """Drop one subscription; with `hold` a player's seat gets its grace window."""
+        seat = seats.pop(match_id, None)
+        if seat is not None and hold:
+            await hold_seat(match_id, user_id, seat["role"], conn_id)
+        await manager.unsubscribe(websocket, match_id)
+        if seat is not None:
+            if seat["bot_role"] and not manager.active_connections.get(match_id):
+                bot_service.release(match_id)
+            await release_seat(match_id, user_id, conn_id)
+        watching.discard(match_id)
+
+    try:
+        protocol = negotiate(websocket.scope.get("subprotocols") or [])
+        await websocket.accept(subprotocol=protocol.subprotocol)
+        connected = True
+        manager.set_protocol(websocket, protocol)
+        user_id = await verify_websocket_token(token, db)
+        db.close()
+        if user_id is None:
+            await send_error(None, "Invalid token")
+            await manager.close_connection(websocket, 1008, "Invalid token")
+            return
+        if len(manager.connection_info) >= settings.WS_MAX_CONNECTIONS:
+            await send_error(None, "Server is full")
+            await manager.close_connection(websocket, 1013, "Server is full")
+            return
+        manager.multiplex(websocket, user_id)
+        await manager.send_to_connection(
+            websocket,
+            {
+                "type": "multiplex",
+                "user_id": user_id,
+                "max_matches": settings.WS_MUX_MAX_MATCHES,
+            },
+        )
+        while True:
+            try:
+                frame = await websocket.receive()
+                if frame["type"] == "websocket.disconnect":
+                    break
+                manager.touch(websocket)
+                match_id, message = protocol.untag(
+                    frame.get("bytes") or frame.get("text") or ""
+                )
+                msg_type = message.get("type")
+                if msg_type == "ping":
+                    await manager.send_to_connection(websocket, {"type": "pong"})
+                    continue
+                if msg_type == "pong":
+                    continue
+                if not isinstance(match_id, str) or not match_id:
+                    await send_error(None, "Match tag required")
+                    continue
+                subscribed = match_id in seats or match_id in watching
+                if msg_type == "subscribe":
+                    if subscribed:
+                        await send_snapshot(websocket, match_id)
+                    elif len(seats) + len(watching) >= settings.WS_MUX_MAX_MATCHES:
+                        await send_error(match_id, "Subscription limit reached")
+                    elif len(match_id.encode("utf-8")) > 255:
+                        await send_error(None, "Invalid match id")
+                    else:
+                        await subscribe(match_id, message)
+                    continue
+                if not subscribed:
+                    await send_error(match_id, "Not subscribed")
+                    continue
+                if msg_type == "unsubscribe":
+                    await leave(match_id, hold=True)
+                    await manager.send_to_connection(
+                        websocket, {"type": "unsubscribed"}, match_id
+                    )
+                    continue
+                if msg_type == "resync":
+                    await send_snapshot(websocket, match_id)
+                    continue
+                seat = seats.get(match_id)
+                if seat is None:
+                    await send_error(match_id, "Spectators cannot move")
+                    continue
+                if msg_type == "leave":
+                    await forfeit_match(match_id, seat["match"], user_id, seat["role"])
+                    await leave(match_id, hold=False)
+                    continue
+                if await route_move(
+                    websocket, match_id, user_id, seat["role"], message, seat["bot"]
+                ):
+                    await leave(match_id, hold=False)
+            except (json.JSONDecodeError, ProtocolError) as e:
+                await send_error(None, str(e))
+            except Exception as e:
+                print(f"Multiplexed message error: {e}")
+                await send_error(None, "Internal server error")
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Multiplexed connection error: {e}")
+    finally:
+        for match_id, seat in seats.items():
+            try:
+                await hold_seat(match_id, user_id, seat["role"], conn_id)
+            except Exception:
+                pass
+        if connected:
+            await manager.drain(websocket)
+            await manager.disconnect(websocket)
+        for match_id, seat in seats.items():
+            if seat["bot_role"] and not manager.active_connections.get(match_id):
+                bot_service.release(match_id)
+            try:
+                await release_seat(match_id, user_id, conn_id)
+            except Exception:
+                pass
+        try:
+            db.close()
+        except:
+            pass
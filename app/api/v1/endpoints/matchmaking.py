@@ -1,5 +1,11 @@
-from fastapi import APIRouter, Depends
-from app.services.matchmaking_service import add_to_queue, remove_from_queue
+from fastapi import APIRouter, Depends, HTTPException
+from app.services.matchmaking_service import (
+    add_to_queue,
+    create_bot_match,
+    remove_from_queue,
+)
+from app.services.game.game_service import TIME_CONTROLS
+from app.schemas.game import BotMatchRequest
 from app.api.deps import get_current_user_id
 
 router = APIRouter(prefix="/matchmaking", tags=["matchmaking"])
@@ -18,6 +24,22 @@ async def start_matchmaking(user_id: int = Depends(get_current_user_id)):
         return {"status": "queued", "message": "Waiting for opponent"}
 
 
+@router.post("/bot")
+async def start_bot_match(
+    payload: BotMatchRequest, user_id: int = Depends(get_current_user_id)
+):
+    """Start a match against a server-side AI opponent."""
+    if payload.role not in {"goat", "tiger"}:
+        raise HTTPException(status_code=400, detail="Invalid role value")
+    if payload.mode not in {"heuristic", "model", "hybrid"}:
+        raise HTTPException(status_code=400, detail="Invalid mode value")
+    if payload.time_control is not None and payload.time_control not in TIME_CONTROLS:
+        raise HTTPException(status_code=400, detail="Invalid time_control value")
+    return await create_bot_match(
+        user_id, payload.role, payload.mode, payload.time_control
+    )
+
+
 @router.post("/cancel")
 async def cancel_matchmaking(user_id: int = Depends(get_current_user_id)):
     """Cancel matchmaking."""
@@ -40,15 +62,11 @@ async def check_match_status(user_id: int = Depends(get_current_user_id)):
     from app.core.redis import get_redis
     from app.services.matchmaking_service import (
         heartbeat_user,
-        is_user_alive,
-        decode_redis_value,
         MATCHMAKING_QUEUE,
     )
 
     redis = await get_redis()
-    queue_items = await redis.lrange(MATCHMAKING_QUEUE, 0, -1)
-    queue_items_decoded = [decode_redis_value(item) for item in queue_items]
-    if str(user_id) in queue_items_decoded:
+    if await redis.zscore(MATCHMAKING_QUEUE, str(user_id)) is not None:
         await heartbeat_user(user_id)
     user_match_raw = await redis.get(f"user_match:{user_id}")
     if user_match_raw:
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.db.session import get_db
+from app.schemas.game import GameAnalysisResponse
+from app.services.analysis_service import get_game_analysis
 from app.services.replay_service import get_replay, get_user_replays
 
 router = APIRouter(prefix="/replay", tags=["replay"])
@@ -23,6 +25,19 @@ def get_game_replay(game_id: str, db: Session = Depends(get_db)):
     }
 
 
+@router.get("/{game_id}/analysis", response_model=GameAnalysisResponse)
+async def get_game_replay_analysis(
+    game_id: str, mode: str = "hybrid", db: Session = Depends(get_db)
+):
+    """Get engine evaluation, best move and mistake size for every ply of a game."""
+    if mode not in {"heuristic", "model", "hybrid"}:
+        raise HTTPException(status_code=400, detail="Invalid mode value")
+    analysis = await get_game_analysis(db, game_id, mode)
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Replay not found")
+    return analysis
+
+
 @router.get("/user/{user_id}")
 def get_user_game_replays(user_id: int, limit: int = 10, db: Session = Depends(get_db)):
     """Get replays for a specific user."""
@@ -17,6 +17,30 @@ class Settings(BaseSettings):
     SMTP_FROM_EMAIL: str = ""
     SMTP_USE_TLS: bool = True
     SMTP_USE_SSL: bool = False
+    BOT_WORKER_PROCESSES: int = 2
+    BOT_MAX_ACTIVE_GAMES: int = 50
+    BOT_PONDER_ENABLED: bool = True
+    BOT_PONDER_MAX_POSITIONS: int = 4
+    ANALYSIS_CACHE_SECONDS: int = 604800
+    MATCH_LEASE_SECONDS: int = 15
+    MATCH_FORWARD_TIMEOUT_SECONDS: float = 5.0  # silent owners lose the lease after this
+    WS_SEND_QUEUE_SIZE: int = 64
+    WS_MAX_CONNECTIONS: int = 10000
+    WS_IDLE_SECONDS: int = 30
+    WS_PING_TIMEOUT_SECONDS: int = 15
+    WS_IDLE_TICK_SECONDS: float = 1.0
+    MATCH_EVENTS_MAXLEN: int = 256
+    RECONNECT_GRACE_SECONDS: int = 30
+    SPECTATORS_PER_MATCH: int = 5000
+    SPECTATOR_TTL_SECONDS: int = 60  # unrenewed viewers (a crashed worker's) drop out of the count
+    WS_MUX_MAX_MATCHES: int = 32  # subscriptions per /ws/multiplex socket
+    DEFAULT_TIME_CONTROL: str = ""  # for queue matches, "blitz" or "rapid"; untimed when empty
+    CLOCK_SWEEP_SECONDS: float = 5.0
+    GAME_JOB_MAX_ATTEMPTS: int = 5
+    GAME_JOB_RETRY_SECONDS: float = 2.0  # doubled after every failed attempt
+    GAME_IDLE_SECONDS: int = 300  # resident games untouched this long are written back and dropped
+    MAX_RESIDENT_GAMES: int = 20000
+    GAME_EVICT_INTERVAL_SECONDS: float = 30.0
 
     @property
     def is_production(self) -> bool:
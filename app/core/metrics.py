@@ -0,0 +1,167 @@
+"""Process-local metrics in the Prometheus text format, served at /metrics.
+
+Every metric and every labelled child is created at import time. A hot
+path looks up its child once (or through one dict get for per-call labels)
+and observe() only bumps a preallocated bucket list, so recording costs
+no allocation. Each worker process keeps its own registry; Prometheus
+scrapes them one by one and sums.
+"""
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+AI_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY: List["Metric"] = []
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        REGISTRY.append(self)
+
+    def samples(self) -> Iterable[str]:
+        return ()
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.help_text}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(line + "\n" for line in self.samples())
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "labels")
+
+    def __init__(self, bounds: Tuple[float, ...], labels: str):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.labels = labels
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def samples(self, name: str) -> Iterable[str]:
+        prefix = self.labels + "," if self.labels else ""
+        total = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            yield f'{name}_bucket{{{prefix}le="{_format_value(bound)}"}} {total}'
+        suffix = f"{{{self.labels}}}" if self.labels else ""
+        yield f"{name}_sum{suffix} {_format_value(self.sum)}"
+        yield f"{name}_count{suffix} {total}"
+
+
+class Histogram(Metric):
+    """Latency histogram, optionally split by one label with known values.
+
+    Values outside `values` are counted under "other" so a stray label can
+    not grow the registry."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        label: str = "",
+        values: Sequence[str] = (),
+    ):
+        super().__init__(name, help_text)
+        bounds = tuple(sorted(buckets))
+        self.children: Dict[str, _HistogramChild] = {}
+        if label:
+            for value in tuple(values) + ("other",):
+                self.children[value] = _HistogramChild(bounds, f'{label}="{value}"')
+            self.default = self.children["other"]
+        else:
+            self.default = _HistogramChild(bounds, "")
+
+    def labels(self, value: str) -> _HistogramChild:
+        return self.children.get(value, self.default)
+
+    def observe(self, value: float):
+        self.default.observe(value)
+
+    def samples(self) -> Iterable[str]:
+        for child in self.children.values() if self.children else (self.default,):
+            yield from child.samples(self.name)
+
+
+class Gauge(Metric):
+    """Point-in-time value, set when /metrics is scraped."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self) -> Iterable[str]:
+        yield f"{self.name} {_format_value(self.value)}"
+
+
+def render() -> str:
+    return "".join(metric.render() for metric in REGISTRY)
+
+
+# Commands this app issues; anything else is counted as "other"
+REDIS_COMMANDS = (
+    "GET", "SET", "DEL", "EXPIRE", "INCR", "DECR", "HGET", "HSET", "HGETALL",
+    "LPUSH", "RPUSH", "LPOP", "LRANGE", "LREM", "LLEN", "LMOVE", "BLMOVE",
+    "SADD", "SREM", "SMEMBERS", "ZADD", "ZREM", "ZRANGEBYSCORE", "ZSCORE", "ZCARD",
+    "XRANGE",
+    "EVAL", "EVALSHA", "PUBLISH", "WATCH", "PIPELINE",
+)
+
+MOVE_SECONDS = Histogram(
+    "baghchal_move_seconds",
+    "Time to validate, persist and broadcast one move on the owning worker.",
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "baghchal_redis_command_seconds",
+    "Redis round trip per command; a pipeline counts once as PIPELINE.",
+    label="command",
+    values=REDIS_COMMANDS,
+)
+AI_CHOOSE_MOVE_SECONDS = Histogram(
+    "baghchal_ai_choose_move_seconds",
+    "AI move selection time per requested mode, including the process pool hop for bots.",
+    buckets=AI_BUCKETS,
+    label="mode",
+    values=("heuristic", "model", "hybrid"),
+)
+PUBSUB_LAG_SECONDS = Histogram(
+    "baghchal_pubsub_lag_seconds",
+    "Delay from a match event entering its stream to another worker relaying it.",
+)
+BROADCAST_SECONDS = Histogram(
+    "baghchal_broadcast_fanout_seconds",
+    "Time to encode and queue one event for the local sockets of a match.",
+)
+ACTIVE_MATCHES = Gauge(
+    "baghchal_active_matches", "Matches this worker holds the lease for."
+)
+ACTIVE_SOCKETS = Gauge(
+    "baghchal_active_sockets", "Open player and spectator websockets on this worker."
+)
+MATCHMAKING_QUEUE_LENGTH = Gauge(
+    "baghchal_matchmaking_queue_length", "Players waiting in the matchmaking queue."
+)
@@ -1,13 +1,43 @@
+import time
+
 import redis.asyncio as redis
 from app.core.config import settings
+from app.core.metrics import REDIS_COMMAND_SECONDS
 
 redis_client: redis.Redis = None
 
+_PIPELINE_SECONDS = REDIS_COMMAND_SECONDS.labels("PIPELINE")
+
+
+class InstrumentedPipeline(redis.client.Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            _PIPELINE_SECONDS.observe(time.perf_counter() - start)
+
+
+class InstrumentedRedis(redis.Redis):
+    """Redis client that records each command's round trip in /metrics."""
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_SECONDS.labels(args[0]).observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None):
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
 
 async def get_redis():
     global redis_client
     if redis_client is None:
-        redis_client = await redis.from_url(settings.REDIS_URL, decode_responses=True)
+        redis_client = await InstrumentedRedis.from_url(settings.REDIS_URL, decode_responses=True)
     return redis_client
 
 
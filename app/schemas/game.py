@@ -67,3 +67,26 @@ class AIMoveResponse(BaseModel):
     to_pos: Optional[int] = None
     mode_used: str
     score: float
+
+
+class PlyAnalysis(BaseModel):
+    ply: int
+    role: str
+    move: dict
+    evaluation: float
+    played_score: float
+    best_move: dict
+    best_score: float
+    mistake: float
+
+
+class GameAnalysisResponse(BaseModel):
+    game_id: str
+    mode_used: str
+    plies: List[PlyAnalysis]
+
+
+class BotMatchRequest(BaseModel):
+    role: str = "goat"
+    mode: str = "hybrid"
+    time_control: Optional[str] = None  # "blitz" or "rapid", untimed if omitted
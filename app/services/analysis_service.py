@@ -0,0 +1,30 @@
+import json
+from typing import Dict, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.services.game.ai_service import hybrid_ai_service
+from app.services.replay_service import get_replay
+
+
+async def get_game_analysis(db: Session, game_id: str, mode: str = "hybrid") -> Optional[Dict]:
+    """Get per-ply engine analysis of a finished game, cached since replays are immutable."""
+    redis = await get_redis()
+    # Keyed by the mode that will actually run, so a hybrid request served by
+    # the heuristic fallback hits its cache, and misses it once the model is back
+    mode_used = hybrid_ai_service._mode_used((mode or "hybrid").strip().lower())
+    cache_key = f"analysis:{game_id}:{mode_used}"
+    cached = await redis.get(cache_key)
+    if cached:
+        return json.loads(cached)
+
+    replay = get_replay(db, game_id)
+    if not replay:
+        return None
+    plies, mode_used = await run_in_threadpool(
+        hybrid_ai_service.analyze_game, replay.moves or [], mode
+    )
+    analysis = {"game_id": game_id, "mode_used": mode_used, "plies": plies}
+    await redis.set(cache_key, json.dumps(analysis), ex=settings.ANALYSIS_CACHE_SECONDS)
+    return analysis
@@ -23,7 +23,7 @@ def calculate_new_rating(
 
 
 async def update_elo_ratings(
-    db: Session, winner_id: int, loser_id: int, is_draw: bool = False
+    db: Session, winner_id: int, loser_id: int, is_draw: bool = False, commit: bool = True
 ):
     """Update ELO ratings for both players after a game.
     Args:
@@ -31,6 +31,7 @@ async def update_elo_ratings(
         winner_id: ID of winning player
         loser_id: ID of losing player
         is_draw: Whether the game was a draw
+        commit: Commit here; False only flushes so the caller owns the transaction
     """
     winner = db.query(User).filter(User.id == winner_id).first()
     loser = db.query(User).filter(User.id == loser_id).first()
@@ -52,7 +53,10 @@ async def update_elo_ratings(
     loser_new_rating = calculate_new_rating(loser_rating, loser_expected, loser_actual)
     winner.elo_rating = winner_new_rating
     loser.elo_rating = loser_new_rating
-    db.commit()
+    if commit:
+        db.commit()
+    else:
+        db.flush()
     return {
         "winner": {
             "old_rating": winner_rating,
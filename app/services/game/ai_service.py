@@ -2,7 +2,8 @@ from dataclasses import dataclass
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
-from app.services.game.game_service import ADJACENCY, EMPTY, GOAT, TIGER
+from app.services.game.evaluation import JUMPS, NEIGHBORS, Evaluator
+from app.services.game.game_service import EMPTY, GOAT, TIGER
 
 try:
     import torch
@@ -28,6 +29,7 @@ class HybridAIService:
         self.model = None
         self.model_loaded = False
         self.model_load_error = None
+        self.nodes_evaluated = 0
         self._load_model_if_configured()
 
     def _load_model_if_configured(self):
@@ -47,47 +49,14 @@ class HybridAIService:
         except Exception as exc:
             self.model_load_error = str(exc)
 
-    def _is_in_line(self, pos1: int, pos2: int, pos3: int) -> bool:
-        row1, col1 = pos1 // 5, pos1 % 5
-        row2, col2 = pos2 // 5, pos2 % 5
-        row3, col3 = pos3 // 5, pos3 % 5
-
-        if row1 == row2 == row3:
-            return min(col1, col3) <= col2 <= max(col1, col3)
-        if col1 == col2 == col3:
-            return min(row1, row3) <= row2 <= max(row1, row3)
-        if abs(row1 - row2) == abs(col1 - col2) and abs(row2 - row3) == abs(col2 - col3):
-            return (row2 - row1) * (col3 - col1) == (row3 - row1) * (col2 - col1)
-        return False
-
     def _tiger_capture_goat(self, board: List[int], from_pos: int, to_pos: int) -> Optional[int]:
         if board[from_pos] != TIGER or board[to_pos] != EMPTY:
             return None
-        for adj in ADJACENCY.get(from_pos, []):
-            if board[adj] != GOAT:
-                continue
-            if to_pos in ADJACENCY.get(adj, []) and self._is_in_line(from_pos, adj, to_pos):
-                return adj
+        for over, land in JUMPS[from_pos]:
+            if land == to_pos and board[over] == GOAT:
+                return over
         return None
 
-    def _tiger_legal_moves_from_board(self, board: List[int], tiger_pos: int) -> List[int]:
-        if board[tiger_pos] != TIGER:
-            return []
-
-        legal_moves: List[int] = []
-        for adj in ADJACENCY.get(tiger_pos, []):
-            if board[adj] == EMPTY:
-                legal_moves.append(adj)
-
-        for to_pos in range(25):
-            if board[to_pos] != EMPTY or to_pos == tiger_pos:
-                continue
-            captured = self._tiger_capture_goat(board, tiger_pos, to_pos)
-            if captured is not None:
-                legal_moves.append(to_pos)
-
-        return legal_moves
-
     def _legal_moves(self, state: AIState, role: str) -> List[Dict]:
         board = state.board
         moves: List[Dict] = []
@@ -98,28 +67,24 @@ class HybridAIService:
                     moves.append({"type": "place", "position": position})
             return moves
 
+        piece = GOAT if role == "goat" else TIGER
         for from_pos in range(25):
-            if role == "goat" and board[from_pos] != GOAT:
-                continue
-            if role == "tiger" and board[from_pos] != TIGER:
+            if board[from_pos] != piece:
                 continue
 
-            for to_pos in ADJACENCY.get(from_pos, []):
+            for to_pos in NEIGHBORS[from_pos]:
                 if board[to_pos] == EMPTY:
                     moves.append({"type": "move", "from": from_pos, "to": to_pos})
 
             if role == "tiger":
-                for to_pos in range(25):
-                    if to_pos == from_pos or board[to_pos] != EMPTY:
-                        continue
-                    captured = self._tiger_capture_goat(board, from_pos, to_pos)
-                    if captured is not None:
+                for over, land in JUMPS[from_pos]:
+                    if board[over] == GOAT and board[land] == EMPTY:
                         moves.append(
                             {
                                 "type": "move",
                                 "from": from_pos,
-                                "to": to_pos,
-                                "captured": captured,
+                                "to": land,
+                                "captured": over,
                             }
                         )
         return moves
@@ -160,77 +125,33 @@ class HybridAIService:
         )
 
     def _winner(self, state: AIState) -> Optional[str]:
-        if state.goats_captured >= 5:
-            return "tiger"
-        if state.phase == 2:
-            tiger_has_moves = any(
-                len(self._tiger_legal_moves_from_board(state.board, i)) > 0
-                for i, piece in enumerate(state.board)
-                if piece == TIGER
-            )
-            if not tiger_has_moves:
-                return "goat"
-        return None
-
-    def _count_mobility(self, board: List[int], role: str) -> int:
-        mobility = 0
-        for position in range(25):
-            piece = board[position]
-            if role == "goat" and piece != GOAT:
-                continue
-            if role == "tiger" and piece != TIGER:
-                continue
-            if role == "goat":
-                mobility += sum(1 for nxt in ADJACENCY.get(position, []) if board[nxt] == EMPTY)
-            else:
-                mobility += len(self._tiger_legal_moves_from_board(board, position))
-        return mobility
+        return Evaluator.from_state(state).winner()
 
     def _heuristic_value(self, state: AIState, perspective_role: str) -> float:
-        winner = self._winner(state)
-        if winner == perspective_role:
-            return 10000.0
-        if winner is not None and winner != perspective_role:
-            return -10000.0
-
-        tiger_mobility = self._count_mobility(state.board, "tiger")
-        goat_mobility = self._count_mobility(state.board, "goat")
-        tiger_positions = [i for i, piece in enumerate(state.board) if piece == TIGER]
-        trapped_tigers = sum(
-            1 for pos in tiger_positions if len(self._tiger_legal_moves_from_board(state.board, pos)) == 0
-        )
-
-        center_bonus = 0.0
-        for pos in tiger_positions:
-            row, col = divmod(pos, 5)
-            center_bonus += 4.0 - abs(row - 2) - abs(col - 2)
-
-        tiger_score = (
-            state.goats_captured * 50.0
-            + tiger_mobility * 2.0
-            - goat_mobility * 0.5
-            - trapped_tigers * 15.0
-            + center_bonus * 0.3
-        )
-
-        return tiger_score if perspective_role == "tiger" else -tiger_score
-
-    def _model_value(self, state: AIState, perspective_role: str) -> float:
-        if not self.model_loaded or torch is None or self.model is None:
-            return 0.0
-
-        flat = [float(x) for x in state.board]
-        flat.extend(
-            [
-                float(state.goats_placed) / 20.0,
-                float(state.goats_captured) / 5.0,
-                1.0 if state.turn == "tiger" else 0.0,
-                1.0 if state.phase == 2 else 0.0,
-            ]
-        )
+        return Evaluator.from_state(state).value(perspective_role)
+
+    def _evaluate_moves(
+        self, evaluator: Evaluator, moves: List[Dict], role: str, encode: bool
+    ) -> Tuple[List[float], List[List[float]]]:
+        """Heuristic value (and model input rows) of every move via make/unmake."""
+        values: List[float] = []
+        rows: List[List[float]] = []
+        self.nodes_evaluated += len(moves)
+        for move in moves:
+            evaluator.make(move, role)
+            values.append(evaluator.value(role))
+            if encode:
+                rows.append(evaluator.encode())
+            evaluator.unmake()
+        return values, rows
+
+    def _model_values(self, rows: List[List[float]]) -> List[float]:
+        """Evaluate encoded positions in one batched forward pass, from the tiger's perspective."""
+        if not rows or not self.model_loaded or torch is None or self.model is None:
+            return [0.0] * len(rows)
 
         try:
-            x = torch.tensor([flat], dtype=torch.float32, device=self.device)
+            x = torch.tensor(rows, dtype=torch.float32, device=self.device)
             with torch.no_grad():
                 out = self.model(x)
 
@@ -239,16 +160,42 @@ class HybridAIService:
             else:
                 value = out
 
-            if hasattr(value, "shape") and len(value.shape) > 1:
-                model_value = float(value.reshape(-1)[0].item())
-            else:
-                model_value = float(value.item())
-
-            if perspective_role == "goat":
-                model_value = -model_value
-            return model_value
+            values = value.reshape(len(rows), -1)[:, 0]
+            return [float(v) for v in values.tolist()]
         except Exception:
-            return 0.0
+            return [0.0] * len(rows)
+
+    def _score_children(
+        self,
+        role: str,
+        moves: List[Dict],
+        heuristic_values: List[float],
+        mode: str,
+        model_values: Optional[List[float]],
+    ) -> List[Tuple[float, Dict]]:
+        scored: List[Tuple[float, Dict]] = []
+        for index, move in enumerate(moves):
+            score = heuristic_values[index]
+
+            if model_values is not None and mode in {"model", "hybrid"}:
+                model_bonus = model_values[index]
+                if role == "goat":
+                    model_bonus = -model_bonus
+                if mode == "model":
+                    score = model_bonus * 100.0
+                else:
+                    score += model_bonus * 40.0
+
+            if role == "tiger" and move.get("captured") is not None:
+                score += 10.0
+
+            scored.append((score, move))
+        return scored
+
+    def _mode_used(self, mode: str) -> str:
+        if mode in {"model", "hybrid"} and not self.model_loaded:
+            return "heuristic"
+        return mode
 
     def choose_move(
         self,
@@ -278,22 +225,14 @@ class HybridAIService:
             return None, mode, -9999.0
 
         mode_normalized = (mode or "hybrid").strip().lower()
-        scored: List[Tuple[float, Dict]] = []
-        for move in moves:
-            next_state = self._apply_move(state, move, role)
-            score = self._heuristic_value(next_state, role)
-
-            if mode_normalized in {"model", "hybrid"}:
-                model_bonus = self._model_value(next_state, role)
-                if mode_normalized == "model":
-                    score = model_bonus * 100.0
-                else:
-                    score += model_bonus * 40.0
-
-            if role == "tiger" and move.get("captured") is not None:
-                score += 10.0
-
-            scored.append((score, move))
+        use_model = mode_normalized in {"model", "hybrid"}
+        heuristic_values, rows = self._evaluate_moves(
+            Evaluator.from_state(state), moves, role, use_model
+        )
+        model_values = self._model_values(rows) if use_model else None
+        scored = self._score_children(
+            role, moves, heuristic_values, mode_normalized, model_values
+        )
 
         scored.sort(key=lambda item: item[0], reverse=True)
         k = max(1, min(top_k, len(scored)))
@@ -304,11 +243,72 @@ class HybridAIService:
             top_candidates.sort(key=lambda item: item[0], reverse=True)
             best_score, best_move = top_candidates[0]
 
-        mode_used = mode_normalized
-        if mode_normalized in {"model", "hybrid"} and not self.model_loaded:
-            mode_used = "heuristic"
+        return best_move, self._mode_used(mode_normalized), float(best_score)
 
-        return best_move, mode_used, float(best_score)
+    def _same_move(self, played: Dict, candidate: Dict) -> bool:
+        if played.get("type") != candidate.get("type"):
+            return False
+        if candidate["type"] == "place":
+            return played.get("position") == candidate.get("position")
+        return played.get("from") == candidate.get("from") and played.get("to") == candidate.get("to")
+
+    def analyze_game(self, moves: List[Dict], mode: str = "hybrid") -> Tuple[List[Dict], str]:
+        """Score every ply of a finished game against the engine's best move.
+        All candidate positions of the whole game go through one batched model pass.
+        Returns (plies, mode_used)."""
+        mode_normalized = (mode or "hybrid").strip().lower()
+        use_model = mode_normalized in {"model", "hybrid"}
+        board = [EMPTY] * 25
+        for corner in (0, 4, 20, 24):
+            board[corner] = TIGER
+        evaluator = Evaluator(board, "goat", 1, 0, 0)
+
+        positions = []
+        all_rows: List[List[float]] = []
+        for played in moves:
+            role = evaluator.turn
+            legal = self._legal_moves(evaluator, role)
+            played_index = next(
+                (i for i, move in enumerate(legal) if self._same_move(played, move)),
+                None,
+            )
+            if played_index is None:
+                break
+            heuristic_values, rows = self._evaluate_moves(evaluator, legal, role, use_model)
+            positions.append((role, legal, played_index, heuristic_values, len(all_rows)))
+            all_rows.extend(rows)
+            evaluator.make(legal[played_index], role)
+
+        model_values = self._model_values(all_rows) if use_model else None
+
+        plies: List[Dict] = []
+        for ply, (role, legal, played_index, heuristic_values, offset) in enumerate(
+            positions, start=1
+        ):
+            values = model_values[offset:offset + len(legal)] if model_values is not None else None
+            scored = self._score_children(role, legal, heuristic_values, mode_normalized, values)
+            best_score, best_move = max(scored, key=lambda item: item[0])
+            played_score, played_move = scored[played_index]
+            plies.append(
+                {
+                    "ply": ply,
+                    "role": role,
+                    "move": played_move,
+                    "evaluation": played_score if role == "tiger" else -played_score,
+                    "played_score": played_score,
+                    "best_move": best_move,
+                    "best_score": best_score,
+                    "mistake": max(0.0, best_score - played_score),
+                }
+            )
+
+        return plies, self._mode_used(mode_normalized)
 
 
 hybrid_ai_service = HybridAIService()
+
+
+def choose_move_task(**kwargs) -> Optional[Dict]:
+    """Process pool entry point; each worker process loads the model once on import."""
+    move, _mode_used, _score = hybrid_ai_service.choose_move(**kwargs)
+    return move
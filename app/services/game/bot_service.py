@@ -0,0 +1,239 @@
+import asyncio
+import functools
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import AI_CHOOSE_MOVE_SECONDS
+from app.services.game.ai_service import AIState, choose_move_task, hybrid_ai_service
+from app.services.game.connection_manager import manager
+from app.services.game.evaluation import Evaluator
+
+_MISSING = object()
+
+
+def position_key(state) -> tuple:
+    """Hashable key for a position (works for AIState and BaghChalGame)."""
+    return (
+        tuple(state.board),
+        state.turn,
+        state.phase,
+        state.goats_placed,
+        state.goats_captured,
+    )
+
+
+class BotService:
+    """Seats AI opponents in websocket matches and plays their turns off the event loop."""
+
+    def __init__(self):
+        self.executor: Optional[ProcessPoolExecutor] = None
+        # Per match: the bot's role, its AI mode and the human it plays, who is
+        # told when the seat cannot follow the match to another worker
+        self.seats: Dict[str, Tuple[str, str, Optional[int]]] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.inflight = 0
+        # Pondering: replies precomputed during the human's turn, keyed by position
+        self.ponder_tasks: Dict[str, asyncio.Task] = {}
+        self.ponder_results: Dict[str, Dict[tuple, Optional[Dict]]] = {}
+        self.ponder_pending: Dict[str, Tuple[tuple, asyncio.Future]] = {}
+
+    def _ensure_executor(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=settings.BOT_WORKER_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self.executor
+
+    def has_capacity(self) -> bool:
+        """Check if this worker can seat another bot."""
+        return len(self.seats) < settings.BOT_MAX_ACTIVE_GAMES
+
+    def seat(self, match_id: str, role: str, mode: str, user_id: Optional[int] = None) -> bool:
+        """Seat a bot in a match. Returns False when the worker is at capacity."""
+        if match_id in self.seats:
+            return True
+        if not self.has_capacity():
+            return False
+        self.seats[match_id] = (role, mode, user_id)
+        return True
+
+    def release(self, match_id: str):
+        """Remove the bot from a match and cancel any pending turn."""
+        self.seats.pop(match_id, None)
+        self._stop_pondering(match_id)
+        task = self.tasks.pop(match_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+
+    def notify_turn(self, match_id: str):
+        """Start the bot's turn if it is its move, otherwise ponder the human's replies."""
+        seat = self.seats.get(match_id)
+        if seat is None:
+            return
+        game = manager.get_game(match_id)
+        if game is None:
+            return
+        if game.turn != seat[0]:
+            self._start_pondering(match_id)
+            return
+        task = self.tasks.get(match_id)
+        if task is not None and not task.done():
+            return
+        self.tasks[match_id] = asyncio.create_task(self._play_turn(match_id))
+
+    def _job_done(self, loop: asyncio.AbstractEventLoop):
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(self._release_slot)
+
+    def _release_slot(self):
+        self.inflight -= 1
+
+    async def _choose_move(self, state, role: str, mode: str) -> Optional[Dict]:
+        loop = asyncio.get_running_loop()
+        job = self._ensure_executor().submit(
+            functools.partial(
+                choose_move_task,
+                board=list(state.board),
+                turn=state.turn,
+                phase=state.phase,
+                goats_placed=state.goats_placed,
+                goats_captured=state.goats_captured,
+                ai_role=role,
+                mode=mode,
+            )
+        )
+        # Cancelling the await cannot stop a search a pool process has already
+        # started, so its slot stays taken until the process is really done.
+        self.inflight += 1
+        job.add_done_callback(lambda _job: self._job_done(loop))
+        start = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(job)
+        finally:
+            AI_CHOOSE_MOVE_SECONDS.labels(mode).observe(time.perf_counter() - start)
+
+    async def _play_turn(self, match_id: str):
+        from app.services.game.match_service import play_move
+
+        if await self._hand_over(match_id):
+            return
+        role, mode, _user_id = self.seats[match_id]
+        game = manager.get_game(match_id)
+        ply = len(game.move_history)
+        key = position_key(game)
+
+        move = self.ponder_results.get(match_id, {}).get(key, _MISSING)
+        pending = self.ponder_pending.get(match_id)
+        warm = pending[1] if pending is not None and pending[0] == key else None
+        self._stop_pondering(match_id, keep=warm)
+        try:
+            if move is _MISSING:
+                if warm is not None:
+                    move = await warm
+                else:
+                    move = await self._choose_move(game, role, mode)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Bot move error: {e}")
+            return
+
+        # The match may have ended or moved on while the pool was thinking.
+        game = manager.get_game(match_id)
+        if match_id not in self.seats or game is None or move is None:
+            return
+        if game.turn != role or len(game.move_history) != ply:
+            return
+        if await self._hand_over(match_id):
+            return
+        success, error_msg, _winner = await play_move(match_id, role, move)
+        if not success:
+            print(f"Bot move rejected: {error_msg}")
+
+    async def _hand_over(self, match_id: str) -> bool:
+        """Move the seat to the worker holding the match lease when that is not
+        this one, so the bot's moves are only ever played by the owner."""
+        owner = await manager.acquire_match(match_id)
+        if owner == manager.instance_id:
+            return False
+        if owner is not None:
+            role, mode, user_id = self.seats.pop(match_id)
+            self._stop_pondering(match_id)
+            self.tasks.pop(match_id, None)
+            await manager.forward_to_owner(
+                owner,
+                {
+                    "type": "bot",
+                    "match_id": match_id,
+                    "user_id": user_id,
+                    "role": role,
+                    "mode": mode,
+                },
+            )
+        return True
+
+    def _likely_replies(self, state: AIState, role: str) -> List[AIState]:
+        """Positions after the opponent's most promising replies, best first."""
+        moves = hybrid_ai_service._legal_moves(state, role)
+        values, _rows = hybrid_ai_service._evaluate_moves(
+            Evaluator.from_state(state), moves, role, False
+        )
+        ranked = sorted(range(len(moves)), key=lambda i: values[i], reverse=True)
+        return [
+            hybrid_ai_service._apply_move(state, moves[i], role)
+            for i in ranked[: settings.BOT_PONDER_MAX_POSITIONS]
+        ]
+
+    def _start_pondering(self, match_id: str):
+        if not settings.BOT_PONDER_ENABLED or match_id in self.ponder_tasks:
+            return
+        self.ponder_tasks[match_id] = asyncio.create_task(self._ponder(match_id))
+
+    def _stop_pondering(self, match_id: str, keep: Optional[asyncio.Future] = None):
+        task = self.ponder_tasks.pop(match_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+        pending = self.ponder_pending.pop(match_id, None)
+        if pending is not None and pending[1] is not keep:
+            pending[1].cancel()
+        self.ponder_results.pop(match_id, None)
+
+    async def _ponder(self, match_id: str):
+        role, mode, _user_id = self.seats[match_id]
+        game = manager.get_game(match_id)
+        state = AIState(
+            board=list(game.board),
+            turn=game.turn,
+            phase=game.phase,
+            goats_placed=game.goats_placed,
+            goats_captured=game.goats_captured,
+        )
+        results = self.ponder_results.setdefault(match_id, {})
+        try:
+            for child in self._likely_replies(state, game.turn):
+                # Only use idle pool capacity so pondering never delays real moves.
+                if self.inflight >= settings.BOT_WORKER_PROCESSES:
+                    return
+                key = position_key(child)
+                future = asyncio.ensure_future(self._choose_move(child, role, mode))
+                self.ponder_pending[match_id] = (key, future)
+                results[key] = await asyncio.shield(future)
+                self.ponder_pending.pop(match_id, None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Bot ponder error: {e}")
+
+    def shutdown(self):
+        for match_id in list(self.seats):
+            self.release(match_id)
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+bot_service = BotService()
@@ -0,0 +1,116 @@
+import asyncio
+import heapq
+import time
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.services.game.connection_manager import CLOCKS_KEY, manager
+
+
+def now_ms() -> int:
+    """Wall-clock milliseconds; clocks are compared across workers."""
+    return int(time.time() * 1000)
+
+
+class ClockScheduler:
+    """Fires flag-fall for the timed games owned by this worker.
+
+    Every move pushes (deadline, match, version) onto a single heap and
+    entries made stale by a later move are dropped when they surface, so a
+    running clock costs one heap entry rather than a sleeping task. The
+    deadlines are also kept in the CLOCKS_KEY sorted set; a periodic sweep
+    takes over overdue matches whose owner stopped renewing its lease."""
+
+    def __init__(self):
+        self.heap: List[Tuple[int, str, int]] = []
+        self.wakeup: Optional[asyncio.Event] = None
+        self.task: Optional[asyncio.Task] = None
+        self.flagged = 0
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self._run())
+
+    def schedule(self, match_id: str, game):
+        """Arm the flag of the side to move in `game`, if its clock is running."""
+        deadline = game.clock_deadline_ms()
+        if deadline is None:
+            return
+        entry = (deadline, match_id, game.version)
+        heapq.heappush(self.heap, entry)
+        self.start()
+        if self.heap[0] == entry:
+            self.wakeup.set()
+
+    def pop_due(self, now: int) -> List[str]:
+        """Matches whose current deadline has passed; stale entries are dropped."""
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            _deadline, match_id, version = heapq.heappop(self.heap)
+            game = manager.get_game(match_id)
+            if (
+                game is not None
+                and game.version == version
+                and match_id in manager.owned_matches
+            ):
+                due.append(match_id)
+        return due
+
+    async def _run(self):
+        next_sweep = 0
+        while True:
+            now = now_ms()
+            if now >= next_sweep:
+                await self._sweep(now)
+                next_sweep = now + int(settings.CLOCK_SWEEP_SECONDS * 1000)
+            for match_id in self.pop_due(now_ms()):
+                await self._flag(match_id)
+            wake_at = min(next_sweep, self.heap[0][0]) if self.heap else next_sweep
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self.wakeup.wait(), max(0, wake_at - now_ms()) / 1000
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def forget(self, match_id: str):
+        """Drop a match whose game no longer has a clock from the sorted set."""
+        redis = await get_redis()
+        await redis.zrem(CLOCKS_KEY, match_id)
+
+    async def _sweep(self, now: int):
+        try:
+            redis = await get_redis()
+            overdue = await redis.zrangebyscore(CLOCKS_KEY, "-inf", now, start=0, num=100)
+        except Exception as e:
+            print(f"Clock sweep error: {e}")
+            return
+        for match_id in overdue:
+            try:
+                owner = await manager.acquire_match(match_id)
+            except Exception as e:
+                print(f"Clock sweep error for {match_id}: {e}")
+                continue
+            if owner == manager.instance_id:
+                await self._flag(match_id)
+
+    async def _flag(self, match_id: str):
+        from app.services.game.match_service import flag_if_expired
+
+        try:
+            if await flag_if_expired(match_id):
+                self.flagged += 1
+        except Exception as e:
+            print(f"Clock flag error for {match_id}: {e}")
+
+    def stop(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        self.task = None
+        self.heap.clear()
+
+
+clock_scheduler = ClockScheduler()
@@ -1,45 +1,239 @@
 import json
 import asyncio
+import time
 import uuid
-import os
-from typing import Dict, Set
-from fastapi import WebSocket
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+from fastapi import WebSocket, WebSocketDisconnect
 from app.services.game.game_service import BaghChalGame
+from app.services.game.protocol import JSON_PROTOCOL
+from app.services.game.timer_wheel import TimerWheel
+from app.core.config import settings
+from app.core.metrics import BROADCAST_SECONDS, PUBSUB_LAG_SECONDS
 from app.core.redis import get_redis
 
+# Append an event to the match stream, then wake every other worker hosting
+# sockets of the match with "event:<match>\n<previous id>\n<id>\n<json>"
+FANOUT_SCRIPT = """
+local last = redis.call('XREVRANGE', KEYS[2], '+', '-', 'COUNT', 1)
+local prev = last[1] and last[1][1] or '0-0'
+local id = redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[4], '*', 'event', ARGV[3])
+local payload = 'event:' .. ARGV[2] .. '\\n' .. prev .. '\\n' .. id .. '\\n' .. ARGV[3]
+for _, worker in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    if worker ~= ARGV[1] then
+        redis.call('PUBLISH', 'worker:' .. worker, payload)
+    end
+end
+return id
+"""
+# Renew/release a match lease only while this worker still holds it
+LEASE_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+LEASE_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+# Spectators are a sorted set of conn ids scored by expiry (ms); workers renew
+# their own, so viewers of a crashed worker fall out of the count. Admission
+# returns the new count, or 0 when the match is full.
+# ARGV: conn id, now, expiry, limit
+SPECTATOR_ADMIT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+local watching = redis.call('ZCARD', KEYS[1])
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) == false then
+    if watching >= tonumber(ARGV[4]) then
+        return 0
+    end
+    watching = watching + 1
+end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+redis.call('PEXPIREAT', KEYS[1], ARGV[3])
+return watching
+"""
+# Everything a player's socket needs on connect, in one round trip: the match
+# hash, its own connection flag, both players' flags, the pending grace key,
+# the worker route, the lease, the newest event id and, unless the caller's
+# resident copy is current ('skip' or equal version), the persisted game.
+# KEYS: match, ws_conn, grace, match_workers, match_owner, game, game_moves,
+# game_history, match_events, resume
+# ARGV: user id, conn id, worker id, lease seconds, resident version, match id
+BOOTSTRAP_SCRIPT = """
+local match = redis.call('HGETALL', KEYS[1])
+if #match == 0 then
+    return {}
+end
+local fields = {}
+for i = 1, #match, 2 do
+    fields[match[i]] = match[i + 1]
+end
+if fields['p1'] ~= ARGV[1] and fields['p2'] ~= ARGV[1] then
+    return {match}
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', 3600)
+redis.call('SET', KEYS[10], ARGV[1], 'EX', 3600)
+local returning = redis.call('DEL', KEYS[3])
+redis.call('SADD', KEYS[4], ARGV[3])
+local owner = redis.call('GET', KEYS[5])
+if not owner then
+    redis.call('SET', KEYS[5], ARGV[3], 'EX', ARGV[4])
+    owner = ARGV[3]
+end
+local connected = 0
+for _, player in ipairs({fields['p1'], fields['p2']}) do
+    connected = connected + redis.call('EXISTS', 'ws_conn:' .. ARGV[6] .. ':' .. player)
+end
+local last = redis.call('XREVRANGE', KEYS[9], '+', '-', 'COUNT', 1)
+local event_id = last[1] and last[1][1] or ''
+local game = 0
+-- A game never saved is at version 0, the same as a fresh resident copy
+local version = redis.call('HGET', KEYS[6], 'version') or '0'
+if ARGV[5] ~= 'skip' and version ~= ARGV[5] then
+    game = {
+        redis.call('HGETALL', KEYS[6]),
+        redis.call('LRANGE', KEYS[7], 0, -1),
+        redis.call('SMEMBERS', KEYS[8]),
+    }
+end
+return {match, returning, owner, connected, event_id, game}
+"""
+
+# Sorted set of running clocks scored by flag-fall time (epoch ms), so any
+# worker can find overdue matches whose owner has gone away
+CLOCKS_KEY = "match_clocks"
+
+
+def game_keys(match_id: str) -> Tuple[str, str, str]:
+    """Redis keys of a game: scalar hash, appended move list and board-hash set."""
+    return f"game:{match_id}", f"game_moves:{match_id}", f"game_history:{match_id}"
+
+
+def events_key(match_id: str) -> str:
+    """Redis stream holding the recent events of a match."""
+    return f"match_events:{match_id}"
+
+
+def with_event_id(text: str, event_id: str) -> str:
+    """Add the stream id to an encoded event object without re-encoding it."""
+    return f'{text[:-1]},"eid":"{event_id}"}}'
+
+
+def grace_key(match_id: str, user_id: int) -> str:
+    """Redis key reserving a disconnected player's seat during the grace window."""
+    return f"grace:{match_id}:{user_id}"
+
+
+def role_in_match(match_data: dict, user_id: int) -> Optional[str]:
+    """Role of a user in a match hash: p1 plays goat, p2 plays tiger."""
+    p1 = match_data.get(b"p1") or match_data.get("p1")
+    p2 = match_data.get(b"p2") or match_data.get("p2")
+    p1 = p1.decode() if isinstance(p1, bytes) else p1
+    p2 = p2.decode() if isinstance(p2, bytes) else p2
+    if str(user_id) == p1:
+        return "goat"
+    elif str(user_id) == p2:
+        return "tiger"
+    return None
+
+
+# A client leaving after game_over or navigating away, not worth logging
+NORMAL_CLOSE_CODES = (1000, 1001)
+
+
+def closed_normally(error: Exception) -> bool:
+    """Whether a send failed only because the peer had already closed the socket.
+
+    Starlette reports the close code; uvicorn raises ClientDisconnected, an
+    OSError without one, for a peer that has gone away."""
+    if isinstance(error, WebSocketDisconnect):
+        return error.code in NORMAL_CLOSE_CODES
+    return isinstance(error, OSError)
+
+
+def _stream_order(event_id: str) -> Tuple[int, int]:
+    millis, _, seq = event_id.partition("-")
+    return int(millis), int(seq or 0)
+
 
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, Set[WebSocket]] = {}
-        self.games: Dict[str, BaghChalGame] = {}
+        # Read-only viewers; they share the match broadcast, served after the players
+        self.spectators: Dict[str, Set[WebSocket]] = {}
+        # Each viewer's entry in match_spectators, renewed by spectator_task
+        self.spectator_ids: Dict[WebSocket, str] = {}
+        self.spectator_task = None
+        # Resident games, least recently used first; idle ones are written
+        # back and dropped by _evict_games
+        self.games: "OrderedDict[str, BaghChalGame]" = OrderedDict()
+        self.game_touched: Dict[str, float] = {}
+        self.evict_task = None
+        self.evicted_games = 0
         self.connection_info: Dict[WebSocket, tuple] = {}
+        # Multiplexed sockets and the matches each follows; their connection_info
+        # is (None, user_id) and every match frame they get carries its match id
+        self.subscriptions: Dict[WebSocket, Set[str]] = {}
+        self.protocols: Dict[WebSocket, object] = {}
+        # Outbound frames per socket, drained by one writer task each, so a
+        # slow client never stalls fan-out to anyone else
+        self.send_queues: Dict[WebSocket, asyncio.Queue] = {}
+        self.writer_tasks: Dict[WebSocket, asyncio.Task] = {}
+        # Closes of idle and slow sockets, started from sync callbacks
+        self.close_tasks: Set[asyncio.Task] = set()
+        self.evicted_connections = 0
         self.instance_id = str(uuid.uuid4())
         self.pubsub = None
         self.pubsub_reader_task = None
-        self.subscribed_matches: Set[str] = set()
+        # What has already been written per game: (version, moves, board codes)
+        self.persisted: Dict[str, Tuple[int, int, int]] = {}
+        # The only channel this worker subscribes to: match events routed through
+        # match_workers:{id}, and moves/finishes forwarded to matches it owns
+        self.worker_channel = f"worker:{self.instance_id}"
+        # Matches this worker holds the lease for; their resident game is authoritative
+        self.owned_matches: Set[str] = set()
+        self.lease_task = None
+        # Commands forwarded to other owners and still waiting for their ack
+        self.pending_forwards: Dict[str, asyncio.TimerHandle] = {}
+        self.forward_expiries: Set[asyncio.Task] = set()
+        self.worker_messages: Set[asyncio.Task] = set()
+        # Newest stream id relayed per hosted match, used to spot missed events
+        self.last_event_ids: Dict[str, str] = {}
+        # Pending forfeits of disconnected players, keyed by (match id, user id);
+        # their games stay resident until the grace window closes
+        self.grace_timers: Dict[Tuple[str, int], asyncio.TimerHandle] = {}
+        self.grace_expiries: Set[asyncio.Task] = set()
+        # Server-side liveness: sockets silent for WS_IDLE_SECONDS get a ping,
+        # then are closed if they stay silent; never touches Redis
+        self.idle_wheel = TimerWheel(
+            settings.WS_IDLE_TICK_SECONDS,
+            settings.WS_IDLE_SECONDS,
+            settings.WS_PING_TIMEOUT_SECONDS,
+            self._ping_idle,
+            self._close_idle,
+        )
+        self.idle_closed = 0
+
+    async def start(self):
+        """Subscribe to this worker's channel ahead of the first connection."""
+        try:
+            await self._ensure_pubsub()
+        except Exception as e:
+            print(f"PubSub subscribe deferred to first connection: {e}")
 
     async def _ensure_pubsub(self):
         if self.pubsub is None:
             redis = await get_redis()
-            self.pubsub = redis.pubsub()
+            pubsub = redis.pubsub()
+            await pubsub.subscribe(self.worker_channel)
+            self.pubsub = pubsub
         if self.pubsub_reader_task is None or self.pubsub_reader_task.done():
             self.pubsub_reader_task = asyncio.create_task(self._pubsub_reader())
 
-    async def _subscribe_match_channel(self, match_id: str):
-        await self._ensure_pubsub()
-        if match_id in self.subscribed_matches:
-            return
-        channel = f"match_events:{match_id}"
-        await self.pubsub.subscribe(channel)
-        self.subscribed_matches.add(match_id)
-
-    async def _unsubscribe_match_channel(self, match_id: str):
-        if self.pubsub is None or match_id not in self.subscribed_matches:
-            return
-        channel = f"match_events:{match_id}"
-        await self.pubsub.unsubscribe(channel)
-        self.subscribed_matches.discard(match_id)
-
     async def _pubsub_reader(self):
         try:
             async for raw_message in self.pubsub.listen():
@@ -47,81 +241,540 @@ class ConnectionManager:
                 if msg_type != "message":
                     continue
 
-                channel = raw_message.get("channel")
-                if isinstance(channel, bytes):
-                    channel = channel.decode("utf-8")
-                if not channel or not channel.startswith("match_events:"):
-                    continue
-
-                match_id = channel.split("match_events:", 1)[1]
                 payload = raw_message.get("data")
                 if isinstance(payload, bytes):
                     payload = payload.decode("utf-8")
                 if not payload:
                     continue
 
+                if payload.startswith("event:"):
+                    header, prev_id, event_id, body = payload.split("\n", 3)
+                    await self._relay_event(header[len("event:"):], prev_id, event_id, body)
+                    continue
+
                 try:
                     message = json.loads(payload)
                 except Exception:
                     continue
-
-                if isinstance(message, dict) and "payload" in message:
-                    origin_pid = message.get("_origin_pid")
-                    payload_message = message.get("payload")
-                    if origin_pid is not None:
-                        try:
-                            if int(origin_pid) == os.getpid():
-                                continue
-                        except Exception:
-                            pass
-                    if isinstance(payload_message, dict):
-                        await self._broadcast_local(match_id, payload_message)
-                elif isinstance(message, dict):
-                    await self._broadcast_local(match_id, message)
+                if isinstance(message, dict):
+                    task = asyncio.create_task(self._handle_worker_message(message))
+                    self.worker_messages.add(task)
+                    task.add_done_callback(self.worker_messages.discard)
         except Exception as e:
             print(f"PubSub reader stopped: {e}")
 
-    async def _broadcast_local(self, match_id: str, message: dict):
-        if match_id not in self.active_connections:
+    async def acquire_match(self, match_id: str) -> Optional[str]:
+        """Return the id of the worker owning a match, taking the lease if it is free."""
+        if match_id in self.owned_matches:
+            return self.instance_id
+        redis = await get_redis()
+        key = f"match_owner:{match_id}"
+        for _ in range(2):
+            owner = await redis.get(key)
+            if owner:
+                return owner.decode() if isinstance(owner, bytes) else owner
+            acquired = await redis.set(
+                key, self.instance_id, nx=True, ex=settings.MATCH_LEASE_SECONDS
+            )
+            if acquired:
+                self.owned_matches.add(match_id)
+                self._ensure_lease_renewal()
+                # Start from what the previous owner persisted
+                await self.refresh_game(match_id)
+                return self.instance_id
+        return None
+
+    async def release_match(self, match_id: str):
+        """Give up the lease so a worker that still has players can take over."""
+        if match_id not in self.owned_matches:
             return
-        connections = list(self.active_connections[match_id])
+        self.owned_matches.discard(match_id)
+        try:
+            redis = await get_redis()
+            await redis.eval(
+                LEASE_RELEASE_SCRIPT, 1, f"match_owner:{match_id}", self.instance_id
+            )
+        except Exception as e:
+            print(f"Error releasing match lease: {e}")
+
+    def _ensure_lease_renewal(self):
+        if self.lease_task is None or self.lease_task.done():
+            self.lease_task = asyncio.create_task(self._renew_leases())
+
+    async def _renew_leases(self):
+        interval = max(1, settings.MATCH_LEASE_SECONDS // 3)
+        while self.owned_matches:
+            await asyncio.sleep(interval)
+            try:
+                redis = await get_redis()
+                for match_id in list(self.owned_matches):
+                    renewed = await redis.eval(
+                        LEASE_RENEW_SCRIPT,
+                        1,
+                        f"match_owner:{match_id}",
+                        self.instance_id,
+                        settings.MATCH_LEASE_SECONDS,
+                    )
+                    if not renewed:
+                        # Someone else owns it now; our copy is no longer authoritative
+                        self.owned_matches.discard(match_id)
+            except Exception as e:
+                print(f"Error renewing match leases: {e}")
+
+    async def forward_to_owner(self, owner_id: str, message: dict):
+        """Send a command (move/finish/bot) to the worker owning the match.
+
+        The owner acks every command; one that stays silent for
+        MATCH_FORWARD_TIMEOUT_SECONDS is taken for dead and loses its lease.
+        """
+        redis = await get_redis()
+        request_id = str(uuid.uuid4())
+        message["reply_to"] = self.worker_channel
+        message["request_id"] = request_id
+
+        def expire():
+            task = asyncio.create_task(self._expire_forward(request_id, owner_id, message))
+            self.forward_expiries.add(task)
+            task.add_done_callback(self.forward_expiries.discard)
+
+        self.pending_forwards[request_id] = asyncio.get_running_loop().call_later(
+            settings.MATCH_FORWARD_TIMEOUT_SECONDS, expire
+        )
+        await redis.publish(f"worker:{owner_id}", json.dumps(message))
+
+    async def _expire_forward(self, request_id: str, owner_id: str, message: dict):
+        self.pending_forwards.pop(request_id, None)
+        match_id = message.get("match_id")
+        try:
+            # Only deletes the lease while the silent worker still holds it, so
+            # the client's retry lets a live worker take the match over
+            redis = await get_redis()
+            await redis.eval(LEASE_RELEASE_SCRIPT, 1, f"match_owner:{match_id}", owner_id)
+        except Exception as e:
+            print(f"Error taking over match lease: {e}")
+        await self.send_to_user(
+            match_id,
+            message.get("user_id"),
+            {"type": "error", "message": "Match owner not responding, please retry"},
+        )
+
+    async def _handle_worker_message(self, message: dict):
+        from app.services.game.bot_service import bot_service
+        from app.services.game.match_service import (
+            finish_match,
+            play_move,
+            stale_move_reply,
+        )
+
+        command = message.get("type")
+        match_id = message.get("match_id")
+        try:
+            if command == "reply":
+                timer = self.pending_forwards.pop(message.get("request_id"), None)
+                if timer is not None:
+                    timer.cancel()
+                if message.get("payload"):
+                    await self.send_to_user(match_id, message.get("user_id"), message.get("payload"))
+                return
+            # Every command gets a reply, an empty one on success, so the
+            # sender knows this worker is alive
+            reply = None
+            if match_id not in self.owned_matches:
+                reply = {"type": "error", "message": "Match owner changed, please retry"}
+            elif command == "move":
+                role = message.get("role")
+                move = message.get("message") or {}
+                reply = stale_move_reply(self.get_game(match_id), role, move)
+                if reply is None:
+                    success, error_msg, _winner = await play_move(match_id, role, move)
+                    if not success:
+                        reply = {"type": "error", "message": error_msg}
+            elif command == "bot":
+                if bot_service.seat(
+                    match_id, message.get("role"), message.get("mode"), message.get("user_id")
+                ):
+                    bot_service.notify_turn(match_id)
+                else:
+                    # Free the lease so the player's reconnect can land on a worker with room
+                    await self.release_match(match_id)
+                    reply = {"type": "error", "message": "No bot capacity available"}
+            elif command == "finish":
+                await finish_match(
+                    match_id,
+                    message.get("winner"),
+                    message.get("reason"),
+                    message=message.get("message"),
+                )
+            else:
+                return
+            if not message.get("reply_to"):
+                return
+            redis = await get_redis()
+            await redis.publish(
+                message.get("reply_to"),
+                json.dumps(
+                    {
+                        "type": "reply",
+                        "match_id": match_id,
+                        "user_id": message.get("user_id"),
+                        "request_id": message.get("request_id"),
+                        "payload": reply,
+                    }
+                ),
+            )
+        except Exception as e:
+            print(f"Error handling forwarded {command}: {e}")
+
+    def _note_event(self, match_id: str, event_id: str):
+        last = self.last_event_ids.get(match_id)
+        if last is None or _stream_order(event_id) > _stream_order(last):
+            self.last_event_ids[match_id] = event_id
+
+    async def _relay_event(self, match_id: str, prev_id: str, event_id: str, body: str):
+        """Forward another worker's event, first replaying any the pubsub dropped."""
+        last = self.last_event_ids.get(match_id)
+        if last is not None and _stream_order(prev_id) > _stream_order(last):
+            try:
+                redis = await get_redis()
+                missed = await redis.xrange(events_key(match_id), last, prev_id)
+            except Exception as e:
+                print(f"Error reading match events: {e}")
+                missed = []
+            for missed_id, fields in missed:
+                if missed_id != last:
+                    await self._broadcast_local(
+                        match_id, None, with_event_id(fields["event"], missed_id)
+                    )
+        self._note_event(match_id, event_id)
+        # Stream ids start with the Redis server time of the XADD
+        PUBSUB_LAG_SECONDS.observe(max(0.0, time.time() - _stream_order(event_id)[0] / 1000))
+        await self._broadcast_local(match_id, None, with_event_id(body, event_id))
+
+    async def _broadcast_local(
+        self, match_id: str, message: Optional[dict], text: Optional[str] = None
+    ):
+        """Send an event to local sockets, encoding it at most once per wire format."""
+        start = time.perf_counter()
+        connections = list(self.active_connections.get(match_id, ()))
+        connections.extend(self.spectators.get(match_id, ()))
+        frames = {} if text is None else {(False, False): text}
         for connection in connections:
+            protocol = self.protocols.get(connection, JSON_PROTOCOL)
+            key = (protocol.binary, connection in self.subscriptions)
+            frame = frames.get(key)
+            if frame is None:
+                frame = frames.get((protocol.binary, False))
+                if frame is None:
+                    if message is None:
+                        message = JSON_PROTOCOL.decode(text)
+                    frame = frames[(protocol.binary, False)] = protocol.encode(message)
+                if key[1]:
+                    frame = frames[key] = protocol.tag(frame, match_id)
+            self._enqueue(connection, protocol, frame)
+        BROADCAST_SECONDS.observe(time.perf_counter() - start)
+
+    def _hosts(self, match_id: str) -> bool:
+        return bool(self.active_connections.get(match_id) or self.spectators.get(match_id))
+
+    async def connect(
+        self, websocket: WebSocket, match_id: str, user_id: int, spectator: bool = False
+    ):
+        """Connect a websocket to a match room (read-only for spectators)."""
+        hosted = self._hosts(match_id)
+        rooms = self.spectators if spectator else self.active_connections
+        rooms.setdefault(match_id, set()).add(websocket)
+        self._join(websocket, match_id, user_id)
+        await self._ensure_pubsub()
+        if not hosted:
+            redis = await get_redis()
+            await redis.sadd(f"match_workers:{match_id}", self.instance_id)
+        if match_id not in self.owned_matches:
+            await self.refresh_game(match_id)
+
+    async def watch(self, websocket: WebSocket, match_id: str, conn_id: str) -> int:
+        """Connect a spectator if the match has room for one more.
+
+        Returns the number of viewers including this one, or 0 when the match
+        already has SPECTATORS_PER_MATCH. The entry is removed when the socket
+        leaves the match."""
+        redis = await get_redis()
+        now = int(time.time() * 1000)
+        watching = await redis.eval(
+            SPECTATOR_ADMIT_SCRIPT,
+            1,
+            f"match_spectators:{match_id}",
+            conn_id,
+            now,
+            now + settings.SPECTATOR_TTL_SECONDS * 1000,
+            settings.SPECTATORS_PER_MATCH,
+        )
+        if watching:
+            self.spectator_ids[websocket] = conn_id
+            await self.connect(websocket, match_id, None, spectator=True)
+            if self.spectator_task is None or self.spectator_task.done():
+                self.spectator_task = asyncio.create_task(self._renew_spectators())
+        return watching
+
+    async def _renew_spectators(self):
+        interval = max(1, settings.SPECTATOR_TTL_SECONDS // 3)
+        while self.spectators:
+            await asyncio.sleep(interval)
             try:
-                await connection.send_json(message)
+                redis = await get_redis()
+                expiry = int(time.time() * 1000) + settings.SPECTATOR_TTL_SECONDS * 1000
+                async with redis.pipeline(transaction=False) as pipe:
+                    for match_id, room in list(self.spectators.items()):
+                        key = f"match_spectators:{match_id}"
+                        conn_ids = {self.spectator_ids[ws] for ws in room if ws in self.spectator_ids}
+                        if conn_ids:
+                            pipe.zadd(key, dict.fromkeys(conn_ids, expiry), xx=True)
+                            pipe.pexpireat(key, expiry)
+                    await pipe.execute()
             except Exception as e:
-                print(f"Error local-broadcasting to connection: {e}")
-                await self.disconnect(connection)
-
-    async def connect(self, websocket: WebSocket, match_id: str, user_id: int):
-        """Connect a websocket to a match room."""
-        if match_id not in self.active_connections:
-            self.active_connections[match_id] = set()
-        self.active_connections[match_id].add(websocket)
-        self.connection_info[websocket] = (match_id, user_id)
-        await self._subscribe_match_channel(match_id)
-        if match_id not in self.games:
-            await self.load_game(match_id)
+                print(f"Error renewing spectators: {e}")
+
+    def multiplex(self, websocket: WebSocket, user_id: int):
+        """Register an accepted socket that will subscribe to several matches."""
+        self.subscriptions[websocket] = set()
+        self.connection_info[websocket] = (None, user_id)
+
+    def _join(self, websocket: WebSocket, match_id: str, user_id: int):
+        subscribed = self.subscriptions.get(websocket)
+        if subscribed is None:
+            self.connection_info[websocket] = (match_id, user_id)
+        else:
+            subscribed.add(match_id)
+
+    async def unsubscribe(self, websocket: WebSocket, match_id: str):
+        """Take a multiplexed socket out of one match, keeping the socket open."""
+        subscribed = self.subscriptions.get(websocket)
+        if subscribed is not None and match_id in subscribed:
+            subscribed.discard(match_id)
+            await self._leave(websocket, match_id)
 
     async def disconnect(self, websocket: WebSocket):
         """Disconnect a websocket."""
+        self.send_queues.pop(websocket, None)
+        self.idle_wheel.discard(websocket)
+        writer = self.writer_tasks.pop(websocket, None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
         if websocket in self.connection_info:
-            match_id, user_id = self.connection_info[websocket]
-            if match_id in self.active_connections:
-                self.active_connections[match_id].discard(websocket)
-                if len(self.active_connections[match_id]) == 0:
-                    del self.active_connections[match_id]
-                    await self._unsubscribe_match_channel(match_id)
-                    if match_id in self.games:
-                        await self.save_game(match_id)
-                        del self.games[match_id]
-            del self.connection_info[websocket]
+            match_id, _user_id = self.connection_info.pop(websocket)
+            subscribed = self.subscriptions.pop(websocket, None)
+            for match_id in (match_id,) if subscribed is None else subscribed:
+                await self._leave(websocket, match_id)
+        self.spectator_ids.pop(websocket, None)
+        self.protocols.pop(websocket, None)
+
+    async def _leave(self, websocket: WebSocket, match_id: str):
+        watched = websocket in self.spectators.get(match_id, ())
+        for rooms in (self.active_connections, self.spectators):
+            room = rooms.get(match_id)
+            if room is not None and websocket in room:
+                room.discard(websocket)
+                if not room:
+                    del rooms[match_id]
+        if watched and websocket in self.spectator_ids:
+            try:
+                redis = await get_redis()
+                await redis.zrem(f"match_spectators:{match_id}", self.spectator_ids[websocket])
+            except Exception as e:
+                print(f"Error leaving spectators: {e}")
+        if not self._hosts(match_id):
+            try:
+                redis = await get_redis()
+                await redis.srem(f"match_workers:{match_id}", self.instance_id)
+            except Exception as e:
+                print(f"Error leaving match route: {e}")
+            self.last_event_ids.pop(match_id, None)
+            await self._evict_if_idle(match_id)
+
+    def _pinned(self, match_id: str) -> bool:
+        return self._hosts(match_id) or any(key[0] == match_id for key in self.grace_timers)
+
+    async def _evict_if_idle(self, match_id: str):
+        """Write back and drop a game nobody is connected to or waiting on."""
+        if self._pinned(match_id):
+            return
+        if match_id in self.games:
+            await self.save_game(match_id)
+            self._drop_game(match_id)
+        await self.release_match(match_id)
+
+    def _drop_game(self, match_id: str):
+        from app.services.game.bot_service import bot_service
+
+        # The bot only plays on the lease owner, which this worker stops being
+        bot_service.release(match_id)
+        self.games.pop(match_id, None)
+        self.game_touched.pop(match_id, None)
+        self.persisted.pop(match_id, None)
+
+    def _ensure_eviction(self):
+        if self.evict_task is None or self.evict_task.done():
+            try:
+                self.evict_task = asyncio.get_running_loop().create_task(self._evict_games())
+            except RuntimeError:
+                pass
+
+    async def _evict_games(self):
+        while self.games:
+            await asyncio.sleep(settings.GAME_EVICT_INTERVAL_SECONDS)
+            try:
+                await self.evict_idle_games()
+            except Exception as e:
+                print(f"Error evicting idle games: {e}")
+
+    async def evict_idle_games(self, now: Optional[float] = None) -> int:
+        """Write back and drop resident games that no local socket or grace
+        window needs, oldest first: all those untouched for GAME_IDLE_SECONDS,
+        then more while over MAX_RESIDENT_GAMES. Returns how many were dropped."""
+        now = time.monotonic() if now is None else now
+        excess = len(self.games) - settings.MAX_RESIDENT_GAMES
+        evicted = 0
+        for match_id in list(self.games):
+            idle = now - self.game_touched.get(match_id, now) >= settings.GAME_IDLE_SECONDS
+            if not idle and evicted >= excess:
+                # LRU order: everything after this was touched more recently
+                break
+            if self._pinned(match_id):
+                continue
+            await self.save_game(match_id)
+            self._drop_game(match_id)
+            await self.release_match(match_id)
+            evicted += 1
+        self.evicted_games += evicted
+        return evicted
+
+    async def start_grace(self, match_id: str, user_id: int, on_expiry):
+        """Hold a disconnected player's seat; on_expiry() runs if they are not back in time."""
+        redis = await get_redis()
+        await redis.set(
+            grace_key(match_id, user_id),
+            self.instance_id,
+            px=int(settings.RECONNECT_GRACE_SECONDS * 2000),
+        )
+        previous = self.grace_timers.pop((match_id, user_id), None)
+        if previous is not None:
+            previous.cancel()
+
+        def expire():
+            task = asyncio.create_task(self._expire_grace(match_id, user_id, on_expiry))
+            self.grace_expiries.add(task)
+            task.add_done_callback(self.grace_expiries.discard)
+
+        self.grace_timers[(match_id, user_id)] = asyncio.get_running_loop().call_later(
+            settings.RECONNECT_GRACE_SECONDS, expire
+        )
+
+    async def _expire_grace(self, match_id: str, user_id: int, on_expiry):
+        self.grace_timers.pop((match_id, user_id), None)
+        try:
+            # Whoever deletes the grace key decides: a reconnect on any worker
+            # deletes it first, otherwise the forfeit goes ahead
+            redis = await get_redis()
+            if await redis.delete(grace_key(match_id, user_id)):
+                await on_expiry()
+        except Exception as e:
+            print(f"Error ending reconnect grace: {e}")
+        finally:
+            await self._evict_if_idle(match_id)
+
+    def _cancel_grace_timer(self, match_id: str, user_id: int):
+        timer = self.grace_timers.pop((match_id, user_id), None)
+        if timer is not None:
+            timer.cancel()
+
+    async def bootstrap(
+        self,
+        websocket: WebSocket,
+        match_id: str,
+        user_id: int,
+        conn_id: str,
+        resume_token: str,
+        last_event_id: Optional[str] = None,
+    ) -> Optional[dict]:
+        """Connect a player's socket with a single Redis round trip.
+
+        Marks the player connected, ends their grace window, joins the match
+        route, takes the lease if it is free and refreshes the resident game.
+        Returns None for an unknown match and a result with role None when the
+        user is not one of its players (nothing is registered or sent then).
+        With last_event_id the missed events are queued before any live one
+        and "resumed" tells whether that worked."""
+        resident = self.games.get(match_id)
+        if resident is not None and match_id in self.owned_matches:
+            resident_version = "skip"
+        else:
+            resident_version = str(resident.version) if resident is not None else ""
+        game_key, moves_key, history_key = game_keys(match_id)
+        redis = await get_redis()
+        reply = await redis.eval(
+            BOOTSTRAP_SCRIPT,
+            10,
+            f"match:{match_id}",
+            f"ws_conn:{match_id}:{user_id}",
+            grace_key(match_id, user_id),
+            f"match_workers:{match_id}",
+            f"match_owner:{match_id}",
+            game_key,
+            moves_key,
+            history_key,
+            events_key(match_id),
+            f"resume:{match_id}:{resume_token}",
+            str(user_id),
+            conn_id,
+            self.instance_id,
+            settings.MATCH_LEASE_SECONDS,
+            resident_version,
+            match_id,
+        )
+        if not reply:
+            return None
+        match_data = dict(zip(reply[0][::2], reply[0][1::2]))
+        result = {"match": match_data, "role": role_in_match(match_data, user_id)}
+        if result["role"] is None:
+            return result
+        _match, returning, owner, connected, event_id, game = reply
+        if game:
+            game_data, moves_data, history_data = game
+            self._install_game(
+                match_id, dict(zip(game_data[::2], game_data[1::2])), moves_data, history_data
+            )
+        if owner == self.instance_id and match_id not in self.owned_matches:
+            self.owned_matches.add(match_id)
+            self._ensure_lease_renewal()
+        self._cancel_grace_timer(match_id, user_id)
+        result["resumed"] = bool(last_event_id) and await self.replay_events(
+            websocket, match_id, last_event_id
+        )
+        self.active_connections.setdefault(match_id, set()).add(websocket)
+        self._join(websocket, match_id, user_id)
+        await self._ensure_pubsub()
+        result.update(
+            returning=bool(returning),
+            both_connected=connected >= 2,
+            event_id=event_id or None,
+        )
+        return result
 
     async def load_game(self, match_id: str):
         """Load game state from Redis or create new game."""
         redis = await get_redis()
-        game_data = await redis.hgetall(f"game:{match_id}")
+        game_key, moves_key, history_key = game_keys(match_id)
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(game_key)
+            pipe.lrange(moves_key, 0, -1)
+            pipe.smembers(history_key)
+            game_data, moves_data, history_data = await pipe.execute()
+        self._install_game(match_id, game_data, moves_data, history_data)
+
+    def _install_game(self, match_id: str, game_data: dict, moves_data, history_data):
         game = BaghChalGame()
-        has_data = game_data and (b"board" in game_data or "board" in game_data)
+        has_data = game_data and any(
+            key in game_data for key in (b"board", "board", b"clock", "clock")
+        )
         if has_data:
 
             def get_value(key):
@@ -136,61 +789,247 @@ class ConnectionManager:
                 turn_data = get_value("turn") or "goat"
                 goats_captured_data = get_value("goats_captured") or "0"
                 phase_data = get_value("phase") or "1"
-                history_data = get_value("history") or "[]"
-                move_history_data = get_value("move_history") or "[]"
+                version_data = get_value("version") or "0"
                 state = {
                     "board": json.loads(board_data),
                     "turn": turn_data,
                     "goats_placed": int(goats_placed_data),
                     "goats_captured": int(goats_captured_data),
                     "phase": int(phase_data),
-                    "history": json.loads(history_data),
-                    "move_history": json.loads(move_history_data),
+                    "history": [
+                        h.decode() if isinstance(h, bytes) else h for h in history_data
+                    ],
+                    "move_history": [json.loads(m) for m in moves_data],
+                    "version": int(version_data),
                 }
                 game.from_dict(state)
+            game.load_clock(json.loads(get_value("clock") or "null"))
         self.games[match_id] = game
+        self._touch_game(match_id)
+        self.persisted[match_id] = (game.version, len(game.move_history), len(game.history))
+
+    def _touch_game(self, match_id: str):
+        self.games.move_to_end(match_id)
+        self.game_touched[match_id] = time.monotonic()
+        self._ensure_eviction()
 
     async def save_game(self, match_id: str):
-        """Save game state to Redis."""
+        """Save game state to Redis.
+
+        Only the scalar fields are rewritten; moves and board hashes made
+        since the last save are appended, so a save costs O(1) bytes."""
         if match_id not in self.games:
             return
         game = self.games[match_id]
+        version, saved_moves, saved_history = self.persisted.get(match_id, (0, 0, 0))
+        if version == game.version and saved_moves == len(game.move_history):
+            return
+        new_moves = game.move_history[saved_moves:]
+        new_history = game.history[saved_history:]
         redis = await get_redis()
-        game_state = game.to_dict()
-        await redis.hset(
-            f"game:{match_id}",
-            mapping={
-                "board": json.dumps(game_state["board"]),
-                "turn": game_state["turn"],
-                "goats_placed": game_state["goats_placed"],
-                "goats_captured": game_state["goats_captured"],
-                "phase": game_state["phase"],
-                "history": json.dumps(game_state["history"]),
-                "move_history": json.dumps(game_state.get("move_history", [])),
-            },
-        )
+        game_key, moves_key, history_key = game_keys(match_id)
+        fields = {
+            "board": json.dumps(game.board),
+            "turn": game.turn,
+            "goats_placed": game.goats_placed,
+            "goats_captured": game.goats_captured,
+            "phase": game.phase,
+            "version": game.version,
+        }
+        deadline = game.clock_deadline_ms()
+        if game.time_control is not None:
+            fields["clock"] = json.dumps(game.clock_state())
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(game_key, mapping=fields)
+            if deadline is not None:
+                pipe.zadd(CLOCKS_KEY, {match_id: deadline})
+            if new_moves:
+                pipe.rpush(moves_key, *[json.dumps(move) for move in new_moves])
+            if new_history:
+                pipe.sadd(history_key, *new_history)
+            await pipe.execute()
+        self.persisted[match_id] = (game.version, len(game.move_history), len(game.history))
+
+    async def refresh_game(self, match_id: str) -> BaghChalGame:
+        """Return the resident game, reloading it only if Redis has a newer version."""
+        redis = await get_redis()
+        version = await redis.hget(f"game:{match_id}", "version")
+        game = self.games.get(match_id)
+        if game is None or int(version or 0) != game.version:
+            await self.load_game(match_id)
+        return self.games.get(match_id)
 
     async def broadcast_to_match(self, match_id: str, message: dict):
         """Broadcast message to all connections in a match."""
-        await self._broadcast_local(match_id, message)
+        text = JSON_PROTOCOL.encode(message)
         try:
             redis = await get_redis()
-            envelope = {"_origin_pid": os.getpid(), "payload": message}
-            await redis.publish(f"match_events:{match_id}", json.dumps(envelope))
+            event_id = await redis.eval(
+                FANOUT_SCRIPT,
+                2,
+                f"match_workers:{match_id}",
+                events_key(match_id),
+                self.instance_id,
+                match_id,
+                text,
+                settings.MATCH_EVENTS_MAXLEN,
+            )
         except Exception as e:
             print(f"Error publishing match event: {e}")
+            event_id = None
+        if event_id:
+            self._note_event(match_id, event_id)
+            message = dict(message, eid=event_id)
+            text = with_event_id(text, event_id)
+        await self._broadcast_local(match_id, message, text)
+
+    async def replay_events(self, websocket: WebSocket, match_id: str, last_event_id: str) -> bool:
+        """Queue the events after last_event_id for a reconnecting socket.
+
+        Returns False when that event has been trimmed from the stream, never
+        existed, or is too far behind for the send queue; the client then
+        needs a full start."""
+        try:
+            redis = await get_redis()
+            entries = await redis.xrange(events_key(match_id), last_event_id, "+")
+        except Exception:
+            return False
+        if not entries or entries[0][0] != last_event_id:
+            return False
+        if len(entries) > settings.WS_SEND_QUEUE_SIZE:
+            return False
+        protocol = self.protocols.get(websocket, JSON_PROTOCOL)
+        tagged = websocket in self.subscriptions
+        for event_id, fields in entries[1:]:
+            text = with_event_id(fields["event"], event_id)
+            frame = text if not protocol.binary else protocol.encode(JSON_PROTOCOL.decode(text))
+            if tagged:
+                frame = protocol.tag(frame, match_id)
+            self._enqueue(websocket, protocol, frame)
+        return True
 
-    async def send_to_connection(self, websocket: WebSocket, message: dict):
-        """Send message to specific connection."""
+    def set_protocol(self, websocket: WebSocket, protocol):
+        """Register an accepted socket with its negotiated wire protocol."""
+        self.protocols[websocket] = protocol
+        if websocket not in self.send_queues:
+            queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+            self.send_queues[websocket] = queue
+            self.writer_tasks[websocket] = asyncio.create_task(self._writer(websocket, queue))
+            self.idle_wheel.add(websocket)
+
+    def touch(self, websocket: WebSocket):
+        """Record inbound activity on a socket."""
+        self.idle_wheel.touch(websocket)
+
+    def _ping_idle(self, websocket: WebSocket):
+        protocol = self.protocols.get(websocket, JSON_PROTOCOL)
+        self._enqueue(websocket, protocol, protocol.encode({"type": "ping"}))
+
+    def _close_idle(self, websocket: WebSocket):
+        self.idle_closed += 1
+        self._spawn_close(websocket, 1001, "Idle timeout")
+
+    def _spawn_close(self, websocket: WebSocket, code: int, reason: str):
+        task = asyncio.create_task(self.close_connection(websocket, code, reason))
+        self.close_tasks.add(task)
+        task.add_done_callback(self.close_tasks.discard)
+
+    def _enqueue(self, websocket: WebSocket, protocol, frame):
+        queue = self.send_queues.get(websocket)
+        if queue is None:
+            return
+        try:
+            queue.put_nowait((protocol.binary, frame))
+        except asyncio.QueueFull:
+            self.send_queues.pop(websocket, None)
+            self.evicted_connections += 1
+            self._spawn_close(websocket, 1008, "Client too slow")
+
+    async def _writer(self, websocket: WebSocket, queue: asyncio.Queue):
         try:
-            await websocket.send_json(message)
+            while True:
+                binary, frame = await queue.get()
+                if binary:
+                    await websocket.send_bytes(frame)
+                else:
+                    await websocket.send_text(frame)
+                queue.task_done()
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            print(f"Error sending to connection: {e}")
+            if not closed_normally(e):
+                print(f"Error sending to connection: {e}")
             await self.disconnect(websocket)
 
+    async def send_to_connection(
+        self, websocket: WebSocket, message: dict, match_id: Optional[str] = None
+    ):
+        """Queue a message for a specific connection, tagged with `match_id`
+        if the socket is multiplexed."""
+        protocol = self.protocols.get(websocket, JSON_PROTOCOL)
+        frame = protocol.encode(message)
+        if match_id is not None and websocket in self.subscriptions:
+            frame = protocol.tag(frame, match_id)
+        self._enqueue(websocket, protocol, frame)
+
+    async def drain(self, websocket: WebSocket, timeout: float = 1.0):
+        """Wait until everything queued for a socket has been written."""
+        queue = self.send_queues.get(websocket)
+        if queue is not None:
+            try:
+                await asyncio.wait_for(queue.join(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close_connection(self, websocket: WebSocket, code: int, reason: str):
+        """Flush pending frames (unless evicted), then close and forget the socket."""
+        await self.drain(websocket)
+        await self.disconnect(websocket)
+        try:
+            await websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    def queue_stats(self) -> Dict[str, int]:
+        """Outbound queue depth across this worker's sockets."""
+        depths = [queue.qsize() for queue in self.send_queues.values()]
+        return {
+            "connections": len(self.send_queues),
+            "queued_frames": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "queue_capacity": settings.WS_SEND_QUEUE_SIZE,
+            "evicted_slow_consumers": self.evicted_connections,
+            "idle_closed": self.idle_closed,
+            "resident_games": len(self.games),
+            "evicted_games": self.evicted_games,
+        }
+
+    async def shutdown(self):
+        """Persist owned games and hand their leases back."""
+        for match_id in list(self.owned_matches):
+            await self.save_game(match_id)
+            await self.release_match(match_id)
+        if self.lease_task is not None and not self.lease_task.done():
+            self.lease_task.cancel()
+        for timer in self.pending_forwards.values():
+            timer.cancel()
+        self.pending_forwards.clear()
+        if self.evict_task is not None and not self.evict_task.done():
+            self.evict_task.cancel()
+        self.idle_wheel.stop()
+
+    async def send_to_user(self, match_id: str, user_id, message: dict):
+        """Send a message to a user's local connections in a match."""
+        for connection in list(self.active_connections.get(match_id, ())):
+            if self.connection_info.get(connection, (None, None))[1] == user_id:
+                await self.send_to_connection(connection, message, match_id)
+
     def get_game(self, match_id: str) -> BaghChalGame:
         """Get game instance for a match."""
-        return self.games.get(match_id)
+        game = self.games.get(match_id)
+        if game is not None:
+            self._touch_game(match_id)
+        return game
 
     async def get_user_role(self, match_id: str, user_id: int) -> str:
         """Get user role (goat or tiger) in the match."""
@@ -198,15 +1037,7 @@ class ConnectionManager:
         match_data = await redis.hgetall(f"match:{match_id}")
         if not match_data:
             return None
-        p1 = match_data.get(b"p1") or match_data.get("p1")
-        p2 = match_data.get(b"p2") or match_data.get("p2")
-        p1 = p1.decode() if isinstance(p1, bytes) else p1
-        p2 = p2.decode() if isinstance(p2, bytes) else p2
-        if str(user_id) == p1:
-            return "goat"
-        elif str(user_id) == p2:
-            return "tiger"
-        return None
+        return role_in_match(match_data, user_id)
 
 
 manager = ConnectionManager()
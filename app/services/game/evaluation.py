@@ -0,0 +1,274 @@
+from typing import Dict, List, Tuple
+
+from app.services.game.game_service import ADJACENCY, EMPTY, GOAT, TIGER
+
+
+def _is_in_line(pos1: int, pos2: int, pos3: int) -> bool:
+    row1, col1 = pos1 // 5, pos1 % 5
+    row2, col2 = pos2 // 5, pos2 % 5
+    row3, col3 = pos3 // 5, pos3 % 5
+
+    if row1 == row2 == row3:
+        return min(col1, col3) <= col2 <= max(col1, col3)
+    if col1 == col2 == col3:
+        return min(row1, row3) <= row2 <= max(row1, row3)
+    if abs(row1 - row2) == abs(col1 - col2) and abs(row2 - row3) == abs(col2 - col3):
+        return (row2 - row1) * (col3 - col1) == (row3 - row1) * (col2 - col1)
+    return False
+
+
+def _build_jumps(pos: int) -> Tuple[Tuple[int, int], ...]:
+    jumps = []
+    for over in ADJACENCY[pos]:
+        for land in ADJACENCY[over]:
+            if land != pos and _is_in_line(pos, over, land):
+                jumps.append((over, land))
+    jumps.sort(key=lambda jump: jump[1])
+    return tuple(jumps)
+
+
+# Precomputed per-square tables
+NEIGHBORS: Tuple[Tuple[int, ...], ...] = tuple(tuple(ADJACENCY[pos]) for pos in range(25))
+# (jumped square, landing square) pairs for a tiger capture, ordered by landing square
+JUMPS: Tuple[Tuple[Tuple[int, int], ...], ...] = tuple(_build_jumps(pos) for pos in range(25))
+CENTER_WEIGHT: Tuple[float, ...] = tuple(
+    4.0 - abs(pos // 5 - 2) - abs(pos % 5 - 2) for pos in range(25)
+)
+# Tiger squares whose mobility reads a given square (including the square itself)
+DEPENDENTS: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(
+        sorted(
+            tiger
+            for tiger in range(25)
+            if tiger == pos
+            or pos in NEIGHBORS[tiger]
+            or any(pos in jump for jump in JUMPS[tiger])
+        )
+    )
+    for pos in range(25)
+)
+
+
+class Evaluator:
+    """Heuristic features of one position, kept up to date across make/unmake.
+
+    Tiger mobility is stored per tiger so a move only recomputes the tigers
+    whose neighbourhood it touched; goat mobility is adjusted by delta."""
+
+    __slots__ = (
+        "board",
+        "turn",
+        "phase",
+        "goats_placed",
+        "goats_captured",
+        "tiger_moves",
+        "tiger_mobility",
+        "trapped_tigers",
+        "center_bonus",
+        "goat_mobility",
+        "_undo",
+    )
+
+    def __init__(
+        self,
+        board: List[int],
+        turn: str,
+        phase: int,
+        goats_placed: int,
+        goats_captured: int,
+    ):
+        self.board = list(board)
+        self.turn = turn
+        self.phase = phase
+        self.goats_placed = goats_placed
+        self.goats_captured = goats_captured
+        self.tiger_moves = [0] * 25
+        self.tiger_mobility = 0
+        self.trapped_tigers = 0
+        self.center_bonus = 0.0
+        self.goat_mobility = 0
+        self._undo: List[tuple] = []
+
+        board = self.board
+        for pos in range(25):
+            piece = board[pos]
+            if piece == TIGER:
+                self._add_tiger(pos)
+            elif piece == GOAT:
+                for nxt in NEIGHBORS[pos]:
+                    if board[nxt] == EMPTY:
+                        self.goat_mobility += 1
+
+    @classmethod
+    def from_state(cls, state) -> "Evaluator":
+        return cls(
+            state.board,
+            state.turn,
+            state.phase,
+            state.goats_placed,
+            state.goats_captured,
+        )
+
+    def _tiger_mobility_at(self, pos: int) -> int:
+        board = self.board
+        mobility = 0
+        for nxt in NEIGHBORS[pos]:
+            if board[nxt] == EMPTY:
+                mobility += 1
+        for over, land in JUMPS[pos]:
+            if board[over] == GOAT and board[land] == EMPTY:
+                mobility += 1
+        return mobility
+
+    def _add_tiger(self, pos: int):
+        mobility = self._tiger_mobility_at(pos)
+        self.tiger_moves[pos] = mobility
+        self.tiger_mobility += mobility
+        if mobility == 0:
+            self.trapped_tigers += 1
+        self.center_bonus += CENTER_WEIGHT[pos]
+
+    def _remove_tiger(self, pos: int):
+        mobility = self.tiger_moves[pos]
+        self.tiger_mobility -= mobility
+        if mobility == 0:
+            self.trapped_tigers -= 1
+        self.center_bonus -= CENTER_WEIGHT[pos]
+
+    def _set_square(self, pos: int, piece: int):
+        board = self.board
+        old = board[pos]
+        if old == GOAT:
+            for nxt in NEIGHBORS[pos]:
+                if board[nxt] == EMPTY:
+                    self.goat_mobility -= 1
+        elif old == EMPTY:
+            for nxt in NEIGHBORS[pos]:
+                if board[nxt] == GOAT:
+                    self.goat_mobility -= 1
+        board[pos] = piece
+        if piece == GOAT:
+            for nxt in NEIGHBORS[pos]:
+                if board[nxt] == EMPTY:
+                    self.goat_mobility += 1
+        elif piece == EMPTY:
+            for nxt in NEIGHBORS[pos]:
+                if board[nxt] == GOAT:
+                    self.goat_mobility += 1
+
+    def _apply_squares(self, changes: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        board = self.board
+        affected = set()
+        for pos, _piece in changes:
+            affected.update(DEPENDENTS[pos])
+        saved_moves = []
+        for tiger in affected:
+            if board[tiger] == TIGER:
+                saved_moves.append((tiger, self.tiger_moves[tiger]))
+                self._remove_tiger(tiger)
+        previous = []
+        for pos, piece in changes:
+            previous.append((pos, board[pos]))
+            self._set_square(pos, piece)
+        for tiger in affected:
+            if board[tiger] == TIGER:
+                self._add_tiger(tiger)
+        self._undo.append(
+            (
+                previous,
+                saved_moves,
+                self.turn,
+                self.phase,
+                self.goats_placed,
+                self.goats_captured,
+            )
+        )
+        return previous
+
+    def make(self, move: Dict, role: str):
+        """Apply a legal move; must be paired with unmake()."""
+        if move["type"] == "place":
+            changes = [(int(move["position"]), GOAT)]
+            captured = None
+        else:
+            from_pos = int(move["from"])
+            to_pos = int(move["to"])
+            changes = [(from_pos, EMPTY), (to_pos, GOAT if role == "goat" else TIGER)]
+            captured = None
+            if role == "tiger":
+                captured = move.get("captured")
+                if captured is None:
+                    for over, land in JUMPS[from_pos]:
+                        if land == to_pos and self.board[over] == GOAT:
+                            captured = over
+                            break
+                if captured is not None:
+                    changes.append((int(captured), EMPTY))
+
+        self._apply_squares(changes)
+        if move["type"] == "place":
+            self.goats_placed += 1
+            if self.goats_placed >= 20:
+                self.phase = 2
+        elif captured is not None:
+            self.goats_captured += 1
+        self.turn = "goat" if role == "tiger" else "tiger"
+
+    def unmake(self):
+        """Revert the most recent make()."""
+        previous, saved_moves, turn, phase, goats_placed, goats_captured = self._undo.pop()
+        board = self.board
+        affected = set()
+        for pos, _piece in previous:
+            affected.update(DEPENDENTS[pos])
+        for tiger in affected:
+            if board[tiger] == TIGER:
+                self._remove_tiger(tiger)
+        for pos, piece in reversed(previous):
+            self._set_square(pos, piece)
+        for tiger, mobility in saved_moves:
+            self.tiger_moves[tiger] = mobility
+            self.tiger_mobility += mobility
+            if mobility == 0:
+                self.trapped_tigers += 1
+            self.center_bonus += CENTER_WEIGHT[tiger]
+        self.turn = turn
+        self.phase = phase
+        self.goats_placed = goats_placed
+        self.goats_captured = goats_captured
+
+    def winner(self):
+        if self.goats_captured >= 5:
+            return "tiger"
+        if self.phase == 2 and self.tiger_mobility == 0:
+            return "goat"
+        return None
+
+    def value(self, perspective_role: str) -> float:
+        winner = self.winner()
+        if winner == perspective_role:
+            return 10000.0
+        if winner is not None:
+            return -10000.0
+
+        tiger_score = (
+            self.goats_captured * 50.0
+            + self.tiger_mobility * 2.0
+            - self.goat_mobility * 0.5
+            - self.trapped_tigers * 15.0
+            + self.center_bonus * 0.3
+        )
+        return tiger_score if perspective_role == "tiger" else -tiger_score
+
+    def encode(self) -> List[float]:
+        """Model input row for the current position."""
+        flat = [float(x) for x in self.board]
+        flat.extend(
+            [
+                float(self.goats_placed) / 20.0,
+                float(self.goats_captured) / 5.0,
+                1.0 if self.turn == "tiger" else 0.0,
+                1.0 if self.phase == 2 else 0.0,
+            ]
+        )
+        return flat
@@ -1,6 +1,5 @@
-from typing import List, Tuple, Optional, Set
-import hashlib
-import json
+from array import array
+from typing import Dict, Iterable, List, Tuple, Optional
 
 EMPTY = 0
 GOAT = 1
@@ -32,9 +31,93 @@ ADJACENCY = {
     23: [18, 22, 24],
     24: [18, 19, 23],
 }
+# Base time and per-move increment of each time control, in milliseconds
+TIME_CONTROLS = {
+    "blitz": (180_000, 2_000),
+    "rapid": (600_000, 5_000),
+}
+_NONE = -1
+
+
+def board_code(board: List[int]) -> int:
+    """The board as one integer, two bits per point (fits in 50 bits)."""
+    code = 0
+    for cell in reversed(board):
+        code = (code << 2) | cell
+    return code
+
+
+class MoveLog:
+    """Move history packed four signed bytes per ply: kind, a, b, captured.
+
+    Reads as a list of the usual move dicts, built on access, so a resident
+    game costs a few bytes per ply instead of a dict."""
+
+    __slots__ = ("_plies",)
+
+    def __init__(self, moves: Iterable[dict] = ()):
+        self._plies = array("b")
+        for move in moves:
+            self.append(move)
+
+    def append(self, move: dict):
+        if move["type"] == "place":
+            self._plies.extend((0, move["position"], _NONE, _NONE))
+        else:
+            captured = move.get("captured")
+            self._plies.extend(
+                (1, move["from"], move["to"], _NONE if captured is None else captured)
+            )
+
+    def _move(self, ply: int) -> dict:
+        kind, a, b, captured = self._plies[ply * 4 : ply * 4 + 4]
+        if kind == 0:
+            return {"type": "place", "position": a}
+        move = {"type": "move", "from": a, "to": b}
+        if captured != _NONE:
+            move["captured"] = captured
+        return move
+
+    def __len__(self) -> int:
+        return len(self._plies) // 4
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._move(ply) for ply in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("move index out of range")
+        return self._move(index)
+
+    def __iter__(self):
+        return (self._move(ply) for ply in range(len(self)))
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"MoveLog({list(self)!r})"
 
 
 class BaghChalGame:
+    __slots__ = (
+        "board",
+        "turn",
+        "goats_placed",
+        "goats_captured",
+        "phase",
+        "history",
+        "seen_codes",
+        "move_history",
+        "version",
+        "time_control",
+        "clock_ms",
+        "increment_ms",
+        "turn_started_ms",
+    )
+    total_goats = 20
+
     def __init__(self):
         self.board = [EMPTY] * 25
         self.board[0] = TIGER
@@ -45,14 +128,19 @@ class BaghChalGame:
         self.goats_placed = 0
         self.goats_captured = 0
         self.phase = 1  # 1 = placing goats, 2 = moving goats
-        self.history: Set[str] = set()
-        self.total_goats = 20
-        self.move_history = []
+        # board_code() after every goat move, in play order; repeats are illegal
+        self.history = array("Q")
+        self.seen_codes: Optional[set] = None  # set of history, built on first goat move
+        self.move_history = MoveLog()
+        self.version = 0  # bumped on every applied move, stored with the game
+        self.time_control: Optional[str] = None  # untimed unless set
+        self.clock_ms: Dict[str, int] = {}
+        self.increment_ms = 0
+        self.turn_started_ms: Optional[int] = None  # wall clock, None until the first move
 
-    def get_board_hash(self) -> str:
-        """Get unique hash of current board state."""
-        board_str = json.dumps(self.board)
-        return hashlib.md5(board_str.encode()).hexdigest()
+    def get_board_hash(self) -> int:
+        """Get unique code of current board state."""
+        return board_code(self.board)
 
     def is_valid_position(self, pos: int) -> bool:
         """Check if position is within board bounds."""
@@ -174,11 +262,14 @@ class BaghChalGame:
         self.board[from_pos] = EMPTY
         self.board[to_pos] = GOAT
         board_hash = self.get_board_hash()
-        if board_hash in self.history:
+        if self.seen_codes is None:
+            self.seen_codes = set(self.history)
+        if board_hash in self.seen_codes:
             self.board[from_pos] = GOAT
             self.board[to_pos] = EMPTY
             return False, "Move would repeat a previous board state"
-        self.history.add(board_hash)
+        self.history.append(board_hash)
+        self.seen_codes.add(board_hash)
         self.move_history.append({"type": "move", "from": from_pos, "to": to_pos})
         self.turn = "tiger"
         return True, "Goat moved"
@@ -216,6 +307,84 @@ class BaghChalGame:
                 return "goat"
         return None
 
+    def set_time_control(self, name: str):
+        """Give both sides the full base time of a control from TIME_CONTROLS."""
+        base, increment = TIME_CONTROLS[name]
+        self.time_control = name
+        self.clock_ms = {"goat": base, "tiger": base}
+        self.increment_ms = increment
+        self.turn_started_ms = None
+
+    def time_left(self, role: str, now_ms: int) -> Optional[int]:
+        """Milliseconds left on a side's clock, or None for untimed games."""
+        if self.time_control is None:
+            return None
+        left = self.clock_ms[role]
+        if role == self.turn and self.turn_started_ms is not None:
+            left -= now_ms - self.turn_started_ms
+        return left
+
+    def press_clock(self, role: str, now_ms: int):
+        """Charge `role` for the move it just made and start the other clock.
+
+        The clock only starts running once the first move has been made."""
+        if self.time_control is None:
+            return
+        if self.turn_started_ms is not None:
+            self.clock_ms[role] -= now_ms - self.turn_started_ms
+        self.clock_ms[role] += self.increment_ms
+        self.turn_started_ms = now_ms
+
+    def clock_deadline_ms(self) -> Optional[int]:
+        """Wall-clock time at which the side to move flags, if a clock is running."""
+        if self.time_control is None or self.turn_started_ms is None:
+            return None
+        return self.turn_started_ms + self.clock_ms[self.turn]
+
+    def clock_message(self, now_ms: int) -> Optional[Dict[str, int]]:
+        """Remaining time of both sides as sent to clients."""
+        if self.time_control is None:
+            return None
+        return {role: max(0, self.time_left(role, now_ms)) for role in ("goat", "tiger")}
+
+    def clock_state(self) -> Optional[dict]:
+        """Persisted clock, or None for untimed games."""
+        if self.time_control is None:
+            return None
+        return {
+            "time_control": self.time_control,
+            "clock_ms": self.clock_ms,
+            "increment_ms": self.increment_ms,
+            "turn_started_ms": self.turn_started_ms,
+        }
+
+    def load_clock(self, state: Optional[dict]):
+        """Restore a clock written by clock_state()."""
+        if not state:
+            return
+        self.time_control = state["time_control"]
+        self.clock_ms = dict(state["clock_ms"])
+        self.increment_ms = state["increment_ms"]
+        self.turn_started_ms = state.get("turn_started_ms")
+
+    @staticmethod
+    def replay_history(moves: Iterable[dict]) -> array:
+        """Board codes after each goat move of a game, as move_goat records them."""
+        board = BaghChalGame().board
+        codes = array("Q")
+        for ply, move in enumerate(moves):
+            if move["type"] == "place":
+                board[move["position"]] = GOAT
+                continue
+            piece = GOAT if ply % 2 == 0 else TIGER
+            board[move["from"]] = EMPTY
+            board[move["to"]] = piece
+            if move.get("captured") is not None:
+                board[move["captured"]] = EMPTY
+            if piece == GOAT:
+                codes.append(board_code(board))
+        return codes
+
     def to_dict(self) -> dict:
         """Convert game state to dictionary."""
         return {
@@ -225,7 +394,9 @@ class BaghChalGame:
             "goats_captured": self.goats_captured,
             "phase": self.phase,
             "history": list(self.history),
-            "move_history": self.move_history,
+            "move_history": list(self.move_history),
+            "version": self.version,
+            "clock": self.clock_state(),
         }
 
     def from_dict(self, data: dict):
@@ -235,5 +406,12 @@ class BaghChalGame:
         self.goats_placed = data.get("goats_placed", self.goats_placed)
         self.goats_captured = data.get("goats_captured", self.goats_captured)
         self.phase = data.get("phase", self.phase)
-        self.history = set(data.get("history", []))
-        self.move_history = data.get("move_history", [])
+        self.move_history = MoveLog(data.get("move_history", []))
+        try:
+            self.history = array("Q", (int(code) for code in data.get("history", [])))
+        except (ValueError, OverflowError):
+            # Written as md5 digests before board codes; rebuild from the moves
+            self.history = self.replay_history(self.move_history)
+        self.seen_codes = None
+        self.version = data.get("version", self.version)
+        self.load_clock(data.get("clock"))
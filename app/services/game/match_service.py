@@ -0,0 +1,199 @@
+import time
+from typing import Dict, Optional, Tuple
+from app.core.metrics import MOVE_SECONDS
+from app.services.game.connection_manager import manager
+from app.services.game.game_service import BaghChalGame
+from app.services.game.bot_service import bot_service
+from app.services.game.clock_service import clock_scheduler, now_ms
+from app.services.matchmaking_service import cleanup_match, get_match_info
+from app.workers.game_jobs import build_game_finished_job, enqueue_game_finished
+
+
+def apply_move(game: BaghChalGame, role: str, message: dict) -> Tuple[bool, str, dict]:
+    """Apply a place/move message for the given role to the game."""
+    move_type = message.get("type")
+    success = False
+    error_msg = ""
+    move_info = {}
+    if move_type == "place":
+        position = message.get("position")
+        if position is not None:
+            success, error_msg = game.place_goat(position)
+            move_info = {"type": "place", "position": position}
+        else:
+            error_msg = "Position required"
+    elif move_type == "move":
+        from_pos = message.get("from")
+        to_pos = message.get("to")
+        if from_pos is not None and to_pos is not None:
+            if role == "tiger":
+                success, error_msg, captured_goat = game.move_tiger(from_pos, to_pos)
+                move_info = {
+                    "type": "move",
+                    "from": from_pos,
+                    "to": to_pos,
+                    "captured": captured_goat,
+                }
+            elif role == "goat":
+                success, error_msg = game.move_goat(from_pos, to_pos)
+                move_info = {"type": "move", "from": from_pos, "to": to_pos}
+        else:
+            error_msg = "From and to positions required"
+    if success:
+        game.version += 1
+    return success, error_msg, move_info
+
+
+def snapshot_message(game: BaghChalGame) -> dict:
+    """Full position, sent on resync so a client can rebuild after a gap."""
+    return {
+        "type": "snapshot",
+        "seq": game.version,
+        "board": game.board,
+        "turn": game.turn,
+        "phase": game.phase,
+        "goats_placed": game.goats_placed,
+        "goats_captured": game.goats_captured,
+        **clock_field(game),
+    }
+
+
+def update_message(game: BaghChalGame, seq: int) -> dict:
+    """Delta for the move that produced sequence number `seq`."""
+    return {
+        "type": "update",
+        "seq": seq,
+        "move": game.move_history[seq - 1],
+        **clock_field(game),
+    }
+
+
+def clock_field(game: BaghChalGame) -> dict:
+    """The `clock` entry of start/update/snapshot messages; empty when untimed."""
+    clock = game.clock_message(now_ms())
+    return {} if clock is None else {"clock": clock}
+
+
+def stale_move_reply(game: BaghChalGame, role: str, message: dict) -> Optional[dict]:
+    """Reply for a move sent against an old seq, or None if it can be applied.
+
+    A resend of a move that was already applied gets its update again instead
+    of an error; anything else based on an old position is told to resync."""
+    seq = message.get("seq")
+    if seq is None or game is None:
+        return None
+    try:
+        seq = int(seq)
+    except (TypeError, ValueError):
+        return {"type": "error", "message": "Invalid seq"}
+    if seq == game.version:
+        return None
+    if 0 <= seq < game.version:
+        applied = game.move_history[seq]
+        # Goat always makes the even plies
+        applied_role = "goat" if seq % 2 == 0 else "tiger"
+        same = applied_role == role and all(
+            applied.get(key) == message.get(key) for key in ("type", "position", "from", "to")
+        )
+        if same:
+            return update_message(game, seq + 1)
+    return {"type": "error", "message": "Out of sync, resync required", "seq": game.version}
+
+
+async def play_move(
+    match_id: str, role: str, message: dict
+) -> Tuple[bool, str, Optional[str]]:
+    """Apply a move to the resident game, persist it and notify the match.
+    Returns (success, error_message, winner)."""
+    start = time.perf_counter()
+    try:
+        return await _play_move(match_id, role, message)
+    finally:
+        MOVE_SECONDS.observe(time.perf_counter() - start)
+
+
+async def _play_move(
+    match_id: str, role: str, message: dict
+) -> Tuple[bool, str, Optional[str]]:
+    game = manager.get_game(match_id)
+    if game is None:
+        return False, "Game not found", None
+    if game.turn != role:
+        return False, "Not your turn", None
+    now = now_ms()
+    left = game.time_left(role, now)
+    if left is not None and left <= 0:
+        winner = "tiger" if role == "goat" else "goat"
+        await finish_match(match_id, winner, "timeout", f"{role} ran out of time")
+        return False, "Time is up", winner
+    success, error_msg, _move_info = apply_move(game, role, message)
+    if not success:
+        return False, error_msg, None
+    game.press_clock(role, now)
+    await manager.save_game(match_id)
+    winner = game.check_winner()
+    if winner:
+        reason = "tigers_captured_5_goats" if winner == "tiger" else "tigers_blocked"
+        await finish_match(match_id, winner, reason)
+        return True, "", winner
+    await manager.broadcast_to_match(match_id, update_message(game, game.version))
+    clock_scheduler.schedule(match_id, game)
+    bot_service.notify_turn(match_id)
+    return True, "", None
+
+
+async def flag_if_expired(match_id: str) -> bool:
+    """End the match on time if the side to move has run out.
+
+    Called by the clock scheduler on this worker's owned matches; a clock
+    that turns out not to have run out is scheduled again."""
+    match_data = await get_match_info(match_id)
+    if not match_data:
+        # Finished or expired meanwhile, drop whatever is left of it
+        await cleanup_match(match_id)
+        await manager.release_match(match_id)
+        return False
+    game = manager.get_game(match_id)
+    left = game.time_left(game.turn, now_ms()) if game is not None else None
+    if left is None:
+        await clock_scheduler.forget(match_id)
+        return False
+    if left > 0:
+        clock_scheduler.schedule(match_id, game)
+        return False
+    winner = "tiger" if game.turn == "goat" else "goat"
+    await finish_match(
+        match_id, winner, "timeout", f"{game.turn} ran out of time", match_data
+    )
+    return True
+
+
+async def finish_match(
+    match_id: str,
+    winner: str,
+    reason: str,
+    message: Optional[str] = None,
+    match_data: Optional[Dict] = None,
+):
+    """Announce the result, queue it for recording and clean the match up.
+
+    ELO, the game log and the replay are written by the game job worker, so
+    game_over never waits on the database."""
+    if match_data is None:
+        match_data = await get_match_info(match_id)
+    game = manager.get_game(match_id)
+    game_over = {"type": "game_over", "winner": winner, "reason": reason}
+    if message:
+        game_over["message"] = message
+    game_over["final_board"] = game.board if game else []
+    await manager.broadcast_to_match(match_id, game_over)
+    bot_service.release(match_id)
+    if not match_data:
+        return
+    try:
+        await enqueue_game_finished(
+            build_game_finished_job(match_id, match_data, game, winner)
+        )
+    except Exception as e:
+        print(f"Error queueing result of match {match_id}: {e}")
+    await cleanup_match(match_id)
@@ -0,0 +1,243 @@
+import json
+import struct
+from typing import Dict, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+BINARY_SUBPROTOCOL = "baghchal.bin.v1"
+JSON_SUBPROTOCOL = "baghchal.json"
+
+# Frame codes of the binary protocol; everything else travels as a JSON frame
+PLACE = 0x01
+MOVE = 0x02
+PING = 0x03
+PONG = 0x04
+RESYNC = 0x05
+LEAVE = 0x06
+UPDATE = 0x10
+SNAPSHOT = 0x11
+UPDATE_CLOCK = 0x12  # UPDATE/SNAPSHOT followed by goat and tiger milliseconds left
+# Any UPDATE/SNAPSHOT frame may end with its event id: length u8, then ASCII
+SNAPSHOT_CLOCK = 0x13
+MUX = 0x20  # multiplexed socket: id length, match id, then the frame for that match
+JSON_FRAME = 0x7F
+
+NONE_SEQ = 0xFFFFFFFF
+NONE_SQUARE = 0xFF
+
+_PLACE = struct.Struct("<BBI")  # code, position, seq
+_MOVE = struct.Struct("<BBBI")  # code, from, to, seq
+_UPDATE = struct.Struct("<BIBBBB")  # code, seq, kind, a, b, captured
+_SNAPSHOT = struct.Struct("<BIBBBB25s")  # code, seq, turn, phase, placed, captured, board
+_CLOCK = struct.Struct("<II")  # goat ms, tiger ms
+_BARE = {"ping": PING, "pong": PONG, "resync": RESYNC, "leave": LEAVE}
+_BARE_TYPES = {code: name for name, code in _BARE.items()}
+
+
+class ProtocolError(ValueError):
+    """Raised for frames that cannot be decoded."""
+
+
+class JSONProtocol:
+    """The original text protocol."""
+
+    binary = False
+
+    def __init__(self, subprotocol: Optional[str] = None):
+        self.subprotocol = subprotocol
+
+    def encode(self, message: Dict) -> str:
+        if orjson is not None:
+            return orjson.dumps(message).decode("utf-8")
+        return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+    def decode(self, data: Union[str, bytes]) -> Dict:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    def tag(self, frame: str, match_id: str) -> str:
+        """Add the "match" key of a multiplexed socket to an encoded frame."""
+        rest = frame[1:] if frame == "{}" else "," + frame[1:]
+        return '{"match":' + self.encode(match_id) + rest
+
+    def untag(self, data: Union[str, bytes]) -> Tuple[Optional[str], Dict]:
+        """Decode a frame from a multiplexed socket into (match id, message)."""
+        message = self.decode(data)
+        if not isinstance(message, dict):
+            raise ProtocolError("Expected a JSON object")
+        return message.pop("match", None), message
+
+
+class BinaryProtocol:
+    """Packed frames for moves, updates and snapshots (a few bytes each).
+
+    Messages without a packed layout, such as start, error and game_over,
+    are sent as a JSON_FRAME byte followed by the UTF-8 JSON body."""
+
+    binary = True
+    subprotocol = BINARY_SUBPROTOCOL
+
+    def encode(self, message: Dict) -> bytes:
+        msg_type = message.get("type")
+        try:
+            if msg_type == "place":
+                return _PLACE.pack(PLACE, message["position"], _seq(message))
+            if msg_type == "move" and "to" in message:
+                return _MOVE.pack(MOVE, message["from"], message["to"], _seq(message))
+            if msg_type in _BARE and len(message) == 1:
+                return bytes((_BARE[msg_type],))
+            if msg_type == "update":
+                move = message["move"]
+                if move["type"] == "place":
+                    fields = (0, move["position"], NONE_SQUARE, NONE_SQUARE)
+                else:
+                    captured = move.get("captured")
+                    fields = (
+                        1,
+                        move["from"],
+                        move["to"],
+                        NONE_SQUARE if captured is None else captured,
+                    )
+                if "clock" in message:
+                    frame = _UPDATE.pack(UPDATE_CLOCK, message["seq"], *fields)
+                    frame += _pack_clock(message["clock"])
+                else:
+                    frame = _UPDATE.pack(UPDATE, message["seq"], *fields)
+                return frame + _pack_event_id(message)
+            if msg_type == "snapshot":
+                timed = "clock" in message
+                frame = _SNAPSHOT.pack(
+                    SNAPSHOT_CLOCK if timed else SNAPSHOT,
+                    message["seq"],
+                    1 if message["turn"] == "tiger" else 0,
+                    message["phase"],
+                    message["goats_placed"],
+                    message["goats_captured"],
+                    bytes(message["board"]),
+                )
+                if timed:
+                    frame += _pack_clock(message["clock"])
+                return frame + _pack_event_id(message)
+        except (KeyError, TypeError, ValueError, struct.error, UnicodeEncodeError):
+            pass
+        return bytes((JSON_FRAME,)) + JSON_PROTOCOL.encode(message).encode("utf-8")
+
+    def decode(self, data: Union[str, bytes]) -> Dict:
+        if isinstance(data, str):
+            raise ProtocolError("Binary protocol expects binary frames")
+        if not data:
+            raise ProtocolError("Empty frame")
+        code = data[0]
+        try:
+            if code == PLACE:
+                _code, position, seq = _PLACE.unpack(data)
+                return _with_seq({"type": "place", "position": position}, seq)
+            if code == MOVE:
+                _code, from_pos, to_pos, seq = _MOVE.unpack(data)
+                return _with_seq({"type": "move", "from": from_pos, "to": to_pos}, seq)
+            if code in _BARE_TYPES and len(data) == 1:
+                return {"type": _BARE_TYPES[code]}
+            if code in (UPDATE, UPDATE_CLOCK):
+                _code, seq, kind, a, b, captured = _UPDATE.unpack_from(data)
+                if kind == 0:
+                    move = {"type": "place", "position": a}
+                else:
+                    move = {"type": "move", "from": a, "to": b}
+                    if captured != NONE_SQUARE:
+                        move["captured"] = captured
+                message = {"type": "update", "seq": seq, "move": move}
+                return _with_clock(message, data, _UPDATE, code == UPDATE_CLOCK)
+            if code in (SNAPSHOT, SNAPSHOT_CLOCK):
+                _code, seq, turn, phase, placed, captured, board = _SNAPSHOT.unpack_from(data)
+                message = {
+                    "type": "snapshot",
+                    "seq": seq,
+                    "board": list(board),
+                    "turn": "tiger" if turn else "goat",
+                    "phase": phase,
+                    "goats_placed": placed,
+                    "goats_captured": captured,
+                }
+                return _with_clock(message, data, _SNAPSHOT, code == SNAPSHOT_CLOCK)
+            if code == JSON_FRAME:
+                return JSON_PROTOCOL.decode(data[1:])
+        except (struct.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ProtocolError(f"Malformed frame: {e}")
+        raise ProtocolError(f"Unknown frame code {code}")
+
+    def tag(self, frame: bytes, match_id: str) -> bytes:
+        """Prefix a frame with the MUX header of a multiplexed socket."""
+        name = match_id.encode("utf-8")
+        return bytes((MUX, len(name))) + name + frame
+
+    def untag(self, data: Union[str, bytes]) -> Tuple[Optional[str], Dict]:
+        """Decode a frame from a multiplexed socket into (match id, message)."""
+        if isinstance(data, bytes) and len(data) > 1 and data[0] == MUX:
+            end = 2 + data[1]
+            try:
+                match_id = data[2:end].decode("utf-8")
+            except UnicodeDecodeError as e:
+                raise ProtocolError(f"Malformed frame: {e}")
+            return match_id, self.decode(data[end:])
+        message = self.decode(data)
+        return message.pop("match", None), message
+
+
+def _seq(message: Dict) -> int:
+    seq = message.get("seq")
+    return NONE_SEQ if seq is None else seq
+
+
+def _pack_clock(clock: Dict) -> bytes:
+    return _CLOCK.pack(clock["goat"], clock["tiger"])
+
+
+def _pack_event_id(message: Dict) -> bytes:
+    event_id = message.get("eid")
+    if event_id is None:
+        return b""
+    encoded = event_id.encode("ascii")
+    return bytes((len(encoded),)) + encoded
+
+
+def _with_clock(message: Dict, data: bytes, layout: struct.Struct, timed: bool) -> Dict:
+    """Check the frame length and read the trailing clock and event id."""
+    expected = layout.size + (_CLOCK.size if timed else 0)
+    if len(data) > expected:
+        end = expected + 1 + data[expected]
+        if len(data) == end:
+            message["eid"] = data[expected + 1:end].decode("ascii")
+            expected = end
+    if len(data) != expected:
+        raise struct.error(f"expected {expected} bytes, got {len(data)}")
+    if timed:
+        goat, tiger = _CLOCK.unpack_from(data, layout.size)
+        message["clock"] = {"goat": goat, "tiger": tiger}
+    return message
+
+
+def _with_seq(message: Dict, seq: int) -> Dict:
+    if seq != NONE_SEQ:
+        message["seq"] = seq
+    return message
+
+
+JSON_PROTOCOL = JSONProtocol()
+PROTOCOLS = {
+    BINARY_SUBPROTOCOL: BinaryProtocol(),
+    JSON_SUBPROTOCOL: JSONProtocol(JSON_SUBPROTOCOL),
+}
+
+
+def negotiate(requested: List[str]):
+    """Pick the protocol for a connection from the client's subprotocol list.
+
+    Clients that do not ask for a known subprotocol get plain JSON."""
+    for name in requested:
+        if name in PROTOCOLS:
+            return PROTOCOLS[name]
+    return JSON_PROTOCOL
@@ -0,0 +1,88 @@
+import asyncio
+import math
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Set
+
+
+class TimerWheel:
+    """Hashed timing wheel for connection idle deadlines.
+
+    touch() only stamps the activity time. A key's slot comes round once
+    per idle period and is re-filed if the key was active meanwhile, so the
+    cost per connection is O(1) however many connections are live. An idle
+    key first gets on_ping(); if nothing arrives within ping_timeout it is
+    dropped and handed to on_idle()."""
+
+    def __init__(
+        self,
+        tick: float,
+        idle_seconds: float,
+        ping_timeout: float,
+        on_ping: Callable[[Hashable], None],
+        on_idle: Callable[[Hashable], None],
+    ):
+        self.tick = tick
+        self.idle_seconds = idle_seconds
+        self.ping_timeout = ping_timeout
+        self.on_ping = on_ping
+        self.on_idle = on_idle
+        size = math.ceil(max(idle_seconds, ping_timeout) / tick) + 2
+        self.slots: List[Set[Hashable]] = [set() for _ in range(size)]
+        self.cursor = 0
+        self.last_seen: Dict[Hashable, float] = {}
+        self.pinged: Set[Hashable] = set()
+        self.task: Optional[asyncio.Task] = None
+
+    def _file(self, key: Hashable, delay: float):
+        ticks = min(len(self.slots) - 1, max(1, math.ceil(delay / self.tick)))
+        self.slots[(self.cursor + ticks) % len(self.slots)].add(key)
+
+    def add(self, key: Hashable):
+        self.last_seen[key] = time.monotonic()
+        self._file(key, self.idle_seconds)
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    def touch(self, key: Hashable):
+        if key in self.last_seen:
+            self.last_seen[key] = time.monotonic()
+            self.pinged.discard(key)
+
+    def discard(self, key: Hashable):
+        # The slot entry is dropped when its slot next comes round
+        self.last_seen.pop(key, None)
+        self.pinged.discard(key)
+
+    def advance(self, now: Optional[float] = None):
+        """Move to the next slot and act on the keys filed there."""
+        self.cursor = (self.cursor + 1) % len(self.slots)
+        due = self.slots[self.cursor]
+        self.slots[self.cursor] = set()
+        now = time.monotonic() if now is None else now
+        for key in due:
+            last = self.last_seen.get(key)
+            if last is None:
+                continue
+            if key in self.pinged:
+                self.discard(key)
+                self.on_idle(key)
+                continue
+            idle = now - last
+            if idle < self.idle_seconds:
+                self._file(key, self.idle_seconds - idle)
+            else:
+                self.pinged.add(key)
+                self.on_ping(key)
+                self._file(key, self.ping_timeout)
+
+    async def _run(self):
+        while self.last_seen:
+            await asyncio.sleep(self.tick)
+            try:
+                self.advance()
+            except Exception as e:
+                print(f"Idle wheel error: {e}")
+
+    def stop(self):
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
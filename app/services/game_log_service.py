@@ -18,9 +18,10 @@ def log_game(
     tiger_elo_after: float,
     goat_elo_before: float,
     goat_elo_after: float,
-    moves_history: Optional[Dict[str, Any]] = None
+    moves_history: Optional[Dict[str, Any]] = None,
+    commit: bool = True
 ) -> GameLog:
-    """Log a completed game and update player stats."""
+    """Log a completed game and update player stats (only flushed when commit is False)."""
     
     # Create game log
     game_log = GameLog(
@@ -66,6 +67,9 @@ def log_game(
         # Update total goats captured for tiger player
         tiger.goats_captured_total += goats_captured
     
+    if not commit:
+        db.flush()
+        return game_log
     db.commit()
     db.refresh(game_log)
     return game_log
@@ -3,10 +3,62 @@ import uuid
 import time
 from typing import Optional, Dict
 from app.core.redis import get_redis
-
-MATCHMAKING_QUEUE = "queue:matchmaking"
-QUEUE_LOCK = "lock:matchmaking"
+from app.core.config import settings
+from app.services.game.connection_manager import (
+    CLOCKS_KEY,
+    events_key,
+    game_keys,
+    grace_key,
+)
+from app.services.game.game_service import BaghChalGame
+
+MATCHMAKING_QUEUE = "queue:matchmaking"  # sorted set scored by join time
 HEARTBEAT_EXPIRY = 30  # seconds
+BOT_USER_ID = 0  # seat id used for server-side AI opponents
+MATCH_TTL = 3600  # seconds
+
+# Queue the caller (scored by join time, an existing entry keeps its place)
+# and pair it with the longest waiting live player in the same call. Entries
+# whose heartbeat expired are dropped as they reach the head, so every step
+# is O(log n) and two workers can never hand out the same player. The older
+# entry plays goat (p1). Returns {p1, p2} or an empty reply while waiting.
+# KEYS: queue, match, game
+# ARGV: user id, join time, match id, created_at, time control, clock, ttl
+PAIR_SCRIPT = """
+redis.call('ZADD', KEYS[1], 'NX', ARGV[2], ARGV[1])
+local head, opponent
+while not opponent do
+    head = redis.call('ZRANGE', KEYS[1], 0, 1)
+    local candidate = head[1]
+    if candidate == ARGV[1] then
+        candidate = head[2]
+    end
+    if not candidate then
+        return {}
+    end
+    if redis.call('EXISTS', 'heartbeat:' .. candidate) == 1 then
+        opponent = candidate
+    else
+        redis.call('ZREM', KEYS[1], candidate)
+        redis.call('DEL', 'user_match:' .. candidate)
+    end
+end
+local p1, p2 = opponent, ARGV[1]
+if head[1] == ARGV[1] then
+    p1, p2 = ARGV[1], opponent
+end
+redis.call('ZREM', KEYS[1], p1, p2)
+redis.call('HSET', KEYS[2], 'p1', p1, 'p2', p2, 'status', 'active', 'created_at', ARGV[4])
+if ARGV[5] ~= '' then
+    redis.call('HSET', KEYS[2], 'time_control', ARGV[5])
+    redis.call('HSET', KEYS[3], 'clock', ARGV[6])
+    redis.call('EXPIRE', KEYS[3], ARGV[7])
+end
+redis.call('EXPIRE', KEYS[2], ARGV[7])
+redis.call('SET', 'user_match:' .. p1, ARGV[3], 'EX', ARGV[7])
+redis.call('SET', 'user_match:' .. p2, ARGV[3], 'EX', ARGV[7])
+return {p1, p2}
+"""
 
 
 def decode_redis_value(value):
@@ -22,97 +74,96 @@ async def heartbeat_user(user_id: int):
     await redis.set(f"heartbeat:{user_id}", int(time.time()), ex=HEARTBEAT_EXPIRY)
 
 
-async def is_user_alive(user_id: int) -> bool:
-    """Check if user is still active (heartbeat exists)."""
-    redis = await get_redis()
-    heartbeat = await redis.get(f"heartbeat:{user_id}")
-    return heartbeat is not None
-
-
-async def cleanup_dead_users():
-    """Remove users from queue who don't have active heartbeats."""
-    redis = await get_redis()
-    queue_items = await redis.lrange(MATCHMAKING_QUEUE, 0, -1)
-    for item in queue_items:
-        user_id = decode_redis_value(item)
-        if not await is_user_alive(int(user_id)):
-            await redis.lrem(MATCHMAKING_QUEUE, 1, user_id)
-            await redis.delete(f"user_match:{user_id}")
-
-
 async def add_to_queue(user_id: int) -> Optional[Dict]:
     """Add user to matchmaking queue and try to find a match."""
     redis = await get_redis()
     user_id_str = str(user_id)
     await heartbeat_user(user_id)
-    await cleanup_dead_users()
     old_match = await redis.get(f"user_match:{user_id}")
     if old_match:
         old_match_id = decode_redis_value(old_match)
         await redis.delete(f"user_match:{user_id}")
-        await redis.delete(f"game:{old_match_id}")
+        await redis.delete(*game_keys(old_match_id), events_key(old_match_id))
+        await redis.zrem(CLOCKS_KEY, old_match_id)
         await redis.delete(f"ws_conn:{old_match_id}:{user_id}")
-    await redis.lrem(MATCHMAKING_QUEUE, 0, user_id_str)
-    queue_items = await redis.lrange(MATCHMAKING_QUEUE, 0, -1)
-    queue_items_decoded = [decode_redis_value(item) for item in queue_items]
-    if user_id_str not in queue_items_decoded:
-        await redis.rpush(MATCHMAKING_QUEUE, user_id_str)
-    async with redis.pipeline(transaction=True) as pipe:
-        try:
-            await pipe.watch(MATCHMAKING_QUEUE)
-            queue_length = await redis.llen(MATCHMAKING_QUEUE)
-            if queue_length >= 2:
-                pipe.multi()
-                pipe.lpop(MATCHMAKING_QUEUE)
-                pipe.lpop(MATCHMAKING_QUEUE)
-                results = await pipe.execute()
-                if len(results) >= 2 and results[0] and results[1]:
-                    player1_id = decode_redis_value(results[0])
-                    player2_id = decode_redis_value(results[1])
-                    if not await is_user_alive(int(player1_id)):
-                        await redis.lpush(MATCHMAKING_QUEUE, player2_id)
-                        return None
-                    if not await is_user_alive(int(player2_id)):
-                        await redis.lpush(MATCHMAKING_QUEUE, player1_id)
-                        return None
-                    if player1_id == player2_id:
-                        await redis.lpush(MATCHMAKING_QUEUE, player1_id)
-                        return None
-                    match_id = str(uuid.uuid4())
-                    match_data = {
-                        "p1": player1_id,
-                        "p2": player2_id,
-                        "status": "active",
-                        "created_at": int(time.time()),
-                    }
-                    await redis.hset(f"match:{match_id}", mapping=match_data)
-                    await redis.expire(f"match:{match_id}", 3600)  # 1 hour expiry
-                    await redis.set(f"user_match:{player1_id}", match_id, ex=3600)
-                    await redis.set(f"user_match:{player2_id}", match_id, ex=3600)
-                    if user_id_str == player1_id:
-                        return {
-                            "matchId": match_id,
-                            "opponent": int(player2_id),
-                            "role": "goat",
-                        }
-                    elif user_id_str == player2_id:
-                        return {
-                            "matchId": match_id,
-                            "opponent": int(player1_id),
-                            "role": "tiger",
-                        }
-                    return None
-        except Exception as e:
-            await pipe.reset()
-            print(f"Matchmaking error: {e}")
-    return None
+    match_id = str(uuid.uuid4())
+    time_control = settings.DEFAULT_TIME_CONTROL
+    try:
+        paired = await redis.eval(
+            PAIR_SCRIPT,
+            3,
+            MATCHMAKING_QUEUE,
+            f"match:{match_id}",
+            game_keys(match_id)[0],
+            user_id_str,
+            time.time(),
+            match_id,
+            int(time.time()),
+            time_control or "",
+            initial_clock(time_control),
+            MATCH_TTL,
+        )
+    except Exception as e:
+        print(f"Matchmaking error: {e}")
+        return None
+    if not paired:
+        return None
+    player1_id, player2_id = (decode_redis_value(player) for player in paired)
+    if user_id_str == player1_id:
+        return {"matchId": match_id, "opponent": int(player2_id), "role": "goat"}
+    return {"matchId": match_id, "opponent": int(player1_id), "role": "tiger"}
+
+
+def initial_clock(time_control: Optional[str]) -> str:
+    """JSON clock of a fresh game under `time_control`, "" when untimed."""
+    if not time_control:
+        return ""
+    game = BaghChalGame()
+    game.set_time_control(time_control)
+    return json.dumps(game.clock_state())
+
+
+async def set_time_control(match_id: str, time_control: Optional[str]):
+    """Write the starting clock of a timed match into its game hash."""
+    if not time_control:
+        return
+    redis = await get_redis()
+    game_key = game_keys(match_id)[0]
+    await redis.hset(game_key, mapping={"clock": initial_clock(time_control)})
+    await redis.expire(game_key, MATCH_TTL)
+
+
+async def create_bot_match(
+    user_id: int, role: str, mode: str, time_control: Optional[str] = None
+) -> Dict:
+    """Create a match against a server-side AI opponent."""
+    redis = await get_redis()
+    user_id_str = str(user_id)
+    bot_id_str = str(BOT_USER_ID)
+    bot_role = "tiger" if role == "goat" else "goat"
+    match_id = str(uuid.uuid4())
+    match_data = {
+        "p1": user_id_str if role == "goat" else bot_id_str,
+        "p2": bot_id_str if role == "goat" else user_id_str,
+        "status": "active",
+        "created_at": int(time.time()),
+        "bot_role": bot_role,
+        "bot_mode": mode,
+    }
+    if time_control:
+        match_data["time_control"] = time_control
+    await redis.hset(f"match:{match_id}", mapping=match_data)
+    await redis.expire(f"match:{match_id}", 3600)
+    await set_time_control(match_id, time_control)
+    await redis.set(f"user_match:{user_id_str}", match_id, ex=3600)
+    return {"matchId": match_id, "opponent": BOT_USER_ID, "role": role, "bot": True}
 
 
 async def remove_from_queue(user_id: int):
     """Remove user from matchmaking queue and cleanup."""
     redis = await get_redis()
     user_id_str = str(user_id)
-    await redis.lrem(MATCHMAKING_QUEUE, 0, user_id_str)
+    await redis.zrem(MATCHMAKING_QUEUE, user_id_str)
     user_match = await redis.get(f"user_match:{user_id}")
     if user_match:
         match_id = decode_redis_value(user_match)
@@ -146,9 +197,15 @@ async def cleanup_match(match_id: str):
             await redis.delete(f"user_match:{p1}")
             await redis.delete(f"ws_conn:{match_id}:{p1}")
             await redis.delete(f"heartbeat:{p1}")
+            await redis.delete(grace_key(match_id, p1))
         if p2:
             await redis.delete(f"user_match:{p2}")
             await redis.delete(f"ws_conn:{match_id}:{p2}")
             await redis.delete(f"heartbeat:{p2}")
+            await redis.delete(grace_key(match_id, p2))
     await redis.delete(f"match:{match_id}")
-    await redis.delete(f"game:{match_id}")
+    await redis.delete(*game_keys(match_id))
+    await redis.delete(
+        f"match_workers:{match_id}", f"match_spectators:{match_id}", events_key(match_id)
+    )
+    await redis.zrem(CLOCKS_KEY, match_id)
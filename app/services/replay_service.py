@@ -10,8 +10,9 @@ async def save_replay(
     player2_id: int,
     winner_id: int,
     moves: List[dict],
+    commit: bool = True,
 ):
-    """Save game replay to database."""
+    """Save game replay to database (only flushed when commit is False)."""
     replay = db.query(Replay).filter(Replay.game_id == game_id).first()
     if replay:
         replay.player1_id = player1_id
@@ -27,6 +28,9 @@ async def save_replay(
             moves=moves or [],
         )
         db.add(replay)
+    if not commit:
+        db.flush()
+        return replay
     db.commit()
     db.refresh(replay)
     return replay
@@ -0,0 +1,209 @@
+"""Post-game processing off the websocket path.
+
+finish_match enqueues one "game finished" job per match into a Redis list.
+A separate process (python -m app.workers.game_jobs) applies ELO, the game
+log and the replay in a single transaction. Failed jobs are retried with
+backoff and end up on a dead-letter list. A job for a match that is already
+recorded is skipped, so redelivery is harmless.
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.db.models.game_log import GameLog
+from app.db.models.replay import Replay
+from app.db.models.user import User
+from app.db.session import SessionLocal
+from app.services.elo_service import update_elo_ratings
+from app.services.game_log_service import log_game
+from app.services.replay_service import save_replay
+
+GAME_JOBS_QUEUE = "jobs:game_finished"
+GAME_JOBS_DELAYED = "jobs:game_finished:delayed"  # retries, scored by due time
+GAME_JOBS_DEAD = "jobs:game_finished:dead"
+
+
+def build_game_finished_job(match_id: str, match_data: Dict, game, winner: str) -> Dict:
+    """Everything record_game_result needs, captured before the match is cleaned up."""
+    return {
+        "match_id": match_id,
+        "p1": int(match_data["p1"]),
+        "p2": int(match_data["p2"]),
+        "bot": bool(match_data.get("bot_role")),
+        "winner": winner,
+        "moves": list(game.move_history) if game else [],
+        "goats_captured": game.goats_captured if game else 0,
+        "attempts": 0,
+    }
+
+
+async def enqueue_game_finished(job: Dict):
+    redis = await get_redis()
+    await redis.lpush(GAME_JOBS_QUEUE, json.dumps(job))
+
+
+def already_recorded(db: Session, job: Dict) -> bool:
+    """Idempotency check: rated games have a game log, bot games a replay."""
+    if job["bot"]:
+        model, column = Replay, Replay.game_id
+    else:
+        model, column = GameLog, GameLog.match_id
+    return db.query(model).filter(column == job["match_id"]).first() is not None
+
+
+async def record_game_result(db: Session, job: Dict):
+    """Update ELO, game log and replay for a finished match in one transaction."""
+    match_id = job["match_id"]
+    # p1 is goat, p2 is tiger
+    goat_player_id = job["p1"]
+    tiger_player_id = job["p2"]
+    winner_id = goat_player_id if job["winner"] == "goat" else tiger_player_id
+    loser_id = tiger_player_id if job["winner"] == "goat" else goat_player_id
+    moves = job["moves"]
+
+    # Bot games are not rated, only kept for replay/analysis
+    if job["bot"]:
+        await save_replay(
+            db, match_id, goat_player_id, tiger_player_id, winner_id, moves, commit=False
+        )
+        db.commit()
+        return
+
+    tiger = db.query(User).filter(User.id == tiger_player_id).first()
+    goat = db.query(User).filter(User.id == goat_player_id).first()
+    tiger_elo_before = tiger.elo_rating if tiger else 1200.0
+    goat_elo_before = goat.elo_rating if goat else 1200.0
+
+    await update_elo_ratings(db, winner_id, loser_id, commit=False)
+
+    tiger_elo_after = tiger.elo_rating if tiger else tiger_elo_before
+    goat_elo_after = goat.elo_rating if goat else goat_elo_before
+
+    log_game(
+        db=db,
+        match_id=match_id,
+        tiger_player_id=tiger_player_id,
+        goat_player_id=goat_player_id,
+        winner_id=winner_id,
+        result="tiger_win" if job["winner"] == "tiger" else "goat_win",
+        goats_captured=job["goats_captured"],
+        total_moves=len(moves),
+        game_duration_seconds=None,
+        tiger_elo_before=tiger_elo_before,
+        tiger_elo_after=tiger_elo_after,
+        goat_elo_before=goat_elo_before,
+        goat_elo_after=goat_elo_after,
+        moves_history={"moves": moves},
+        commit=False,
+    )
+    await save_replay(
+        db, match_id, goat_player_id, tiger_player_id, winner_id, moves, commit=False
+    )
+    db.commit()
+
+
+class GameJobWorker:
+    """Reliable consumer of the game finished queue.
+
+    A job is moved atomically to this worker's processing list while it runs
+    and removed only once handled, so jobs of a crashed worker are picked up
+    again when it restarts under the same id."""
+
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.worker_id = worker_id or os.environ.get("GAME_JOB_WORKER_ID") or socket.gethostname()
+        self.processing = f"{GAME_JOBS_QUEUE}:processing:{self.worker_id}"
+        self.session_factory = session_factory
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+
+    async def recover(self):
+        """Requeue jobs left in this worker's processing list by a previous run."""
+        redis = await get_redis()
+        while await redis.lmove(self.processing, GAME_JOBS_QUEUE, "LEFT", "RIGHT"):
+            pass
+
+    async def promote_due(self, now: Optional[float] = None):
+        """Move retries whose backoff has elapsed back onto the queue."""
+        redis = await get_redis()
+        now = time.time() if now is None else now
+        for raw in await redis.zrangebyscore(GAME_JOBS_DELAYED, "-inf", now):
+            # Only the worker that removes the entry requeues it
+            if await redis.zrem(GAME_JOBS_DELAYED, raw):
+                await redis.lpush(GAME_JOBS_QUEUE, raw)
+
+    async def run_once(self, timeout: float = 1.0) -> bool:
+        """Process one job, waiting up to `timeout` seconds. Returns False if idle."""
+        redis = await get_redis()
+        raw = await redis.blmove(GAME_JOBS_QUEUE, self.processing, timeout, "RIGHT", "LEFT")
+        if raw is None:
+            return False
+        await self.handle(raw)
+        await redis.lrem(self.processing, 1, raw)
+        return True
+
+    async def handle(self, raw: str):
+        job = None
+        db = self.session_factory()
+        try:
+            job = json.loads(raw)
+            if already_recorded(db, job):
+                self.skipped += 1
+                return
+            await record_game_result(db, job)
+            self.processed += 1
+        except Exception as e:
+            db.rollback()
+            self.failed += 1
+            if isinstance(job, dict):
+                await self.retry(job, e)
+            else:
+                # A payload that does not parse never will, so it is not retried
+                print(f"Malformed game job, moved to dead letters: {e}")
+                redis = await get_redis()
+                await redis.lpush(GAME_JOBS_DEAD, raw)
+        finally:
+            db.close()
+
+    async def retry(self, job: Dict, error: Exception):
+        redis = await get_redis()
+        job["attempts"] = job.get("attempts", 0) + 1
+        job["error"] = str(error)
+        raw = json.dumps(job)
+        if job["attempts"] >= settings.GAME_JOB_MAX_ATTEMPTS:
+            print(f"Game job for {job['match_id']} failed for good: {error}")
+            await redis.lpush(GAME_JOBS_DEAD, raw)
+            return
+        delay = settings.GAME_JOB_RETRY_SECONDS * 2 ** (job["attempts"] - 1)
+        print(f"Game job for {job['match_id']} failed, retrying in {delay:.0f}s: {error}")
+        await redis.zadd(GAME_JOBS_DELAYED, {raw: time.time() + delay})
+
+    async def run(self):
+        await self.recover()
+        print(f"Game job worker {self.worker_id} started")
+        while True:
+            try:
+                await self.promote_due()
+                await self.run_once()
+            except Exception as e:
+                print(f"Game job worker error: {e}")
+                await asyncio.sleep(1)
+
+
+def main():
+    asyncio.run(GameJobWorker().run())
+
+
+if __name__ == "__main__":
+    main()
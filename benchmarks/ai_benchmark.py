@@ -0,0 +1,143 @@
+"""Latency and strength benchmark for HybridAIService.choose_move.
+
+Runs every mode over the fixed position suite in benchmarks/ai_positions.py
+and writes a JSON report that can be diffed across commits.
+
+Usage:
+    python -m benchmarks.ai_benchmark --iterations 20 --output ai_report.json
+    python -m benchmarks.ai_benchmark --compare ai_report_main.json
+"""
+import argparse
+import json
+import math
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from app.services.game.ai_service import hybrid_ai_service
+from benchmarks.ai_positions import POSITIONS, parse_board
+
+MODES = ("heuristic", "model", "hybrid")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def run_mode(mode: str, iterations: int) -> Dict:
+    latencies_ms: List[float] = []
+    evaluations = 0
+    total_seconds = 0.0
+    positions = []
+    categories: Dict[str, List[int]] = {}
+
+    for position in POSITIONS:
+        board = parse_board(position["board"])
+        chosen = None
+        for _ in range(iterations):
+            nodes_before = hybrid_ai_service.nodes_evaluated
+            started = time.perf_counter()
+            chosen, mode_used, _score = hybrid_ai_service.choose_move(
+                board=board,
+                turn=position["turn"],
+                phase=position["phase"],
+                goats_placed=position["goats_placed"],
+                goats_captured=position["goats_captured"],
+                ai_role=position["turn"],
+                mode=mode,
+            )
+            elapsed = time.perf_counter() - started
+            total_seconds += elapsed
+            latencies_ms.append(elapsed * 1000.0)
+            evaluations += hybrid_ai_service.nodes_evaluated - nodes_before
+
+        agrees = chosen is not None and any(
+            hybrid_ai_service._same_move(chosen, reference)
+            for reference in position["reference"]
+        )
+        positions.append(
+            {"name": position["name"], "move": chosen, "agrees": agrees}
+        )
+        totals = categories.setdefault(position["category"], [0, 0])
+        totals[0] += int(agrees)
+        totals[1] += 1
+
+    agreed = sum(1 for result in positions if result["agrees"])
+    return {
+        "mode_used": mode_used,
+        "samples": len(latencies_ms),
+        "mean_ms": statistics.fmean(latencies_ms),
+        "p99_ms": percentile(latencies_ms, 99),
+        "evals_per_second": evaluations / total_seconds if total_seconds else 0.0,
+        "agreement": agreed / len(positions),
+        "agreement_by_category": {
+            name: hits / count for name, (hits, count) in sorted(categories.items())
+        },
+        "positions": positions,
+    }
+
+
+def build_report(iterations: int) -> Dict:
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "model_loaded": hybrid_ai_service.model_loaded,
+        "iterations": iterations,
+        "positions": len(POSITIONS),
+        "modes": {mode: run_mode(mode, iterations) for mode in MODES},
+    }
+
+
+def print_summary(report: Dict, baseline: Optional[Dict] = None):
+    print(f"{'mode':<10} {'mean ms':>9} {'p99 ms':>9} {'evals/s':>11} {'agree':>7}")
+    for mode, result in report["modes"].items():
+        line = (
+            f"{mode:<10} {result['mean_ms']:>9.3f} {result['p99_ms']:>9.3f} "
+            f"{result['evals_per_second']:>11.0f} {result['agreement']:>7.0%}"
+        )
+        previous = (baseline or {}).get("modes", {}).get(mode)
+        if previous:
+            line += (
+                f"   (mean {result['mean_ms'] - previous['mean_ms']:+.3f} ms, "
+                f"p99 {result['p99_ms'] - previous['p99_ms']:+.3f} ms, "
+                f"agree {result['agreement'] - previous['agreement']:+.0%})"
+            )
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HybridAIService.choose_move")
+    parser.add_argument("--iterations", type=int, default=20, help="runs per position and mode")
+    parser.add_argument("--output", help="write the JSON report to this path")
+    parser.add_argument("--compare", help="baseline JSON report to diff against")
+    args = parser.parse_args()
+
+    report = build_report(max(1, args.iterations))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+    print_summary(report, baseline)
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
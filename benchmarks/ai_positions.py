@@ -0,0 +1,155 @@
+"""Fixed position suite for the AI benchmark.
+
+Boards are written row by row ("T" tiger, "G" goat, "." empty). Reference
+moves are the moves that win outright, capture, or do not give away material
+or the game on the next ply; every other legal move counts as a disagreement.
+"""
+from typing import Dict, List
+
+PIECES = {".": 0, "G": 1, "T": 2}
+
+
+def parse_board(rows: str) -> List[int]:
+    return [PIECES[cell] for cell in rows.replace("/", "")]
+
+
+def place(position: int) -> Dict:
+    return {"type": "place", "position": position}
+
+
+def move(from_pos: int, to_pos: int) -> Dict:
+    return {"type": "move", "from": from_pos, "to": to_pos}
+
+
+POSITIONS: List[Dict] = [
+    {
+        "name": "opening-empty",
+        "category": "opening",
+        "board": "T...T/...../...../...../T...T",
+        "turn": "goat",
+        "phase": 1,
+        "goats_placed": 0,
+        "goats_captured": 0,
+        "reference": [place(p) for p in (2, 7, 10, 11, 12, 13, 14, 17, 22)],
+    },
+    {
+        "name": "opening-second",
+        "category": "opening",
+        "board": "....T/.T.../..G../...../T...T",
+        "turn": "goat",
+        "phase": 1,
+        "goats_placed": 1,
+        "goats_captured": 0,
+        "reference": [place(18)],
+    },
+    {
+        "name": "opening-third",
+        "category": "opening",
+        "board": "TG..T/...../..G../...../T...T",
+        "turn": "goat",
+        "phase": 1,
+        "goats_placed": 2,
+        "goats_captured": 0,
+        "reference": [place(2)],
+    },
+    {
+        "name": "midgame-placement",
+        "category": "midgame",
+        "board": "T.G.T/.GGG./..G../.T.../...T.",
+        "turn": "goat",
+        "phase": 1,
+        "goats_placed": 5,
+        "goats_captured": 0,
+        "reference": [place(p) for p in (1, 3, 10, 11, 13, 14, 15, 19, 20, 21, 24)],
+    },
+    {
+        "name": "midgame-movement",
+        "category": "midgame",
+        "board": "TGGGT/GGGGG/GG.GG/G.T.G/TGGG.",
+        "turn": "goat",
+        "phase": 2,
+        "goats_placed": 20,
+        "goats_captured": 3,
+        "reference": [move(6, 12), move(8, 12), move(11, 12), move(13, 12)],
+    },
+    {
+        "name": "midgame-threat",
+        "category": "midgame",
+        "board": "T...T/.GG../.G.G./..T../T....",
+        "turn": "goat",
+        "phase": 1,
+        "goats_placed": 4,
+        "goats_captured": 0,
+        "reference": [place(12)],
+    },
+    {
+        "name": "capture-corner",
+        "category": "capture",
+        "board": "T...T/.G.../...../...../T...T",
+        "turn": "tiger",
+        "phase": 1,
+        "goats_placed": 1,
+        "goats_captured": 0,
+        "reference": [move(0, 12)],
+    },
+    {
+        "name": "capture-center",
+        "category": "capture",
+        "board": "..T../..G../...../...../T.T.T",
+        "turn": "tiger",
+        "phase": 1,
+        "goats_placed": 1,
+        "goats_captured": 0,
+        "reference": [move(2, 12)],
+    },
+    {
+        "name": "capture-choice",
+        "category": "capture",
+        "board": "T...T/GG.../..G../...../T...T",
+        "turn": "tiger",
+        "phase": 1,
+        "goats_placed": 3,
+        "goats_captured": 0,
+        "reference": [move(0, 10)],
+    },
+    {
+        "name": "near-trap-goat-a",
+        "category": "near_trap",
+        "board": "TGGGT/GG.GG/G.G.G/GGGGG/TG.GT",
+        "turn": "goat",
+        "phase": 2,
+        "goats_placed": 20,
+        "goats_captured": 3,
+        "reference": [move(17, 22)],
+    },
+    {
+        "name": "near-trap-goat-b",
+        "category": "near_trap",
+        "board": "GTGGG/.GGGG/GGGGG/GGT.G/TGGTG",
+        "turn": "goat",
+        "phase": 2,
+        "goats_placed": 20,
+        "goats_captured": 1,
+        "reference": [move(14, 18)],
+    },
+    {
+        "name": "near-trap-tiger-a",
+        "category": "near_trap",
+        "board": "GGGGG/GGGGT/T.GGG/.GGTG/GGGTG",
+        "turn": "tiger",
+        "phase": 2,
+        "goats_placed": 20,
+        "goats_captured": 1,
+        "reference": [move(10, 15)],
+    },
+    {
+        "name": "near-trap-tiger-b",
+        "category": "near_trap",
+        "board": "GGGGG/GGGGG/GGTTG/TGG.G/GGTGG",
+        "turn": "tiger",
+        "phase": 2,
+        "goats_placed": 20,
+        "goats_captured": 0,
+        "reference": [move(13, 18)],
+    },
+]
@@ -0,0 +1,96 @@
+"""Encode/decode CPU and bytes on the wire: JSON vs binary websocket protocol.
+
+Replays heuristic self-play games as the frames a match exchanges: every
+client move, the update it produces for both players, and a start and a
+resync snapshot per player.
+
+Usage:
+    python -m benchmarks.protocol_benchmark --games 5 --repeat 200
+"""
+import argparse
+import time
+from typing import Dict, List
+
+from app.services.game.game_service import BaghChalGame
+from app.services.game.match_service import apply_move, snapshot_message, update_message
+from app.services.game.protocol import BINARY_SUBPROTOCOL, JSON_PROTOCOL, PROTOCOLS
+from benchmarks.redis_bytes import self_play
+
+PROTOCOLS_UNDER_TEST = {"json": JSON_PROTOCOL, "binary": PROTOCOLS[BINARY_SUBPROTOCOL]}
+
+
+def game_frames(moves: List[Dict]) -> List[Dict]:
+    """(message, recipients) pairs in the order a two-player match sends them."""
+    game = BaghChalGame()
+    start = dict(snapshot_message(game), type="start", match_id="0" * 36, role="goat")
+    start["player"] = {"id": 1, "username": "player-one", "elo_rating": 1200.0}
+    start["opponent"] = {"id": 2, "username": "player-two", "elo_rating": 1200.0, "bot": False}
+    frames = [(start, 2)]
+    for move in moves:
+        sent = {key: value for key, value in move.items() if key != "captured"}
+        sent["seq"] = game.version
+        frames.append((sent, 1))
+        apply_move(game, game.turn, move)
+        frames.append((update_message(game, game.version), 2))
+    frames.append((snapshot_message(game), 2))
+    return frames
+
+
+def measure(frames, protocol, repeat: int) -> Dict[str, float]:
+    wire_bytes = 0
+    encoded = []
+    for message, recipients in frames:
+        payload = protocol.encode(message)
+        size = len(payload.encode("utf-8")) if isinstance(payload, str) else len(payload)
+        wire_bytes += size * recipients
+        encoded.append(payload)
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for message, _recipients in frames:
+            protocol.encode(message)
+    encode_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for payload in encoded:
+            protocol.decode(payload)
+    decode_s = time.perf_counter() - started
+
+    count = repeat * len(frames)
+    return {
+        "bytes": wire_bytes,
+        "encode_us": encode_s / count * 1e6,
+        "decode_us": decode_s / count * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare websocket wire protocols")
+    parser.add_argument("--games", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=200, help="encode/decode passes per game")
+    args = parser.parse_args()
+
+    totals = {name: {"bytes": 0, "encode_us": 0.0, "decode_us": 0.0} for name in PROTOCOLS_UNDER_TEST}
+    games = max(1, args.games)
+    plies = 0
+    for seed in range(games):
+        moves = self_play(seed)
+        plies += len(moves)
+        frames = game_frames(moves)
+        for name, protocol in PROTOCOLS_UNDER_TEST.items():
+            result = measure(frames, protocol, max(1, args.repeat))
+            for key, value in result.items():
+                totals[name][key] += value
+
+    print(f"{games} games, {plies / games:.0f} plies on average")
+    print(f"{'protocol':<8} {'bytes/game':>11} {'encode us':>10} {'decode us':>10}")
+    for name, total in totals.items():
+        print(
+            f"{name:<8} {total['bytes'] / games:>11.0f} "
+            f"{total['encode_us'] / games:>10.2f} {total['decode_us'] / games:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
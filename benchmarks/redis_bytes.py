@@ -0,0 +1,160 @@
+"""Redis bytes written per game: full-hash rewrite vs append-only layout.
+
+Plays heuristic self-play games through ConnectionManager.save_game against
+a recording client and compares with the previous layout, which rewrote
+board, history and move_history into game:{id} after every move.
+
+Usage:
+    python -m benchmarks.redis_bytes --games 5
+"""
+import argparse
+import asyncio
+import json
+from typing import Dict, List
+
+from app.services.game import connection_manager as cm
+from app.services.game.ai_service import hybrid_ai_service
+from app.services.game.match_service import apply_move
+
+MAX_PLIES = 300
+
+
+def _size(value) -> int:
+    if isinstance(value, bytes):
+        return len(value)
+    return len(str(value).encode("utf-8"))
+
+
+class RecordingPipeline:
+    def __init__(self, redis: "RecordingRedis"):
+        self.redis = redis
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_args):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    async def execute(self):
+        return [
+            await getattr(self.redis, name)(*args, **kwargs)
+            for name, args, kwargs in self.calls
+        ]
+
+
+class RecordingRedis:
+    """Counts the key and argument bytes of every write command."""
+
+    def __init__(self):
+        self.bytes_written = 0
+        self.writes = 0
+
+    def pipeline(self, transaction=True):
+        return RecordingPipeline(self)
+
+    async def hset(self, key, mapping):
+        self.writes += 1
+        self.bytes_written += _size(key) + sum(
+            _size(field) + _size(value) for field, value in mapping.items()
+        )
+
+    async def rpush(self, key, *values):
+        self.writes += 1
+        self.bytes_written += _size(key) + sum(_size(value) for value in values)
+
+    async def sadd(self, key, *values):
+        self.writes += 1
+        self.bytes_written += _size(key) + sum(_size(value) for value in values)
+
+
+async def legacy_save(redis: RecordingRedis, match_id: str, game):
+    state = game.to_dict()
+    await redis.hset(
+        f"game:{match_id}",
+        mapping={
+            "board": json.dumps(state["board"]),
+            "turn": state["turn"],
+            "goats_placed": state["goats_placed"],
+            "goats_captured": state["goats_captured"],
+            "phase": state["phase"],
+            "history": json.dumps(state["history"]),
+            "move_history": json.dumps(state["move_history"]),
+        },
+    )
+
+
+def self_play(seed: int) -> List[Dict]:
+    """Moves of one heuristic game; the seed varies the opening placement."""
+    game = cm.BaghChalGame()
+    moves = []
+    apply_move(game, "goat", {"type": "place", "position": [6, 8, 12, 16, 18][seed % 5]})
+    moves.append(game.move_history[-1])
+    while game.check_winner() is None and len(moves) < MAX_PLIES:
+        role = game.turn
+        move, _mode, _score = hybrid_ai_service.choose_move(
+            board=game.board,
+            turn=role,
+            phase=game.phase,
+            goats_placed=game.goats_placed,
+            goats_captured=game.goats_captured,
+            ai_role=role,
+            mode="heuristic",
+        )
+        if move is None or not apply_move(game, role, move)[0]:
+            break
+        moves.append(game.move_history[-1])
+    return moves
+
+
+async def measure(moves: List[Dict]) -> Dict[str, Dict]:
+    legacy = RecordingRedis()
+    append_only = RecordingRedis()
+    manager = cm.ConnectionManager()
+    legacy_game = cm.BaghChalGame()
+    game = cm.BaghChalGame()
+    manager.games["bench"] = game
+    manager.persisted["bench"] = (0, 0, 0)
+
+    async def fake_get_redis():
+        return append_only
+
+    cm.get_redis = fake_get_redis
+    legacy_last = append_last = 0
+    for move in moves:
+        role = legacy_game.turn
+        apply_move(legacy_game, role, move)
+        apply_move(game, role, move)
+        before = legacy.bytes_written
+        await legacy_save(legacy, "bench", legacy_game)
+        legacy_last = legacy.bytes_written - before
+        before = append_only.bytes_written
+        await manager.save_game("bench")
+        append_last = append_only.bytes_written - before
+    return {
+        "full_hash": {"total": legacy.bytes_written, "last_move": legacy_last},
+        "append_only": {"total": append_only.bytes_written, "last_move": append_last},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Redis bytes written per game")
+    parser.add_argument("--games", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'game':>4} {'plies':>6} {'full hash B':>12} {'append B':>10} {'last move B':>18}")
+    for seed in range(max(1, args.games)):
+        moves = self_play(seed)
+        result = asyncio.run(measure(moves))
+        full, append = result["full_hash"], result["append_only"]
+        print(
+            f"{seed:>4} {len(moves):>6} {full['total']:>12} {append['total']:>10} "
+            f"{full['last_move']:>8} -> {append['last_move']:<6}"
+        )
+
+
+if __name__ == "__main__":
+    main()
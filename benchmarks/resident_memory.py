@@ -0,0 +1,141 @@
+"""Memory held per resident match by ConnectionManager.
+
+Loads N matches through ConnectionManager._install_game, the path a worker
+takes when it picks a match up from Redis, and measures the Python heap
+with tracemalloc. The previous representation (a plain object with a list
+of move dicts and a set of md5 hex digests) is built from the same states
+for comparison.
+
+Usage:
+    python -m benchmarks.resident_memory --matches 10000 --plies 60
+"""
+import argparse
+import gc
+import hashlib
+import json
+import random
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+from app.services.game import connection_manager as cm
+from app.services.game.ai_service import AIState, hybrid_ai_service
+from app.services.game.match_service import apply_move
+
+DISTINCT_GAMES = 32
+
+
+class LegacyGame:
+    """Resident fields of BaghChalGame before it was slotted and array-backed."""
+
+    def __init__(self, state: Dict):
+        self.board = list(state["board"])
+        self.turn = state["turn"]
+        self.goats_placed = state["goats_placed"]
+        self.goats_captured = state["goats_captured"]
+        self.phase = state["phase"]
+        self.history = set()
+        self.total_goats = 20
+        self.move_history = [dict(move) for move in state["move_history"]]
+        self.version = state["version"]
+        self.time_control = None
+        self.clock_ms = {}
+        self.increment_ms = 0
+        self.turn_started_ms = None
+
+
+def random_game(seed: int, plies: int) -> Tuple[cm.BaghChalGame, List[str]]:
+    """A game of random legal moves plus the md5 digests the old layout kept."""
+    rng = random.Random(seed)
+    game = cm.BaghChalGame()
+    digests = []
+    while len(game.move_history) < plies and game.check_winner() is None:
+        state = AIState(
+            board=list(game.board),
+            turn=game.turn,
+            phase=game.phase,
+            goats_placed=game.goats_placed,
+            goats_captured=game.goats_captured,
+        )
+        moves = hybrid_ai_service._legal_moves(state, game.turn)
+        rng.shuffle(moves)
+        role = game.turn
+        if not any(apply_move(game, role, move)[0] for move in moves):
+            break
+        if role == "goat" and game.move_history[-1]["type"] == "move":
+            digests.append(hashlib.md5(json.dumps(game.board).encode()).hexdigest())
+    return game, digests
+
+
+def redis_shape(game: cm.BaghChalGame):
+    """The hash, move list and history set save_game writes for a game."""
+    fields = {
+        "board": json.dumps(game.board),
+        "turn": game.turn,
+        "goats_placed": str(game.goats_placed),
+        "goats_captured": str(game.goats_captured),
+        "phase": str(game.phase),
+        "version": str(game.version),
+    }
+    moves = [json.dumps(move) for move in game.move_history]
+    history = [str(code) for code in game.history]
+    return fields, moves, history
+
+
+def measure(build) -> Tuple[int, float, object]:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    kept = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used, elapsed, kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory per resident match")
+    parser.add_argument("--matches", type=int, default=10000)
+    parser.add_argument("--plies", type=int, default=60)
+    args = parser.parse_args()
+
+    games = [random_game(seed, args.plies) for seed in range(DISTINCT_GAMES)]
+    shapes = [redis_shape(game) for game, _digests in games]
+    states = [
+        dict(game.to_dict(), move_history=list(game.move_history))
+        for game, _digests in games
+    ]
+    digests = [digest_list for _game, digest_list in games]
+
+    def build_current():
+        manager = cm.ConnectionManager()
+        for index in range(args.matches):
+            fields, moves, history = shapes[index % DISTINCT_GAMES]
+            manager._install_game(f"match-{index}", fields, moves, history)
+        return manager
+
+    def build_legacy():
+        resident = {}
+        for index in range(args.matches):
+            game = LegacyGame(states[index % DISTINCT_GAMES])
+            # Fresh strings per game, as json/md5 produced them on every load
+            game.history = {digest[:16] + digest[16:] for digest in digests[index % DISTINCT_GAMES]}
+            resident[f"match-{index}"] = game
+        return resident
+
+    current, current_seconds, manager = measure(build_current)
+    legacy, _legacy_seconds, _resident = measure(build_legacy)
+    plies = sum(len(game.move_history) for game, _digests in games) / len(games)
+
+    print(f"{args.matches} resident matches, {plies:.0f} plies on average")
+    print(f"{'layout':<10} {'MB total':>9} {'bytes/match':>12}")
+    for name, used in (("dict/set", legacy), ("slotted", current)):
+        print(f"{name:<10} {used / 1e6:>9.1f} {used / args.matches:>12.0f}")
+    print(f"install {current_seconds / args.matches * 1e6:.0f} us/match, "
+          f"{len(manager.games)} resident")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""Websocket load test: many concurrent matches against main:app.
+
+Registers users, pairs them through /matchmaking/start and plays every match
+over /ws/game with scripted (random legal) or heuristic AI moves. By default
+the app runs in a child process on fakeredis and a throwaway SQLite
+database; --redis-url points that server at a real Redis and --url targets
+a running deployment instead.
+
+Reports the move round trip (move sent until the mover gets its update)
+p50/p95/p99, websocket messages per second per server worker and Redis
+commands per move.
+
+Usage:
+    python -m benchmarks.ws_load --matches 500
+    python -m benchmarks.ws_load --matches 200 --moves ai --output ws_load.json
+    python -m benchmarks.ws_load --url http://localhost:8000 --server-workers 4 \\
+        --redis-url redis://localhost:6379
+"""
+import argparse
+import asyncio
+import copy
+import json
+import math
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List, Optional
+
+# The spawned server (a child process inheriting this) gets a throwaway database
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='ws_load_')}/ws_load.db"
+)
+
+from app.services.game.game_service import ADJACENCY, EMPTY, GOAT, TIGER, BaghChalGame
+from app.services.game.match_service import apply_move
+
+PASSWORD = "LoadTest1pass"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class RedisOpCounter:
+    """Counts commands the app sends to Redis; a pipeline is one round trip."""
+
+    def __init__(self):
+        self.commands = 0
+        self.round_trips = 0
+
+    def install(self):
+        from redis.asyncio.client import Pipeline, Redis
+
+        counter = self
+        execute_command = Redis.execute_command
+        execute_pipeline = Pipeline.execute
+
+        async def counted_command(self, *args, **options):
+            counter.commands += 1
+            counter.round_trips += 1
+            return await execute_command(self, *args, **options)
+
+        async def counted_pipeline(self, *args, **kwargs):
+            counter.commands += len(self.command_stack)
+            counter.round_trips += 1
+            return await execute_pipeline(self, *args, **kwargs)
+
+        Redis.execute_command = counted_command
+        Pipeline.execute = counted_pipeline
+        return self
+
+    def snapshot(self) -> Dict[str, int]:
+        return {"commands": self.commands, "round_trips": self.round_trips}
+
+
+def serve(port: int, redis_url: Optional[str]):
+    """Run main:app for the load test; used as the child process."""
+    import uvicorn
+
+    import app.core.redis as core_redis
+
+    if redis_url:
+        os.environ["REDIS_URL"] = redis_url
+        core_redis.settings.REDIS_URL = redis_url
+    else:
+        try:
+            import fakeredis
+            import lupa  # fakeredis runs the app's Lua scripts with it
+        except ImportError:
+            sys.exit(
+                "fakeredis and lupa are required without --redis-url "
+                "(pip install -r requirements-dev.txt)"
+            )
+        core_redis.redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    counter = RedisOpCounter().install()
+
+    from app.db.session import Base, engine
+    from main import app
+
+    Base.metadata.create_all(bind=engine)
+    app.add_api_route("/_bench/stats", counter.snapshot)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(port: int, redis_url: Optional[str]) -> subprocess.Popen:
+    command = [sys.executable, "-m", "benchmarks.ws_load", "--serve", "--port", str(port)]
+    if redis_url:
+        command += ["--redis-url", redis_url]
+    return subprocess.Popen(command)
+
+
+class LoadStats:
+    def __init__(self):
+        self.rtts_ms: List[float] = []
+        self.sent = 0
+        self.received = 0
+        self.errors = 0
+        self.finished = 0
+
+
+def scripted_move(game: BaghChalGame, role: str, rng: random.Random) -> Optional[Dict]:
+    """A random legal move, checked on a copy so repetition is ruled out too."""
+    if role == "goat" and game.phase == 1:
+        empty = [pos for pos, piece in enumerate(game.board) if piece == EMPTY]
+        return {"type": "place", "position": rng.choice(empty)} if empty else None
+    candidates = []
+    for pos, piece in enumerate(game.board):
+        if role == "tiger" and piece == TIGER:
+            candidates += [(pos, to) for to in game.get_tiger_legal_moves(pos)]
+        elif role == "goat" and piece == GOAT:
+            candidates += [(pos, to) for to in ADJACENCY[pos] if game.board[to] == EMPTY]
+    rng.shuffle(candidates)
+    for from_pos, to_pos in candidates:
+        move = {"type": "move", "from": from_pos, "to": to_pos}
+        if apply_move(copy.deepcopy(game), role, move)[0]:
+            return move
+    return None
+
+
+def ai_move(game: BaghChalGame, role: str, _rng: random.Random) -> Optional[Dict]:
+    from app.services.game.ai_service import hybrid_ai_service
+
+    move, _mode, _score = hybrid_ai_service.choose_move(
+        board=game.board,
+        turn=role,
+        phase=game.phase,
+        goats_placed=game.goats_placed,
+        goats_captured=game.goats_captured,
+        ai_role=role,
+        mode="heuristic",
+    )
+    return move
+
+
+class Player:
+    """One side of a match, mirroring the position from start/update/snapshot."""
+
+    def __init__(self, token: str, match: Dict, choose, max_plies: int, stats: LoadStats, seed: int):
+        self.token = token
+        self.match_id = match["matchId"]
+        self.role = match["role"]
+        self.choose = choose
+        self.max_plies = max_plies
+        self.stats = stats
+        self.rng = random.Random(seed)
+        self.game = BaghChalGame()
+        self.pending = None  # (seq of our update, send time)
+        self.ws = None
+
+    async def send(self, message: Dict):
+        self.stats.sent += 1
+        await self.ws.send(json.dumps(message))
+
+    def load(self, message: Dict):
+        self.game.board = list(message["board"])
+        self.game.turn = message["turn"]
+        self.game.phase = message["phase"]
+        self.game.goats_placed = message["goats_placed"]
+        self.game.goats_captured = message["goats_captured"]
+        self.game.version = message["seq"]
+
+    async def apply(self, message: Dict) -> bool:
+        if message["seq"] != self.game.version + 1:
+            await self.send({"type": "resync"})
+            return False
+        apply_move(self.game, self.game.turn, message["move"])
+        if self.pending is not None and self.pending[0] == message["seq"]:
+            self.stats.rtts_ms.append((time.perf_counter() - self.pending[1]) * 1000.0)
+            self.pending = None
+        return True
+
+    async def move(self):
+        move = None
+        if self.game.version < self.max_plies:
+            move = self.choose(self.game, self.role, self.rng)
+        if move is None:
+            await self.send({"type": "leave"})
+            return
+        self.pending = (self.game.version + 1, time.perf_counter())
+        await self.send(dict(move, seq=self.game.version))
+
+    async def play(self, ws_base: str):
+        import websockets
+
+        url = f"{ws_base}/api/v1/ws/game?token={self.token}&matchId={self.match_id}"
+        connected = False
+        async with websockets.connect(url, max_size=None, open_timeout=60) as ws:
+            self.ws = ws
+            async for raw in ws:
+                self.stats.received += 1
+                message = json.loads(raw)
+                kind = message.get("type")
+                if kind == "ping":
+                    await self.send({"type": "pong"})
+                    continue
+                if kind == "game_over":
+                    if self.role == "goat":
+                        self.stats.finished += 1
+                    return
+                if kind == "error":
+                    self.stats.errors += 1
+                    self.pending = None
+                    await self.send({"type": "resync"})
+                    continue
+                if kind in ("start", "snapshot"):
+                    self.load(message)
+                    connected = connected or message.get("both_players_connected", False)
+                elif kind == "both_connected":
+                    connected = True
+                elif kind == "update" and not await self.apply(message):
+                    continue
+                if connected and self.game.turn == self.role and self.pending is None:
+                    await self.move()
+
+
+async def register(client, run_id: str, index: int) -> Dict:
+    name = f"load{run_id}{index}"
+    response = await client.post(
+        "/api/v1/auth/register",
+        json={"username": name, "email": f"{name}@load.test", "password": PASSWORD},
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def join_queue(client, token: str) -> Dict:
+    headers = {"Authorization": f"Bearer {token}"}
+    return (await client.post("/api/v1/matchmaking/start", headers=headers)).json()
+
+
+async def wait_for_match(client, token: str, result: Dict) -> Dict:
+    headers = {"Authorization": f"Bearer {token}"}
+    while "matchId" not in result:
+        await asyncio.sleep(0.05)
+        result = (await client.get("/api/v1/matchmaking/status", headers=headers)).json()
+    return result
+
+
+async def server_redis_ops(client, redis_url: Optional[str], spawned: bool) -> Optional[int]:
+    """Commands sent to Redis so far, or None when they cannot be observed."""
+    if spawned:
+        return (await client.get("/_bench/stats")).json()["commands"]
+    if redis_url:
+        import redis.asyncio as aioredis
+
+        redis = aioredis.from_url(redis_url, decode_responses=True)
+        try:
+            stats = await redis.info("commandstats")
+        finally:
+            await redis.close()
+        return sum(entry["calls"] for entry in stats.values())
+    return None
+
+
+async def wait_until_up(client, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("server did not come up")
+        await asyncio.sleep(0.2)
+
+
+async def run_load(args, base_url: str, spawned: bool) -> Dict:
+    import httpx
+
+    run_id = uuid.uuid4().hex[:6]
+    choose = ai_move if args.moves == "ai" else scripted_move
+    stats = LoadStats()
+    limits = httpx.Limits(max_connections=args.http_concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await wait_until_up(client)
+        gate = asyncio.Semaphore(args.http_concurrency)
+
+        async def limited(coro):
+            async with gate:
+                return await coro
+
+        started = time.perf_counter()
+        users = await asyncio.gather(
+            *(limited(register(client, run_id, i)) for i in range(args.matches * 2))
+        )
+        # Joined one at a time so every pairing attempt sees the previous one
+        joined = [await join_queue(client, user["token"]) for user in users]
+        matches = await asyncio.gather(
+            *(
+                limited(wait_for_match(client, user["token"], result))
+                for user, result in zip(users, joined)
+            )
+        )
+        setup_seconds = time.perf_counter() - started
+
+        ops_before = await server_redis_ops(client, args.redis_url, spawned)
+        ws_base = base_url.replace("http", "ws", 1)
+        players = [
+            Player(user["token"], match, choose, args.max_plies, stats, seed)
+            for seed, (user, match) in enumerate(zip(users, matches))
+        ]
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(player.play(ws_base) for player in players), return_exceptions=True
+        )
+        play_seconds = time.perf_counter() - started
+        ops_after = await server_redis_ops(client, args.redis_url, spawned)
+
+    failures = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+    moves = len(stats.rtts_ms)
+    messages = stats.sent + stats.received
+    return {
+        "matches": args.matches,
+        "moves_mode": args.moves,
+        "server_workers": args.server_workers,
+        "setup_seconds": setup_seconds,
+        "play_seconds": play_seconds,
+        "games_finished": stats.finished,
+        "moves": moves,
+        "rtt_ms": {
+            "p50": percentile(stats.rtts_ms, 50) if moves else None,
+            "p95": percentile(stats.rtts_ms, 95) if moves else None,
+            "p99": percentile(stats.rtts_ms, 99) if moves else None,
+            "mean": statistics.fmean(stats.rtts_ms) if moves else None,
+        },
+        "messages": messages,
+        "messages_per_second_per_worker": messages / play_seconds / args.server_workers,
+        "redis_ops_per_move": (
+            (ops_after - ops_before) / moves if moves and ops_before is not None else None
+        ),
+        "errors": stats.errors,
+        "connection_failures": len(failures),
+    }
+
+
+def print_summary(report: Dict):
+    rtt = report["rtt_ms"]
+    print(
+        f"{report['matches']} matches, {report['games_finished']} finished, "
+        f"{report['moves']} moves in {report['play_seconds']:.1f}s "
+        f"(setup {report['setup_seconds']:.1f}s)"
+    )
+    if rtt["p50"] is not None:
+        print(f"move RTT ms    p50 {rtt['p50']:.2f}  p95 {rtt['p95']:.2f}  p99 {rtt['p99']:.2f}")
+    print(f"messages/s per worker  {report['messages_per_second_per_worker']:.0f}")
+    if report["redis_ops_per_move"] is not None:
+        print(f"Redis ops per move     {report['redis_ops_per_move']:.2f}")
+    print(f"errors {report['errors']}, failed connections {report['connection_failures']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Websocket load test for /ws/game")
+    parser.add_argument("--matches", type=int, default=100, help="concurrent matches")
+    parser.add_argument("--moves", choices=("scripted", "ai"), default="scripted")
+    parser.add_argument("--max-plies", type=int, default=200, help="leave after this many plies")
+    parser.add_argument("--url", help="running server to test instead of spawning one")
+    parser.add_argument("--redis-url", help="real Redis for the spawned server (default fakeredis)")
+    parser.add_argument("--server-workers", type=int, default=1, help="workers behind --url")
+    parser.add_argument("--http-concurrency", type=int, default=16)
+    parser.add_argument("--output", help="write the JSON report to this path")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.redis_url)
+        return
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        server = spawn_server(port, args.redis_url)
+        base_url = f"http://127.0.0.1:{port}"
+        args.server_workers = 1
+    try:
+        report = asyncio.run(run_load(args, base_url.rstrip("/"), server is not None))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    print_summary(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,29 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 from app.core.redis import get_redis, close_redis
 from app.core.config import settings
+from app.core import metrics
 from app.api.v1.router import api_router
 from app.api.admin import router as admin_router
+from app.services.game.bot_service import bot_service
+from app.services.game.clock_service import clock_scheduler
+from app.services.game.connection_manager import manager
+from app.services.matchmaking_service import MATCHMAKING_QUEUE
 import traceback
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await get_redis()
+    await manager.start()
+    clock_scheduler.start()
     yield
+    clock_scheduler.stop()
+    bot_service.shutdown()
+    await manager.shutdown()
     await close_redis()
 
 
@@ -74,6 +84,7 @@ def root():
             "auth": "/auth",
             "matchmaking": "/matchmaking",
             "game": "/ws/game",
+            "multiplex": "/ws/multiplex",
             "replay": "/replay",
             "community": "/community",
             "test_ui": "/tests/static_test_ui.html",
@@ -86,6 +97,23 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/websockets")
+def websocket_health():
+    return manager.queue_stats()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    metrics.ACTIVE_MATCHES.set(len(manager.owned_matches))
+    metrics.ACTIVE_SOCKETS.set(len(manager.send_queues))
+    try:
+        redis = await get_redis()
+        metrics.MATCHMAKING_QUEUE_LENGTH.set(await redis.zcard(MATCHMAKING_QUEUE))
+    except Exception as e:
+        print(f"Error reading matchmaking queue length: {e}")
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -1,6 +1,9 @@
+import asyncio
 import os
+from concurrent.futures import Future
 import tempfile
 
+import fakeredis
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -78,3 +81,116 @@ def auth_header_for():
         return {"Authorization": f"Bearer {token}"}
 
     return _auth_header_for
+
+
+class FakeRedis(fakeredis.aioredis.FakeRedis):
+    """In-memory Redis that runs the app's Lua scripts for real (fakeredis with
+    lupa), counting the commands tests check and recording every publish."""
+
+    def __init__(self):
+        super().__init__(decode_responses=True)
+        self.full_reads = 0
+        self.moves_written = 0
+        self.evals = 0
+        # (channel, message) of every PUBLISH, including those made by scripts
+        self.published = []
+        self._listener = None
+
+    def _count(self, args):
+        command = str(args[0]).upper()
+        if command == "HGETALL":
+            self.full_reads += 1
+        elif command == "RPUSH":
+            self.moves_written += len(args) - 2
+        elif command == "EVAL":
+            self.evals += 1
+
+    async def execute_command(self, *args, **options):
+        if self._listener is None:
+            self._listener = self.pubsub()
+            await self._listener.psubscribe("*")
+        self._count(args)
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            while True:
+                message = await self._listener.get_message(ignore_subscribe_messages=True)
+                if message is None:
+                    break
+                if not message["channel"].startswith("__key"):
+                    self.published.append((message["channel"], message["data"]))
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = super().pipeline(transaction, shard_hint)
+        queue = pipe.execute_command
+
+        def execute_command(*args, **kwargs):
+            self._count(args)
+            return queue(*args, **kwargs)
+
+        pipe.execute_command = execute_command
+        return pipe
+
+
+class FakeSocket:
+    """Websocket that records every frame; a stalled one never finishes a send."""
+
+    def __init__(self, stalled=False):
+        self.stalled = stalled
+        self.sent = []
+        self.closed = None
+
+    async def send_text(self, text):
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(text)
+
+    async def send_bytes(self, data):
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(data)
+
+    async def close(self, code=1000, reason=""):
+        self.closed = (code, reason)
+
+
+class FakePool:
+    """Process pool stand-in: jobs start at once and finish when the test says so."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        self.jobs.append((fn, future))
+        return future
+
+    def finish(self, index=0):
+        fn, future = self.jobs.pop(index)
+        future.set_result(fn())
+
+
+@pytest.fixture()
+def fake_redis(monkeypatch):
+    def _fake_redis(*modules):
+        redis = FakeRedis()
+
+        async def fake_get_redis():
+            return redis
+
+        for module in modules:
+            monkeypatch.setattr(module, "get_redis", fake_get_redis)
+        return redis
+
+    return _fake_redis
+
+
+@pytest.fixture()
+def fake_socket():
+    return FakeSocket
+
+
+@pytest.fixture()
+def fake_pool():
+    return FakePool()
@@ -142,8 +142,8 @@ def test_matchmaking_endpoints(client, make_user, auth_header_for, monkeypatch):
         return None
 
     class FakeRedis:
-        async def lrange(self, *_args, **_kwargs):
-            return []
+        async def zscore(self, *_args, **_kwargs):
+            return None
 
         async def get(self, *_args, **_kwargs):
             return None
@@ -171,6 +171,34 @@ def test_matchmaking_endpoints(client, make_user, auth_header_for, monkeypatch):
     assert cancel.status_code == 200
 
 
+def test_bot_match_endpoint(client, make_user, auth_header_for, monkeypatch):
+    user = make_user("botu", "botu@example.com")
+    headers = auth_header_for(user.id, user.username)
+
+    async def fake_create(user_id, role, mode, time_control=None):
+        return {"matchId": "bot-1", "opponent": 0, "role": role, "bot": True}
+
+    monkeypatch.setattr("app.api.v1.endpoints.matchmaking.create_bot_match", fake_create)
+
+    ok = client.post("/api/v1/matchmaking/bot", headers=headers, json={"role": "tiger"})
+    assert ok.status_code == 200
+    assert ok.json()["role"] == "tiger"
+    assert ok.json()["bot"] is True
+
+    bad_role = client.post("/api/v1/matchmaking/bot", headers=headers, json={"role": "wolf"})
+    assert bad_role.status_code == 400
+
+    bad_mode = client.post(
+        "/api/v1/matchmaking/bot", headers=headers, json={"role": "goat", "mode": "random"}
+    )
+    assert bad_mode.status_code == 400
+
+    bad_clock = client.post(
+        "/api/v1/matchmaking/bot", headers=headers, json={"role": "goat", "time_control": "bullet"}
+    )
+    assert bad_clock.status_code == 400
+
+
 def test_ai_move_endpoint_validation(client, make_user, auth_header_for, monkeypatch):
     user = make_user("aiu", "aiu@example.com")
     headers = auth_header_for(user.id, user.username)
@@ -212,6 +240,46 @@ def test_ai_move_endpoint_validation(client, make_user, auth_header_for, monkeyp
     assert bad.status_code == 400
 
 
+def test_metrics_endpoint(client, make_user, auth_header_for, monkeypatch):
+    user = make_user("metu", "metu@example.com")
+    headers = auth_header_for(user.id, user.username)
+
+    class FakeAI:
+        def choose_move(self, **_kwargs):
+            return ({"type": "place", "position": 6}, "heuristic", 1.0)
+
+    class FakeRedis:
+        async def zcard(self, *_args, **_kwargs):
+            return 3
+
+    async def fake_get_redis():
+        return FakeRedis()
+
+    monkeypatch.setattr("app.api.v1.endpoints.game.hybrid_ai_service", FakeAI())
+    monkeypatch.setattr("main.get_redis", fake_get_redis)
+
+    def ai_calls():
+        text = client.get("/metrics").text
+        prefix = 'baghchal_ai_choose_move_seconds_count{mode="heuristic"} '
+        return int(next(line for line in text.splitlines() if line.startswith(prefix)).split()[-1])
+
+    before = ai_calls()
+    client.post(
+        "/api/v1/game/ai/move",
+        headers=headers,
+        json={"board": [0] * 25, "turn": "goat", "phase": 1, "goats_placed": 0,
+              "goats_captured": 0, "mode": "heuristic"},
+    )
+    assert ai_calls() == before + 1
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "baghchal_matchmaking_queue_length 3" in response.text
+    assert "# TYPE baghchal_move_seconds histogram" in response.text
+    assert 'baghchal_redis_command_seconds_bucket{command="EVAL",le="+Inf"}' in response.text
+
+
 def test_admin_routes(client, db_session, make_user):
     make_user("admin-user", "admin-user@example.com")
 
@@ -1,9 +1,12 @@
 import asyncio
+import json
 
 import pytest
 
 from app.core.security import create_access_token, decode_access_token, get_password_hash, verify_password
 from app.services import auth_service, email_service, elo_service, game_log_service, replay_service
+from app.services.game.ai_service import AIState, hybrid_ai_service
+from app.services.game.evaluation import Evaluator
 from app.services.game.game_service import BaghChalGame, GOAT, TIGER
 
 
@@ -135,6 +138,69 @@ def test_game_log_service_updates_stats(db_session, make_user):
     assert goat.games_lost == 1
 
 
+def test_game_job_worker_records_once_and_retries(db_session, make_user, monkeypatch, fake_redis):
+    import json
+
+    from app.core.config import settings
+    from app.db.models.game_log import GameLog
+    from app.workers import game_jobs
+
+    goat = make_user("jgoat", "jgoat@example.com")
+    tiger = make_user("jtiger", "jtiger@example.com")
+
+    redis = fake_redis(game_jobs)
+    worker = game_jobs.GameJobWorker("w1", session_factory=lambda: db_session)
+    monkeypatch.setattr(db_session, "close", lambda: None)
+    game = BaghChalGame()
+    game.place_goat(12)
+    job = game_jobs.build_game_finished_job(
+        "m-job", {"p1": str(goat.id), "p2": str(tiger.id)}, game, "goat"
+    )
+
+    async def scenario():
+        # Delivered twice, e.g. after a worker crash: recorded once
+        await game_jobs.enqueue_game_finished(job)
+        await game_jobs.enqueue_game_finished(job)
+        assert await worker.run_once()
+        assert await worker.run_once()
+        assert not await worker.run_once(0.01)
+        assert (worker.processed, worker.skipped) == (1, 1)
+        assert await redis.lrange(worker.processing, 0, -1) == []
+
+        # Jobs left in the processing list by a crashed run are requeued; one
+        # that is not a job at all goes straight to the dead letters
+        await redis.rpush(worker.processing, "stale")
+        await worker.recover()
+        assert await redis.lrange(game_jobs.GAME_JOBS_QUEUE, 0, -1) == ["stale"]
+        assert await worker.run_once()
+        assert await redis.lrange(worker.processing, 0, -1) == []
+        assert await redis.lrange(game_jobs.GAME_JOBS_QUEUE, 0, -1) == []
+        assert await redis.lrange(game_jobs.GAME_JOBS_DEAD, 0, -1) == ["stale"]
+        await redis.delete(game_jobs.GAME_JOBS_DEAD)
+
+        # Failures back off through the delayed set, then go to the dead list
+        broken = dict(job, match_id="m-broken", p2=10_000)
+
+        async def failing(_db, _job):
+            raise RuntimeError("database down")
+
+        monkeypatch.setattr(game_jobs, "record_game_result", failing)
+        await game_jobs.enqueue_game_finished(broken)
+        for attempt in range(1, settings.GAME_JOB_MAX_ATTEMPTS):
+            assert await worker.run_once()
+            assert not await worker.run_once(0.01)
+            await worker.promote_due(now=10**12)
+            assert json.loads(await redis.lindex(game_jobs.GAME_JOBS_QUEUE, 0))["attempts"] == attempt
+        assert await worker.run_once()
+        assert await redis.llen(game_jobs.GAME_JOBS_DEAD) == 1
+
+    asyncio.run(scenario())
+    db_session.refresh(goat)
+    assert goat.elo_rating > 1200 and goat.games_won == 1
+    assert db_session.query(GameLog).filter(GameLog.match_id == "m-job").count() == 1
+    assert replay_service.get_replay(db_session, "m-job").moves == game.move_history
+
+
 def test_baghchal_game_core_rules():
     game = BaghChalGame()
 
@@ -154,6 +220,1098 @@ def test_baghchal_game_core_rules():
     assert moved is True
 
 
+def test_compact_game_state_roundtrips_moves_and_board_codes():
+    from benchmarks.resident_memory import random_game
+
+    game, digests = random_game(1, 120)
+    assert len(game.history) == len(digests) > 0
+    assert list(BaghChalGame.replay_history(game.move_history)) == list(game.history)
+    assert game.move_history[-1] == list(game.move_history)[-1]
+    assert game.move_history[1:3] == list(game.move_history)[1:3]
+
+    restored = BaghChalGame()
+    restored.from_dict(game.to_dict())
+    assert restored.move_history == game.move_history and restored.history == game.history
+    # Games saved with md5 digests get their board codes rebuilt from the moves
+    legacy = BaghChalGame()
+    legacy.from_dict(dict(game.to_dict(), history=digests))
+    assert legacy.history == game.history
+
+    # Repetitions are found through the set, rebuilt from the codes after a load
+    shuffle = BaghChalGame()
+    shuffle.phase = 2
+    shuffle.board[7] = GOAT
+    for from_pos, to_pos in ((7, 6), (6, 7)):
+        assert shuffle.move_goat(from_pos, to_pos)[0]
+        shuffle.turn = "goat"
+    assert shuffle.seen_codes == set(shuffle.history)
+    reloaded = BaghChalGame()
+    reloaded.from_dict(shuffle.to_dict())
+    assert reloaded.seen_codes is None
+    assert reloaded.move_goat(7, 6) == (False, "Move would repeat a previous board state")
+
+
+def test_incremental_evaluator_matches_full_evaluation():
+    board = [0] * 25
+    for corner in (0, 4, 20, 24):
+        board[corner] = TIGER
+    for pos in (1, 6, 7, 12, 18):
+        board[pos] = GOAT
+    state = AIState(board=board, turn="tiger", phase=1, goats_placed=5, goats_captured=0)
+    evaluator = Evaluator.from_state(state)
+    before = evaluator.value("tiger")
+
+    moves = hybrid_ai_service._legal_moves(state, "tiger")
+    assert any(move.get("captured") is not None for move in moves)
+    for move in moves:
+        evaluator.make(move, "tiger")
+        child = hybrid_ai_service._apply_move(state, move, "tiger")
+        assert evaluator.board == child.board
+        assert evaluator.value("tiger") == Evaluator.from_state(child).value("tiger")
+        evaluator.unmake()
+        assert evaluator.value("tiger") == before
+    assert evaluator.board == board
+
+
+def test_game_analysis_flags_missed_capture():
+    moves = [
+        {"type": "place", "position": 1},
+        {"type": "move", "from": 0, "to": 5},
+        {"type": "place", "position": 6},
+        {"type": "move", "from": 5, "to": 0},
+    ]
+    plies, mode_used = hybrid_ai_service.analyze_game(moves, mode="heuristic")
+    assert mode_used == "heuristic"
+    assert len(plies) == 4
+    assert all(ply["mistake"] >= 0 for ply in plies)
+    # Tiger at 5 could capture the goat on 6 by jumping to 7 but retreated instead
+    assert plies[3]["best_move"].get("captured") is not None
+    assert plies[3]["mistake"] > 0
+
+    truncated, _ = hybrid_ai_service.analyze_game(
+        [{"type": "place", "position": 0}], mode="heuristic"
+    )
+    assert truncated == []
+
+
+def test_game_analysis_is_cached_under_the_mode_that_ran(monkeypatch, fake_redis):
+    from types import SimpleNamespace
+
+    from app.services import analysis_service
+
+    redis = fake_redis(analysis_service)
+    runs = []
+
+    ai = analysis_service.hybrid_ai_service
+
+    def analyze_game(moves, mode):
+        runs.append(mode)
+        return [], ai._mode_used(mode)
+
+    monkeypatch.setattr(analysis_service, "get_replay", lambda db, game_id: SimpleNamespace(moves=[]))
+    monkeypatch.setattr(ai, "analyze_game", analyze_game)
+    monkeypatch.setattr(ai, "model_loaded", False)
+
+    async def scenario():
+        # Without the model the default hybrid request runs, and is cached, as heuristic
+        assert (await analysis_service.get_game_analysis(None, "g1"))["mode_used"] == "heuristic"
+        assert (await analysis_service.get_game_analysis(None, "g1"))["mode_used"] == "heuristic"
+        await analysis_service.get_game_analysis(None, "g1", "heuristic")
+        assert runs == ["hybrid"] and not await redis.exists("analysis:g1:hybrid")
+
+        # Once the model is loaded the fallback is no longer served to hybrid requests
+        ai.model_loaded = True
+        assert (await analysis_service.get_game_analysis(None, "g1"))["mode_used"] == "hybrid"
+        assert runs == ["hybrid", "hybrid"]
+
+    asyncio.run(scenario())
+
+
+def test_ai_benchmark_positions_are_legal():
+    from benchmarks.ai_positions import POSITIONS, parse_board
+
+    for position in POSITIONS:
+        board = parse_board(position["board"])
+        assert board.count(TIGER) == 4
+        assert board.count(GOAT) == position["goats_placed"] - position["goats_captured"]
+        state = AIState(
+            board=board,
+            turn=position["turn"],
+            phase=position["phase"],
+            goats_placed=position["goats_placed"],
+            goats_captured=position["goats_captured"],
+        )
+        legal = hybrid_ai_service._legal_moves(state, position["turn"])
+        for reference in position["reference"]:
+            assert any(hybrid_ai_service._same_move(reference, move) for move in legal)
+        assert len(position["reference"]) < len(legal)
+
+
+def test_bot_ponders_likely_replies_and_keeps_cancelled_searches_counted(
+    monkeypatch, fake_redis, fake_pool
+):
+    from app.services.game import bot_service as bots
+    from app.services.game import connection_manager as cm
+    from app.services.game import match_service
+
+    fake_redis(cm)
+    manager = cm.ConnectionManager()
+    bot = bots.BotService()
+    played = []
+
+    async def record(match_id, role, move):
+        played.append((match_id, role, move))
+        return True, None, None
+
+    monkeypatch.setattr(bots, "manager", manager)
+    monkeypatch.setattr(bot, "_ensure_executor", lambda: fake_pool)
+    monkeypatch.setattr(match_service, "play_move", record)
+    monkeypatch.setattr(bots.settings, "BOT_WORKER_PROCESSES", 1)
+
+    async def settle():
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+    async def scenario():
+        assert await manager.acquire_match("m1") == manager.instance_id
+        game = manager.get_game("m1")
+        state = AIState(board=list(game.board), turn="goat", phase=1, goats_placed=0, goats_captured=0)
+        replies = bot._likely_replies(state, "goat")
+        moves = hybrid_ai_service._legal_moves(state, "goat")
+        values, _rows = hybrid_ai_service._evaluate_moves(Evaluator.from_state(state), moves, "goat", False)
+        assert len(replies) == bots.settings.BOT_PONDER_MAX_POSITIONS
+        assert replies[0].board == hybrid_ai_service._apply_move(state, moves[values.index(max(values))], "goat").board
+        assert all(child.turn == "tiger" and child.goats_placed == 1 for child in replies)
+
+        # The human's turn: the bot searches its replies one at a time on idle capacity
+        assert bot.seat("m1", "tiger", "heuristic")
+        bot.notify_turn("m1")
+        await settle()
+        assert len(fake_pool.jobs) == 1
+        fake_pool.finish()
+        await settle()
+        pondered = bot.ponder_results["m1"][bots.position_key(replies[0])]
+        assert len(fake_pool.jobs) == 1 and bot.inflight == 1
+
+        # The human plays the top reply: the pondered answer is played without a new search
+        reply = next(
+            move for move in moves
+            if hybrid_ai_service._apply_move(state, move, "goat").board == replies[0].board
+        )
+        assert match_service.apply_move(game, "goat", reply)[0]
+        bot.notify_turn("m1")
+        await bot.tasks["m1"]
+        assert played == [("m1", "tiger", pondered)]
+
+        # The discarded search keeps its pool slot until the process finishes it
+        assert "m1" not in bot.ponder_pending and len(fake_pool.jobs) == 1
+        assert bot.inflight == 1
+        fake_pool.finish()
+        await settle()
+        assert bot.inflight == 0
+        bot.release("m1")
+        manager.owned_matches.clear()
+
+    asyncio.run(scenario())
+
+
+def test_bot_moves_are_played_by_the_worker_holding_the_lease(
+    monkeypatch, fake_redis, fake_pool, fake_socket
+):
+    from app.api.v1.endpoints import game as endpoints
+    from app.services.game import bot_service as bots
+    from app.services.game import connection_manager as cm
+    from app.services.game import match_service
+
+    redis = fake_redis(cm)
+    owner, other = cm.ConnectionManager(), cm.ConnectionManager()
+    owner_bot, other_bot = bots.BotService(), bots.BotService()
+    for bot in (owner_bot, other_bot):
+        monkeypatch.setattr(bot, "_ensure_executor", lambda: fake_pool)
+    monkeypatch.setattr(bots.settings, "BOT_PONDER_ENABLED", False)
+
+    def use_worker(worker, bot):
+        monkeypatch.setattr(bots, "manager", worker)
+        monkeypatch.setattr(bots, "bot_service", bot)
+        monkeypatch.setattr(match_service, "manager", worker)
+
+    async def scenario():
+        assert await owner.acquire_match("m1") == owner.instance_id
+        game = owner.get_game("m1")
+        assert match_service.apply_move(game, "goat", {"type": "place", "position": 12})[0]
+        await owner.save_game("m1")
+
+        # Seated on a worker without the lease, the bot hands its seat to the owner
+        use_worker(other, other_bot)
+        await other.refresh_game("m1")
+        assert other_bot.seat("m1", "tiger", "heuristic", 1)
+        other_bot.notify_turn("m1")
+        await other_bot.tasks["m1"]
+        assert "m1" not in other_bot.seats and fake_pool.jobs == []
+        channel, data = redis.published[-1]
+        assert channel == owner.worker_channel
+        assert json.loads(data)["type"] == "bot" and json.loads(data)["user_id"] == 1
+
+        # The owner seats it, searches and plays the reply itself
+        use_worker(owner, owner_bot)
+        await owner._handle_worker_message(json.loads(data))
+        assert owner_bot.seats["m1"] == ("tiger", "heuristic", 1)
+        await asyncio.sleep(0)
+        fake_pool.finish()
+        await owner_bot.tasks["m1"]
+        assert game.turn == "goat" and len(game.move_history) == 2
+
+        # A full owner refuses the seat and tells the player
+        monkeypatch.setattr(bots.settings, "BOT_MAX_ACTIVE_GAMES", 1)
+        assert await owner.acquire_match("m2") == owner.instance_id
+        await owner._handle_worker_message(
+            {"type": "bot", "match_id": "m2", "role": "tiger", "mode": "heuristic",
+             "user_id": 1, "reply_to": other.worker_channel}
+        )
+        assert "m2" not in owner_bot.seats and "m2" not in owner.owned_matches
+        assert json.loads(redis.published[-1][1])["payload"]["message"] == "No bot capacity available"
+
+        # Taking a bot match over while full, the player's move is refused, not left unanswered
+        monkeypatch.setattr(endpoints, "manager", owner)
+        monkeypatch.setattr(endpoints, "bot_service", owner_bot)
+        client = fake_socket()
+        owner.set_protocol(client, cm.JSON_PROTOCOL)
+        move = {"type": "place", "position": 12}
+        assert await endpoints.route_move(client, "m3", 1, "goat", move, ("tiger", "heuristic")) is None
+        await owner.drain(client)
+        assert json.loads(client.sent[-1])["message"] == "No bot capacity available"
+        assert owner.get_game("m3").move_history == [] and "m3" not in owner.owned_matches
+        owner_bot.release("m1")
+        owner.owned_matches.clear()
+
+    asyncio.run(scenario())
+
+
+def test_binary_protocol_roundtrip_and_negotiation():
+    from app.services.game.match_service import snapshot_message
+    from app.services.game.protocol import (
+        BINARY_SUBPROTOCOL,
+        JSON_PROTOCOL,
+        ProtocolError,
+        negotiate,
+    )
+
+    binary = negotiate(["chat", BINARY_SUBPROTOCOL])
+    assert binary.subprotocol == BINARY_SUBPROTOCOL
+    assert negotiate([]) is JSON_PROTOCOL
+
+    game = BaghChalGame()
+    game.place_goat(12)
+    messages = [
+        {"type": "place", "position": 12, "seq": 0},
+        {"type": "move", "from": 0, "to": 1},
+        {"type": "ping"},
+        {"type": "update", "seq": 3, "move": {"type": "move", "from": 6, "to": 18, "captured": 12}},
+        {"type": "update", "seq": 1, "move": {"type": "place", "position": 12}},
+        snapshot_message(game),
+        {"type": "game_over", "winner": "tiger", "reason": "opponent_left"},
+        {
+            "type": "update",
+            "seq": 2,
+            "move": {"type": "move", "from": 0, "to": 1},
+            "clock": {"goat": 182000, "tiger": 177000},
+        },
+        dict(snapshot_message(game), clock={"goat": 1, "tiger": 600000}),
+        dict(snapshot_message(game), eid="1700000000000-0"),
+        {
+            "type": "update",
+            "seq": 2,
+            "move": {"type": "place", "position": 7},
+            "clock": {"goat": 182000, "tiger": 177000},
+            "eid": "1700000000000-1",
+        },
+    ]
+    for message in messages:
+        assert binary.decode(binary.encode(message)) == message
+    assert len(binary.encode(messages[3])) == 9
+
+    with pytest.raises(ProtocolError):
+        binary.decode(b"\x02\x01")
+
+
+def test_resident_game_versioning_and_append_only_saves(fake_redis):
+    from app.services.game import connection_manager as cm
+    from app.services.game.match_service import apply_move
+
+    redis = fake_redis(cm)
+    worker_a = cm.ConnectionManager()
+    worker_b = cm.ConnectionManager()
+
+    async def scenario():
+        await worker_a.load_game("m1")
+        await worker_b.load_game("m1")
+        game = worker_a.get_game("m1")
+        assert apply_move(game, "goat", {"type": "place", "position": 12})[0]
+        await worker_a.save_game("m1")
+
+        reads = redis.full_reads
+        await worker_a.refresh_game("m1")
+        assert redis.full_reads == reads
+
+        refreshed = await worker_b.refresh_game("m1")
+        assert redis.full_reads == reads + 1
+        assert refreshed.version == 1
+        assert refreshed.board[12] == GOAT
+        await worker_b.refresh_game("m1")
+        assert redis.full_reads == reads + 1
+
+        # Later saves append only the new moves instead of rewriting the history
+        assert apply_move(refreshed, "tiger", {"type": "move", "from": 0, "to": 1})[0]
+        await worker_b.save_game("m1")
+        assert redis.moves_written == 2
+        await worker_b.save_game("m1")
+        assert redis.moves_written == 2
+        await worker_a.refresh_game("m1")
+        assert worker_a.get_game("m1").move_history == refreshed.move_history
+
+    asyncio.run(scenario())
+
+
+def test_idle_games_are_written_back_and_evicted(monkeypatch, fake_redis):
+    import time
+
+    from app.services.game import bot_service as bots
+    from app.services.game import connection_manager as cm
+    from app.services.game.match_service import apply_move
+
+    redis = fake_redis(cm)
+    bot = bots.BotService()
+    monkeypatch.setattr(bots, "bot_service", bot)
+    monkeypatch.setattr(cm.settings, "MAX_RESIDENT_GAMES", 2)
+    monkeypatch.setattr(cm.settings, "GAME_IDLE_SECONDS", 100)
+    manager = cm.ConnectionManager()
+
+    async def scenario():
+        for match_id in ("m1", "m2", "m3"):
+            await manager.load_game(match_id)
+        manager.owned_matches.add("m1")
+        assert bot.seat("m1", "tiger", "heuristic", 1)
+        manager.active_connections["m2"] = {object()}
+        assert apply_move(manager.get_game("m1"), "goat", {"type": "place", "position": 12})[0]
+
+        # Over the cap: the least recently used game nobody is connected to goes
+        assert await manager.evict_idle_games() == 1
+        assert list(manager.games) == ["m2", "m1"]
+
+        # Once idle, m1 is written back and its lease released; m2 keeps its socket
+        assert await manager.evict_idle_games(time.monotonic() + 200) == 1
+        assert list(manager.games) == ["m2"] and "m1" not in manager.owned_matches
+        assert "m1" not in bot.seats
+        reloaded = await manager.refresh_game("m1")
+        assert reloaded.version == 1 and reloaded.board[12] == GOAT
+        manager.evict_task.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_match_lease_routes_moves_to_owner(monkeypatch, fake_redis, fake_socket):
+    import json
+
+    from app.services.game import connection_manager as cm
+    from app.services.game import match_service
+
+    redis = fake_redis(cm)
+    owner = cm.ConnectionManager()
+    other = cm.ConnectionManager()
+    monkeypatch.setattr(match_service, "manager", owner)
+
+    async def scenario():
+        assert await owner.acquire_match("m1") == owner.instance_id
+        assert await other.acquire_match("m1") == owner.instance_id
+
+        move = {"type": "move", "match_id": "m1", "user_id": 1, "role": "goat"}
+        await other.forward_to_owner(
+            owner.instance_id, dict(move, message={"type": "place", "position": 12})
+        )
+        channel, data = redis.published[-1]
+        assert channel == owner.worker_channel
+        await owner._handle_worker_message(json.loads(data))
+        assert owner.get_game("m1").board[12] == GOAT
+        # Played moves are acked with an empty reply
+        channel, data = redis.published[-1]
+        assert channel == other.worker_channel and json.loads(data)["payload"] is None
+        await other._handle_worker_message(json.loads(data))
+        assert other.pending_forwards == {}
+
+        # Rejected forwarded moves are reported back to the sending worker
+        await owner._handle_worker_message(
+            dict(move, message={"type": "place", "position": 13}, reply_to=other.worker_channel)
+        )
+        channel, data = redis.published[-1]
+        assert channel == other.worker_channel
+        assert json.loads(data)["payload"]["message"] == "Not your turn"
+
+        await owner.release_match("m1")
+        assert await other.acquire_match("m1") == other.instance_id
+        assert other.get_game("m1").board[12] == GOAT
+
+        # An owner that never acks loses its lease and the player is told to retry
+        monkeypatch.setattr(cm.settings, "MATCH_FORWARD_TIMEOUT_SECONDS", 0.01)
+        client = fake_socket()
+        owner.set_protocol(client, cm.JSON_PROTOCOL)
+        owner.active_connections["m1"] = {client}
+        owner._join(client, "m1", 1)
+        await owner.forward_to_owner(
+            other.instance_id, dict(move, message={"type": "place", "position": 13})
+        )
+        await asyncio.sleep(0.05)
+        await owner.drain(client)
+        assert json.loads(client.sent[-1])["message"] == "Match owner not responding, please retry"
+        assert not await redis.exists("match_owner:m1")
+        other.owned_matches.clear()
+
+    asyncio.run(scenario())
+
+
+def test_bootstrap_connects_a_player_in_one_round_trip(monkeypatch, fake_redis):
+    from app.services.game import connection_manager as cm
+    from app.services.game.match_service import apply_move
+
+    async def no_pubsub():
+        return None
+
+    redis = fake_redis(cm)
+    worker_a = cm.ConnectionManager()
+    worker_b = cm.ConnectionManager()
+    for worker in (worker_a, worker_b):
+        monkeypatch.setattr(worker, "_ensure_pubsub", no_pubsub)
+
+    async def scenario():
+        await redis.hset("match:m1", mapping={"p1": "1", "p2": "2"})
+        assert await worker_a.bootstrap(object(), "missing", 1, "c0", "r0") is None
+        stranger = await worker_a.bootstrap(object(), "m1", 3, "c0", "r0")
+        assert stranger["role"] is None and not await redis.exists("ws_conn:m1:3")
+
+        evals = redis.evals
+        goat = await worker_a.bootstrap(object(), "m1", 1, "c1", "r1")
+        assert redis.evals == evals + 1
+        assert goat["role"] == "goat" and not goat["both_connected"]
+        assert "m1" in worker_a.owned_matches and "m1" in worker_a.games
+        assert await redis.get("resume:m1:r1") == "1"
+
+        game = worker_a.get_game("m1")
+        assert apply_move(game, "goat", {"type": "place", "position": 12})[0]
+        await worker_a.save_game("m1")
+        await redis.set("grace:m1:2", worker_a.instance_id)
+        tiger = await worker_b.bootstrap(object(), "m1", 2, "c2", "r2")
+        assert tiger["role"] == "tiger" and tiger["both_connected"] and tiger["returning"]
+        assert "m1" not in worker_b.owned_matches
+        assert worker_b.get_game("m1").board[12] == GOAT
+        assert await redis.smembers("match_workers:m1") == {worker_a.instance_id, worker_b.instance_id}
+
+        # The owner's resident game is authoritative and never reloaded
+        assert apply_move(game, "tiger", {"type": "move", "from": 0, "to": 1})[0]
+        await worker_a.bootstrap(object(), "m1", 1, "c3", "r3")
+        assert worker_a.get_game("m1") is game
+
+        # A fresh resident copy of a game that was never saved is current too
+        await redis.hset("match:m2", mapping={"p1": "1", "p2": "2"})
+        fresh = worker_b.games["m2"] = BaghChalGame()
+        await worker_b.bootstrap(object(), "m2", 2, "c4", "r4")
+        assert worker_b.get_game("m2") is fresh
+        worker_a.owned_matches.clear()
+        worker_b.owned_matches.clear()
+
+    asyncio.run(scenario())
+
+
+def test_seat_player_checks_user_and_membership_before_touching_the_match(
+    db_session, make_user, monkeypatch, fake_redis, fake_socket
+):
+    from sqlalchemy import event
+
+    from app.api.v1.endpoints import game as endpoints
+    from app.core import redis as redis_module
+    from app.services.game import connection_manager as cm
+
+    async def no_pubsub():
+        return None
+
+    goat = make_user("sgoat", "sgoat@example.com")
+    tiger = make_user("stiger", "stiger@example.com")
+    outsider = make_user("sout", "sout@example.com")
+    redis = fake_redis(cm, redis_module)
+    manager = cm.ConnectionManager()
+    monkeypatch.setattr(manager, "_ensure_pubsub", no_pubsub)
+    monkeypatch.setattr(endpoints, "manager", manager)
+
+    async def scenario():
+        await redis.hset("match:m1", mapping={"p1": str(goat.id), "p2": str(tiger.id)})
+        for seq in (1, 2):
+            await manager.broadcast_to_match("m1", {"type": "update", "seq": seq})
+        first = (await redis.xrange("match_events:m1"))[0][0]
+
+        # An unknown user leaves a pending grace window and the lease alone
+        await redis.set(f"grace:m1:{tiger.id}", "w")
+        ghost = fake_socket()
+        manager.set_protocol(ghost, cm.JSON_PROTOCOL)
+        _seat, error = await endpoints.seat_player(ghost, db_session, "m1", 10_000, "c0", "r0")
+        assert error == (1008, "Invalid token")
+        assert await redis.exists(f"grace:m1:{tiger.id}") and not await redis.exists("match_owner:m1")
+
+        # A user of another match gets none of this match's events
+        stranger = fake_socket()
+        manager.set_protocol(stranger, cm.JSON_PROTOCOL)
+        seat, error = await endpoints.seat_player(
+            stranger, db_session, "m1", outsider.id, "c3", "r3", first
+        )
+        assert seat is None and error == (1008, "User not in match")
+        await manager.drain(stranger)
+        assert stranger.sent == [] and not await redis.exists(f"ws_conn:m1:{outsider.id}")
+
+        player = fake_socket()
+        manager.set_protocol(player, cm.JSON_PROTOCOL)
+        boot = await manager.bootstrap(player, "m1", goat.id, "c1", "r1", first)
+        assert boot["resumed"]
+        await manager.drain(player)
+        assert [json.loads(text)["seq"] for text in player.sent] == [2]
+
+        # A fresh seat loads both profiles in a single query
+        statements = []
+        engine = db_session.get_bind()
+
+        def record(_conn, _cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        fresh = fake_socket()
+        manager.set_protocol(fresh, cm.JSON_PROTOCOL)
+        seat, error = await endpoints.seat_player(fresh, db_session, "m1", tiger.id, "c2", "r2")
+        event.remove(engine, "before_cursor_execute", record)
+        assert error is None and len(statements) == 1
+        await manager.drain(fresh)
+        start = json.loads(fresh.sent[0])
+        assert start["type"] == "start" and start["opponent"]["username"] == "sgoat"
+        manager.owned_matches.clear()
+
+    asyncio.run(scenario())
+
+
+def test_reconnect_grace_defers_forfeit_and_keeps_game_resident(monkeypatch, fake_redis):
+    from app.services.game import connection_manager as cm
+
+    redis = fake_redis(cm)
+    monkeypatch.setattr(cm.settings, "RECONNECT_GRACE_SECONDS", 0.05)
+    manager = cm.ConnectionManager()
+    forfeits = []
+
+    async def forfeit():
+        forfeits.append(1)
+
+    async def scenario():
+        await manager.load_game("m1")
+        manager.owned_matches.add("m1")
+
+        # A player who comes back in time (bootstrap deletes the grace key) keeps the seat
+        await manager.start_grace("m1", 1, forfeit)
+        await manager._evict_if_idle("m1")
+        assert "m1" in manager.games
+        assert await redis.delete("grace:m1:1")
+        manager._cancel_grace_timer("m1", 1)
+        await asyncio.sleep(0.1)
+        assert forfeits == []
+
+        # Otherwise the forfeit runs once and the idle game is written back and dropped
+        await manager.start_grace("m1", 2, forfeit)
+        await asyncio.sleep(0.1)
+        assert forfeits == [1]
+        assert "m1" not in manager.games and "m1" not in manager.owned_matches
+        assert not await redis.exists("grace:m1:2")
+
+    asyncio.run(scenario())
+
+
+def test_match_event_stream_fills_pubsub_gaps_and_resumes_clients(fake_redis, fake_socket):
+    import json
+
+    from app.services.game import connection_manager as cm
+
+    redis = fake_redis(cm)
+    owner = cm.ConnectionManager()
+    relay = cm.ConnectionManager()
+    watcher = fake_socket()
+    relay.spectators["m1"] = {watcher}
+
+    async def deliver():
+        for _channel, payload in redis.published:
+            header, prev_id, event_id, body = payload.split("\n", 3)
+            await relay._relay_event(header[len("event:"):], prev_id, event_id, body)
+        redis.published.clear()
+
+    async def scenario():
+        await redis.sadd("match_workers:m1", owner.instance_id, relay.instance_id)
+        relay.set_protocol(watcher, cm.JSON_PROTOCOL)
+        for seq in (1, 2, 3):
+            await owner.broadcast_to_match("m1", {"type": "update", "seq": seq})
+            if seq == 1:
+                await deliver()
+            else:
+                # The pubsub message for seq 2 never reaches the relaying worker
+                redis.published.clear()
+        await owner.broadcast_to_match("m1", {"type": "update", "seq": 4})
+        await deliver()
+        await relay.drain(watcher)
+        assert [json.loads(text)["seq"] for text in watcher.sent] == [1, 2, 3, 4]
+        event_ids = [event_id for event_id, _fields in await redis.xrange("match_events:m1")]
+        assert relay.last_event_ids["m1"] == event_ids[-1]
+
+        # A reconnecting client gets exactly the events after its last id
+        client = fake_socket()
+        owner.set_protocol(client, cm.JSON_PROTOCOL)
+        assert await owner.replay_events(client, "m1", event_ids[1])
+        await owner.drain(client)
+        assert client.sent == watcher.sent[2:]
+        await redis.xdel("match_events:m1", event_ids[0])
+        assert not await owner.replay_events(client, "m1", event_ids[0])
+
+    asyncio.run(scenario())
+
+
+def test_binary_client_resumes_from_the_event_id_in_its_frames(monkeypatch, fake_redis, fake_socket):
+    from app.services.game import connection_manager as cm
+    from app.services.game.protocol import BINARY_SUBPROTOCOL, PROTOCOLS
+
+    async def no_pubsub():
+        return None
+
+    redis = fake_redis(cm)
+    manager = cm.ConnectionManager()
+    monkeypatch.setattr(manager, "_ensure_pubsub", no_pubsub)
+    binary = PROTOCOLS[BINARY_SUBPROTOCOL]
+
+    async def scenario():
+        await redis.hset("match:m1", mapping={"p1": "1", "p2": "2"})
+        player = fake_socket()
+        manager.set_protocol(player, binary)
+        assert (await manager.bootstrap(player, "m1", 1, "c1", "r1"))["role"] == "goat"
+        for seq, position in enumerate((12, 13, 14), 1):
+            move = {"type": "place", "position": position}
+            await manager.broadcast_to_match("m1", {"type": "update", "seq": seq, "move": move})
+        await manager.drain(player)
+        seen = [binary.decode(frame) for frame in player.sent]
+        assert all(frame[0] == 0x10 for frame in player.sent)
+        await manager.disconnect(player)
+
+        # Dropped after the first update, the client resumes from its event id
+        again = fake_socket()
+        manager.set_protocol(again, binary)
+        boot = await manager.bootstrap(again, "m1", 1, "c2", "r2", seen[0]["eid"])
+        assert boot["resumed"]
+        await manager.drain(again)
+        assert [binary.decode(frame) for frame in again.sent] == seen[1:]
+        manager.owned_matches.clear()
+
+    asyncio.run(scenario())
+
+
+def test_broadcast_encodes_each_event_once(monkeypatch, fake_redis, fake_socket):
+    from app.services.game import connection_manager as cm
+    from app.services.game.protocol import BINARY_SUBPROTOCOL, PROTOCOLS
+
+    redis = fake_redis(cm)
+    encodes = []
+    original_encode = cm.JSON_PROTOCOL.encode
+    monkeypatch.setattr(
+        cm.JSON_PROTOCOL, "encode", lambda message: encodes.append(1) or original_encode(message)
+    )
+    manager = cm.ConnectionManager()
+    json_sockets = [fake_socket() for _ in range(3)]
+    binary_socket = fake_socket()
+    sockets = json_sockets + [binary_socket]
+    manager.active_connections["m1"] = set(sockets)
+    update = {"type": "update", "seq": 1, "move": {"type": "place", "position": 12}}
+
+    async def scenario():
+        await redis.sadd("match_workers:m1", manager.instance_id, "other-worker")
+        for socket in json_sockets:
+            manager.set_protocol(socket, cm.JSON_PROTOCOL)
+        manager.set_protocol(binary_socket, PROTOCOLS[BINARY_SUBPROTOCOL])
+
+        await manager.broadcast_to_match("m1", update)
+        for socket in sockets:
+            await manager.drain(socket)
+        assert len(encodes) == 1
+        # Logged to the match stream and routed only to the other worker hosting
+        # the match, JSON embedded verbatim with the stream id spliced in
+        text = json_sockets[0].sent[0]
+        [(event_id, fields)] = await redis.xrange("match_events:m1")
+        raw = fields["event"]
+        assert text == cm.with_event_id(raw, event_id)
+        assert redis.published == [("worker:other-worker", f"event:m1\n0-0\n{event_id}\n" + raw)]
+        assert all(socket.sent == [text] for socket in json_sockets)
+        assert PROTOCOLS[BINARY_SUBPROTOCOL].decode(binary_socket.sent[0]) == dict(update, eid=event_id)
+
+        # Events relayed from other workers are forwarded without re-encoding
+        await manager._broadcast_local("m1", None, text)
+        for socket in sockets:
+            await manager.drain(socket)
+        assert len(encodes) == 1
+        assert json_sockets[1].sent == [text, text]
+
+    asyncio.run(scenario())
+
+
+def test_spectators_share_the_broadcast_and_keep_the_match_routed(monkeypatch, fake_redis, fake_socket):
+    from app.services.game import connection_manager as cm
+
+    async def no_pubsub():
+        return None
+
+    redis = fake_redis(cm)
+    monkeypatch.setattr(cm.settings, "SPECTATORS_PER_MATCH", 3)
+    encodes = []
+    original_encode = cm.JSON_PROTOCOL.encode
+    monkeypatch.setattr(
+        cm.JSON_PROTOCOL, "encode", lambda message: encodes.append(1) or original_encode(message)
+    )
+    manager = cm.ConnectionManager()
+    monkeypatch.setattr(manager, "_ensure_pubsub", no_pubsub)
+    player = fake_socket()
+    viewers = [fake_socket() for _ in range(3)]
+    update = {"type": "update", "seq": 1, "move": {"type": "place", "position": 12}}
+
+    async def scenario():
+        for socket in [player] + viewers:
+            manager.set_protocol(socket, cm.JSON_PROTOCOL)
+        await manager.connect(player, "m1", 1)
+        # A viewer left behind by a crashed worker expires instead of holding a place
+        await redis.zadd("match_spectators:m1", {"dead": 1})
+        counts = [await manager.watch(viewer, "m1", f"v{n}") for n, viewer in enumerate(viewers)]
+        assert counts == [1, 2, 3]
+        extra = fake_socket()
+        manager.set_protocol(extra, cm.JSON_PROTOCOL)
+        assert await manager.watch(extra, "m1", "v9") == 0 and extra not in manager.spectator_ids
+        assert manager.active_connections["m1"] == {player}
+        assert await redis.smembers("match_workers:m1") == {manager.instance_id}
+
+        await manager._broadcast_local("m1", update)
+        for socket in [player] + viewers:
+            await manager.drain(socket)
+        assert len(encodes) == 1
+        assert all(socket.sent == player.sent for socket in viewers)
+
+        # Spectators are never addressed as players
+        await manager.send_to_user("m1", None, {"type": "pong"})
+        await manager.drain(viewers[0])
+        assert len(viewers[0].sent) == 1
+
+        # The worker keeps hosting the match while anyone is still watching
+        await manager.disconnect(player)
+        assert await redis.smembers("match_workers:m1") == {manager.instance_id}
+        await manager.disconnect(viewers[0])
+        assert await redis.zrange("match_spectators:m1", 0, -1) == ["v1", "v2"]
+        for viewer in viewers[1:] + [extra]:
+            await manager.disconnect(viewer)
+        assert not await redis.smembers("match_workers:m1")
+        assert not await redis.exists("match_spectators:m1") and not manager.spectator_ids
+        assert "m1" not in manager.spectators and "m1" not in manager.games
+
+    asyncio.run(scenario())
+
+
+def test_multiplexed_socket_gets_tagged_frames_from_each_match(monkeypatch, fake_redis, fake_socket):
+    from app.services.game import connection_manager as cm
+    from app.services.game.protocol import BINARY_SUBPROTOCOL, PROTOCOLS
+
+    async def no_pubsub():
+        return None
+
+    redis = fake_redis(cm)
+    binary = PROTOCOLS[BINARY_SUBPROTOCOL]
+    manager = cm.ConnectionManager()
+    monkeypatch.setattr(manager, "_ensure_pubsub", no_pubsub)
+    plain, mux, mux_binary = fake_socket(), fake_socket(), fake_socket()
+    update = {"type": "update", "seq": 1, "move": {"type": "place", "position": 12}}
+
+    async def scenario():
+        manager.set_protocol(plain, cm.JSON_PROTOCOL)
+        manager.set_protocol(mux, cm.JSON_PROTOCOL)
+        manager.set_protocol(mux_binary, binary)
+        manager.multiplex(mux, 7)
+        manager.multiplex(mux_binary, 8)
+        await manager.connect(plain, "m1", 1)
+        for match_id in ("m1", "m2"):
+            await manager.connect(mux, match_id, None, spectator=True)
+        await manager.connect(mux_binary, "m1", None, spectator=True)
+
+        await manager._broadcast_local("m1", update)
+        await manager._broadcast_local("m2", dict(update, seq=5))
+        for socket in (plain, mux, mux_binary):
+            await manager.drain(socket)
+        assert cm.JSON_PROTOCOL.decode(plain.sent[0]) == update
+        assert [cm.JSON_PROTOCOL.untag(frame) for frame in mux.sent] == [
+            ("m1", update),
+            ("m2", dict(update, seq=5)),
+        ]
+        assert binary.untag(mux_binary.sent[0]) == ("m1", update)
+        assert binary.untag(binary.tag(binary.encode({"type": "resync"}), "m2")) == (
+            "m2",
+            {"type": "resync"},
+        )
+
+        # Leaving one match keeps the socket in the other; closing it leaves both
+        await manager.unsubscribe(mux, "m1")
+        assert mux not in manager.spectators["m1"] and manager.subscriptions[mux] == {"m2"}
+        await manager.disconnect(mux)
+        assert "m2" not in manager.spectators and mux not in manager.connection_info
+        assert not await redis.sismember("match_workers:m2", manager.instance_id)
+        assert await redis.sismember("match_workers:m1", manager.instance_id)
+
+    asyncio.run(scenario())
+
+
+def test_slow_consumer_is_evicted_without_stalling_others(monkeypatch, fake_socket):
+    from app.services.game import connection_manager as cm
+
+    monkeypatch.setattr(cm.settings, "WS_SEND_QUEUE_SIZE", 4)
+    manager = cm.ConnectionManager()
+    fast, slow = fake_socket(), fake_socket(stalled=True)
+    manager.active_connections["m1"] = {fast, slow}
+
+    async def scenario():
+        manager.set_protocol(fast, cm.JSON_PROTOCOL)
+        manager.set_protocol(slow, cm.JSON_PROTOCOL)
+        for seq in range(10):
+            await manager._broadcast_local("m1", {"type": "update", "seq": seq})
+            await asyncio.sleep(0)
+        await manager.drain(fast)
+        await asyncio.sleep(0)
+        assert len(fast.sent) == 10
+        # The close task was held by the manager until it finished
+        assert slow.closed == (1008, "Client too slow") and not manager.close_tasks
+        stats = manager.queue_stats()
+        assert stats["connections"] == 1
+        assert stats["evicted_slow_consumers"] == 1
+
+    asyncio.run(scenario())
+    # Sends racing a peer that left normally are not reported as errors
+    assert cm.closed_normally(cm.WebSocketDisconnect(1001))
+    assert cm.closed_normally(ConnectionResetError())
+    assert not cm.closed_normally(cm.WebSocketDisconnect(1011))
+    assert not cm.closed_normally(RuntimeError("boom"))
+
+
+def test_timer_wheel_pings_then_closes_idle_connections(monkeypatch):
+    from app.services.game import timer_wheel
+
+    clock = [0.0]
+    monkeypatch.setattr(timer_wheel.time, "monotonic", lambda: clock[0])
+    pinged, closed = [], []
+    wheel = timer_wheel.TimerWheel(1.0, 3.0, 2.0, pinged.append, closed.append)
+    monkeypatch.setattr(wheel, "_run", lambda: asyncio.sleep(0))
+
+    def run_until(seconds):
+        while clock[0] < seconds:
+            clock[0] += 1.0
+            wheel.advance()
+
+    async def scenario():
+        for key in ("quiet", "chatty", "answers", "gone"):
+            wheel.add(key)
+        wheel.discard("gone")
+        for second in range(1, 9):
+            run_until(second)
+            wheel.touch("chatty")
+            if second == 4:
+                wheel.touch("answers")
+        assert "chatty" not in pinged
+        # quiet: pinged at 3s, closed at 5s; answers: pinged at 3s, replied at 4s,
+        # pinged again at 7s
+        assert pinged.count("quiet") == 1 and pinged.count("answers") == 2
+        assert closed == ["quiet"]
+        assert set(wheel.last_seen) == {"chatty", "answers"}
+
+    asyncio.run(scenario())
+
+
+def test_stale_move_reply_is_idempotent_for_resends():
+    from app.services.game.match_service import apply_move, stale_move_reply
+
+    game = BaghChalGame()
+    place = {"type": "place", "position": 12, "seq": 0}
+    assert stale_move_reply(game, "goat", place) is None
+    assert apply_move(game, "goat", place)[0]
+
+    resend = stale_move_reply(game, "goat", place)
+    assert resend == {"type": "update", "seq": 1, "move": {"type": "place", "position": 12}}
+    stale = stale_move_reply(game, "goat", {"type": "place", "position": 7, "seq": 0})
+    assert stale["type"] == "error" and stale["seq"] == 1
+    assert stale_move_reply(game, "tiger", {"type": "move", "from": 0, "to": 1}) is None
+
+
+def test_clocks_charge_moves_and_flag_from_one_scheduler(monkeypatch, fake_redis):
+    from app.services import matchmaking_service
+    from app.services.game import clock_service
+    from app.services.game import connection_manager as cm
+    from app.services.game import match_service
+
+    now = [1_000_000]
+    results = []
+    sent = []
+
+    async def record(job):
+        results.append((job["match_id"], job["winner"]))
+
+    redis = fake_redis(cm, clock_service, matchmaking_service)
+    monkeypatch.setattr(clock_service, "now_ms", lambda: now[0])
+    monkeypatch.setattr(match_service, "now_ms", lambda: now[0])
+    monkeypatch.setattr(match_service, "enqueue_game_finished", record)
+    owner = cm.ConnectionManager()
+
+    async def broadcast(match_id, message):
+        sent.append(message)
+
+    monkeypatch.setattr(owner, "broadcast_to_match", broadcast)
+    scheduler = clock_service.ClockScheduler()
+    scheduler.wakeup = asyncio.Event()
+    monkeypatch.setattr(scheduler, "start", lambda: None)
+    monkeypatch.setattr(match_service, "clock_scheduler", scheduler)
+
+    def use_worker(worker):
+        monkeypatch.setattr(match_service, "manager", worker)
+        monkeypatch.setattr(clock_service, "manager", worker)
+
+    async def start_match(match_id):
+        await redis.hset(f"match:{match_id}", mapping={"p1": 1, "p2": 2, "status": "active"})
+        await matchmaking_service.set_time_control(match_id, "blitz")
+        assert await owner.acquire_match(match_id) == owner.instance_id
+        game = owner.get_game(match_id)
+        assert game.clock_message(now[0]) == {"goat": 180000, "tiger": 180000}
+        return game
+
+    async def scenario():
+        use_worker(owner)
+        await start_match("m1")
+        # The first move starts the clock, later moves are charged plus the increment
+        assert (await match_service.play_move("m1", "goat", {"type": "place", "position": 12}))[0]
+        now[0] += 5000
+        assert (await match_service.play_move("m1", "tiger", {"type": "move", "from": 0, "to": 1}))[0]
+        assert sent[-1]["clock"] == {"goat": 182000, "tiger": 177000}
+        assert await redis.zscore(cm.CLOCKS_KEY, "m1") == now[0] + 182000
+
+        # The tiger entry was superseded by the goat's move and is skipped
+        assert scheduler.pop_due(now[0] + 181999) == []
+        now[0] += 182000
+        assert scheduler.pop_due(now[0]) == ["m1"]
+        await scheduler._flag("m1")
+        assert results == [("m1", "tiger")]
+        assert sent[-1]["type"] == "game_over" and sent[-1]["reason"] == "timeout"
+        assert await redis.zscore(cm.CLOCKS_KEY, "m1") is None
+
+        # A late move loses on time instead of being applied
+        await start_match("m2")
+        await match_service.play_move("m2", "goat", {"type": "place", "position": 12})
+        now[0] += 181000
+        assert await match_service.play_move("m2", "tiger", {"type": "move", "from": 0, "to": 1}) == (
+            False,
+            "Time is up",
+            "goat",
+        )
+
+        # A worker that outlives the owner flags its overdue clocks via the sorted set
+        await start_match("m3")
+        await match_service.play_move("m3", "goat", {"type": "place", "position": 12})
+        survivor = cm.ConnectionManager()
+        use_worker(survivor)
+        now[0] += 180000
+        await scheduler._sweep(now[0])
+        assert results[-1] == ("m2", "goat")
+        await redis.delete("match_owner:m3")
+        await scheduler._sweep(now[0])
+        assert results[-1] == ("m3", "goat")
+        assert await redis.zcard(cm.CLOCKS_KEY) == 0
+        owner.owned_matches.clear()
+        survivor.owned_matches.clear()
+
+    asyncio.run(scenario())
+
+
+def test_sorted_set_queue_pairs_atomically_and_skips_dead_entries(monkeypatch, fake_redis):
+    from app.services import matchmaking_service as mm
+
+    redis = fake_redis(mm)
+    monkeypatch.setattr(mm.settings, "DEFAULT_TIME_CONTROL", "blitz")
+
+    async def scenario():
+        assert await mm.add_to_queue(1) is None
+        assert await mm.add_to_queue(1) is None
+        assert await redis.zcard(mm.MATCHMAKING_QUEUE) == 1
+
+        paired = await mm.add_to_queue(2)
+        assert paired["opponent"] == 1 and paired["role"] == "tiger"
+        match_id = paired["matchId"]
+        match = await redis.hgetall(f"match:{match_id}")
+        assert (match["p1"], match["p2"], match["time_control"]) == ("1", "2", "blitz")
+        assert await redis.get("user_match:1") == await redis.get("user_match:2") == match_id
+        clock = json.loads(await redis.hget(mm.game_keys(match_id)[0], "clock"))
+        assert clock["clock_ms"] == {"goat": 180000, "tiger": 180000}
+        assert await redis.zcard(mm.MATCHMAKING_QUEUE) == 0
+
+        # A player whose heartbeat lapsed is dropped instead of being paired
+        assert await mm.add_to_queue(3) is None
+        await redis.delete("heartbeat:3")
+        assert await mm.add_to_queue(4) is None
+        assert await redis.zrange(mm.MATCHMAKING_QUEUE, 0, -1) == ["4"]
+
+        # Concurrent joins never hand the same player to two matches
+        results = await asyncio.gather(*(mm.add_to_queue(user) for user in range(5, 12)))
+        matches = [result["matchId"] for result in results if result]
+        seated = [await redis.hgetall(f"match:{match_id}") for match_id in matches]
+        players = [seat[role] for seat in seated for role in ("p1", "p2")]
+        assert len(matches) == 4
+        assert len(players) == len(set(players))
+        assert set(players) == {str(user) for user in range(4, 12)}
+        assert await redis.zcard(mm.MATCHMAKING_QUEUE) == 0
+
+        await mm.add_to_queue(12)
+        await mm.remove_from_queue(12)
+        assert await redis.zcard(mm.MATCHMAKING_QUEUE) == 0
+
+    asyncio.run(scenario())
+
+
+def test_load_test_scripted_moves_are_legal():
+    import random
+
+    from app.services.game.match_service import apply_move
+    from benchmarks.ws_load import percentile, scripted_move
+
+    rng = random.Random(7)
+    game = BaghChalGame()
+    while game.check_winner() is None and game.version < 300:
+        move = scripted_move(game, game.turn, rng)
+        if move is None:
+            break
+        assert apply_move(game, game.turn, move)[0]
+    assert game.version > 20
+    assert percentile([3.0, 1.0, 2.0, 4.0], 50) == 2.0
+
+
+def test_metrics_histogram_buckets_and_label_fallback():
+    from app.core.metrics import REGISTRY, Histogram
+
+    histogram = Histogram("test_seconds", "Test.", buckets=(0.1, 1.0), label="kind", values=("a",))
+    REGISTRY.remove(histogram)
+    histogram.labels("a").observe(0.05)
+    histogram.labels("a").observe(0.1)
+    histogram.labels("a").observe(3.0)
+    histogram.labels("unknown").observe(0.5)
+    assert histogram.labels("b") is histogram.labels("other")
+
+    lines = histogram.render().splitlines()
+    assert lines[1] == "# TYPE test_seconds histogram"
+    assert 'test_seconds_bucket{kind="a",le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{kind="a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{kind="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{kind="a"} 3' in lines
+    assert 'test_seconds_bucket{kind="other",le="1.0"} 1' in lines
+
+
 def test_email_service_config_validation(monkeypatch):
     class SettingsStub:
         SMTP_HOST = ""